@@ -0,0 +1,187 @@
+"""Event-driven achievement tracking with constant-time checks
+
+Gameplay emits typed events. Each achievement owns a small tracker (a
+counter, a distinct set or a sliding window) subscribed to the event types it
+cares about, so checking achievements never rescans the player's history.
+An achievement's tracker is unsubscribed the moment it unlocks, so every
+unlock fires exactly once.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from levels import ACHIEVEMENTS, LEVELS
+from prompt_scoring import tokenize
+
+# Level tags (the optional "tags" field of a level) that achievements key off;
+# a pack without a tagged level simply has no level that counts
+STYLE_TAG = "style"  # bonus keywords are art styles for "Style Explorer"
+NEGATIVE_PROMPTING_TAG = "negative_prompting"  # passing it earns "Technical Expert"
+CREATIVE_TAG = "creative"  # original passes count toward "Creative Genius"
+LEVEL_TAGS = (STYLE_TAG, NEGATIVE_PROMPTING_TAG, CREATIVE_TAG)
+# Art styles recognised for "Style Explorer" in every pack
+ART_STYLES = frozenset({
+    "surreal", "abstract", "watercolor", "oil painting", "anime", "pixel art", "art deco", "pop art",
+    "gothic", "steampunk", "photorealistic", "cubist", "expressionist", "vaporwave", "ukiyo-e", "sketch",
+})
+
+
+def tagged_levels(levels, tag):
+    """Ids of the levels carrying ``tag``"""
+    return frozenset(level_id for level_id, level in levels.items() if tag in level.get("tags", ()))
+
+
+def style_phrases(levels):
+    """Padded token phrase of every art style a curriculum recognises"""
+    styles = set(ART_STYLES)
+    for level_id in tagged_levels(levels, STYLE_TAG):
+        styles.update(levels[level_id]["bonus_keywords"])
+    return {style: f" {' '.join(tokenize(style))} " for style in styles}
+
+
+_STYLE_PHRASES = style_phrases(LEVELS)
+
+
+def detect_styles(prompt, phrases=_STYLE_PHRASES):
+    """Art styles named in a prompt"""
+    text = f" {' '.join(tokenize(prompt))} "
+    return tuple(sorted(style for style, phrase in phrases.items() if phrase in text))
+
+
+# ===== EVENTS =====
+@dataclass(frozen=True)
+class PromptScored:
+    level: int
+    keywords: tuple = ()
+    secrets: tuple = ()
+    styles: tuple = ()
+    passed: bool = False
+    perfect: bool = False
+    combo: int = 0
+    original: bool = True  # not a near-duplicate of an earlier prompt
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class ImageGenerated:
+    level: int
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class DailyLogin:
+    streak: int
+    timestamp: float = field(default_factory=time.time)
+
+
+# ===== TRACKERS =====
+class CountTracker:
+    """Reached after ``target`` matching events"""
+
+    def __init__(self, event_type, target, predicate=None, count=0):
+        self.event_types = (event_type,)
+        self.target = target
+        self.predicate = predicate
+        self.count = count
+
+    def update(self, event):
+        if self.predicate is None or self.predicate(event):
+            self.count += 1
+        return self.count >= self.target
+
+
+class DistinctTracker:
+    """Reached once ``target`` distinct values have been seen"""
+
+    def __init__(self, event_type, target, values, seen=()):
+        self.event_types = (event_type,)
+        self.target = target
+        self.values = values
+        self.seen = set(seen)
+
+    def update(self, event):
+        self.seen.update(self.values(event))
+        return len(self.seen) >= self.target
+
+
+class ThresholdTracker:
+    """Reached when a value carried by an event hits ``target``"""
+
+    def __init__(self, event_type, target, value):
+        self.event_types = (event_type,)
+        self.target = target
+        self.value = value
+
+    def update(self, event):
+        return self.value(event) >= self.target
+
+
+class SlidingWindowTracker:
+    """Reached when ``target`` events land within ``window`` seconds
+
+    Only the last ``target`` timestamps are kept, so each update is O(1).
+    """
+
+    def __init__(self, event_type, target, window):
+        self.event_types = (event_type,)
+        self.target = target
+        self.window = window
+        self.times = deque(maxlen=target)
+
+    def update(self, event):
+        self.times.append(event.timestamp)
+        return len(self.times) == self.target and self.times[-1] - self.times[0] <= self.window
+
+
+def build_trackers(progress=None, levels=LEVELS):
+    """One tracker per achievement for a curriculum, seeded from already persisted progress"""
+    progress = progress or {}
+    technical_levels = tagged_levels(levels, NEGATIVE_PROMPTING_TAG)
+    creative_levels = tagged_levels(levels, CREATIVE_TAG)
+    return {
+        "first_steps": CountTracker(PromptScored, 1),
+        "word_collector": DistinctTracker(
+            PromptScored, 25, lambda e: e.keywords, progress.get("keywords_discovered", ())),
+        "secret_hunter": DistinctTracker(
+            PromptScored, 5, lambda e: e.secrets, progress.get("secret_keywords_found", ())),
+        "combo_master": ThresholdTracker(PromptScored, 5, lambda e: e.combo),
+        "style_explorer": DistinctTracker(
+            PromptScored, 10, lambda e: e.styles, progress.get("styles_tried", ())),
+        "technical_expert": CountTracker(
+            PromptScored, 1, lambda e: e.passed and e.level in technical_levels),
+        "creative_genius": CountTracker(
+            PromptScored, 10, lambda e: e.passed and e.original and e.level in creative_levels,
+            progress.get("creative_challenges_completed", 0)),
+        "speed_demon": SlidingWindowTracker(ImageGenerated, 10, 10 * 60),
+        "perfectionist": DistinctTracker(
+            PromptScored, 3, lambda e: (e.level,) if e.perfect else (), progress.get("perfect_levels", ())),
+        "daily_warrior": ThresholdTracker(DailyLogin, 7, lambda e: e.streak),
+        "master_teacher": DistinctTracker(
+            PromptScored, len(levels), lambda e: (e.level,) if e.passed else (),
+            progress.get("completed_levels", ())),
+    }
+
+
+class AchievementEngine:
+    """Route events to the trackers of achievements that are still locked"""
+
+    def __init__(self, unlocked=(), progress=None, catalogue=ACHIEVEMENTS, levels=LEVELS):
+        self.catalogue = catalogue
+        self.unlocked = set(unlocked)
+        self._subscribers = {}
+        for achievement_id, tracker in build_trackers(progress, levels).items():
+            if achievement_id in catalogue and achievement_id not in self.unlocked:
+                for event_type in tracker.event_types:
+                    self._subscribers.setdefault(event_type, {})[achievement_id] = tracker
+
+    def emit(self, event):
+        """Feed one event; return the ids of achievements it unlocked"""
+        subscribers = self._subscribers.get(type(event))
+        if not subscribers:
+            return []
+        newly_unlocked = [aid for aid, tracker in list(subscribers.items()) if tracker.update(event)]
+        for achievement_id in newly_unlocked:
+            self.unlocked.add(achievement_id)
+            for trackers in self._subscribers.values():
+                trackers.pop(achievement_id, None)
+        return newly_unlocked
@@ -0,0 +1,172 @@
+"""Admission control for diffusion generation on a shared inference box
+
+Every generation passes through ``AdmissionController.admit``; diffusion
+jobs face all four checks below, cache hits and previews only the first two.
+In order, it checks:
+
+1. the player's energy (charged per generation, regenerating over time)
+2. a per-player token bucket, so one student cannot monopolize the model
+3. a global token bucket sized for the box
+4. the queue backlog; past ``max_backlog`` new work is shed, and a queue
+   that cannot report it (an unreachable inference server) admits nothing
+
+A rejection carries the reason and how long until the same request would be
+admitted. Tokens and energy are only taken when every check passes, and
+``refund`` gives them back for a job that ends without an image.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+ENERGY_PER_GENERATION = int(os.environ.get("PROMPT_MASTER_ENERGY_PER_GENERATION", "5"))
+ENERGY_REGEN_SECONDS = float(os.environ.get("PROMPT_MASTER_ENERGY_REGEN_SECONDS", "60"))
+USER_RATE_PER_MINUTE = float(os.environ.get("PROMPT_MASTER_USER_RATE_PER_MINUTE", "4"))
+USER_BURST = int(os.environ.get("PROMPT_MASTER_USER_BURST", "3"))
+GLOBAL_RATE_PER_MINUTE = float(os.environ.get("PROMPT_MASTER_GLOBAL_RATE_PER_MINUTE", "30"))
+GLOBAL_BURST = int(os.environ.get("PROMPT_MASTER_GLOBAL_BURST", "10"))
+MAX_BACKLOG = int(os.environ.get("PROMPT_MASTER_MAX_BACKLOG", "16"))
+MAX_TRACKED_USERS = 4096
+UNAVAILABLE_RETRY_SECONDS = 10.0
+
+
+def regenerate_energy(player, now=None):
+    """Credit energy earned since it was last updated (one point per regen interval)"""
+    now = time.time() if now is None else now
+    if player.energy >= player.max_energy:
+        # The clock starts when energy is spent, so a full bar is left untouched
+        return
+    earned = int((now - player.energy_updated_at) // ENERGY_REGEN_SECONDS)
+    if earned > 0:
+        player.energy = min(player.max_energy, player.energy + earned)
+        player.energy_updated_at += earned * ENERGY_REGEN_SECONDS
+
+
+def energy_wait(player, cost, now=None):
+    """Seconds until the player has ``cost`` energy"""
+    now = time.time() if now is None else now
+    missing = cost - player.energy
+    if missing <= 0:
+        return 0.0
+    return max(0.0, missing * ENERGY_REGEN_SECONDS - (now - player.energy_updated_at))
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second up to ``capacity``"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now, tokens=1):
+        """Seconds until ``tokens`` are available (0 if they are now)"""
+        self._refill(now)
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, tokens=1):
+        self.tokens -= tokens
+
+    def give_back(self, tokens=1):
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+
+@dataclass(frozen=True)
+class Admission:
+    admitted: bool
+    reason: str = ""
+    retry_after: float = 0.0
+
+
+ADMITTED = Admission(True)
+
+
+class AdmissionController:
+    """Gate generation requests on energy, fair-share and global rate limits, and backlog"""
+
+    def __init__(self, queue, energy_cost=ENERGY_PER_GENERATION,
+                 user_rate=USER_RATE_PER_MINUTE / 60, user_burst=USER_BURST,
+                 global_rate=GLOBAL_RATE_PER_MINUTE / 60, global_burst=GLOBAL_BURST,
+                 max_backlog=MAX_BACKLOG):
+        self.queue = queue
+        self.energy_cost = energy_cost
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_backlog = max_backlog
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._user_buckets = {}
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.refunded = 0
+        self.rejected = {}
+
+    def _user_bucket(self, user_id, now):
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            if len(self._user_buckets) >= MAX_TRACKED_USERS:
+                # A full bucket is indistinguishable from a fresh one
+                for idle_id in [uid for uid, b in self._user_buckets.items() if b.wait_time(now, b.capacity) == 0]:
+                    del self._user_buckets[idle_id]
+            bucket = self._user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst, now)
+        return bucket
+
+    def _reject(self, reason, retry_after):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return Admission(False, reason, retry_after)
+
+    def admit(self, user_id, player, compute=True):
+        """Admit one generation for ``user_id`` and charge for it, or explain the wait
+
+        Every generation costs energy and a token from the player's bucket;
+        only ``compute`` ones (diffusion jobs) also face the global rate and
+        backlog limits, so cache hits and previews stay instant but not free.
+        """
+        regenerate_energy(player)
+        if player.energy < self.energy_cost:
+            return self._reject("energy", energy_wait(player, self.energy_cost))
+
+        now = time.monotonic()
+        with self._lock:
+            user_bucket = self._user_bucket(user_id, now)
+            user_wait = user_bucket.wait_time(now)
+            if user_wait > 0:
+                return self._reject("user_rate", user_wait)
+            if compute:
+                global_wait = self.global_bucket.wait_time(now)
+                if global_wait > 0:
+                    return self._reject("global_rate", global_wait)
+                try:
+                    backlog = self.queue.backlog
+                    if backlog >= self.max_backlog:
+                        # Admitted once enough queued work drains to fall under the limit
+                        return self._reject("backlog", self.queue.estimated_wait(backlog - self.max_backlog + 1))
+                except ConnectionError:
+                    return self._reject("unavailable", UNAVAILABLE_RETRY_SECONDS)
+                self.global_bucket.take()
+            user_bucket.take()
+            self.admitted += 1
+
+        if player.energy >= player.max_energy:
+            player.energy_updated_at = time.time()
+        player.energy -= self.energy_cost
+        return ADMITTED
+
+    def refund(self, user_id, player, compute=True):
+        """Give back what ``admit`` charged for a generation that produced no image"""
+        with self._lock:
+            user_bucket = self._user_buckets.get(user_id)
+            if user_bucket is not None:
+                user_bucket.give_back()
+            if compute:
+                self.global_bucket.give_back()
+            self.refunded += 1
+        player.energy = min(player.max_energy, player.energy + self.energy_cost)
@@ -0,0 +1,254 @@
+"""Append-only learning-analytics event log with columnar compaction
+
+The UI calls ``EventLog.record`` which only appends to an in-memory buffer;
+a background thread writes buffered events to an open JSON-lines segment.
+Segments are sealed when they grow large or old, and sealed segments are
+compacted into Parquet files (one table schema, see ``EVENT_COLUMNS``) when
+pyarrow is installed. Without pyarrow the sealed JSONL segments are kept
+as they are and can be compacted later with ``python analytics.py compact``.
+
+Usage:
+    python analytics.py compact      # compact every sealed segment now
+    python analytics.py summary      # event counts per type
+"""
+import argparse
+import atexit
+import glob
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from pipeline_manager import module_available
+from progress_store import DATA_DIR
+
+ANALYTICS_DIR = os.environ.get("PROMPT_MASTER_ANALYTICS_DIR", os.path.join(DATA_DIR, "analytics"))
+ANALYTICS_ENABLED = os.environ.get("PROMPT_MASTER_ANALYTICS", "1") != "0"
+FLUSH_INTERVAL_SECONDS = 2.0
+MAX_BUFFERED_EVENTS = 50_000
+SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+SEGMENT_MAX_AGE_SECONDS = 3600
+# Segments left open by a crashed process are sealed by whoever compacts next
+STALE_SEGMENT_SECONDS = 24 * 3600
+# Segments claimed by a compactor that died mid-way are returned after this long
+STALE_CLAIM_SECONDS = 600
+
+# Fixed schema for every event; event-specific fields go into ``detail`` (JSON text)
+EVENT_COLUMNS = ("ts", "event", "session_id", "player_id", "level", "prompt", "value", "detail")
+
+OPEN_SUFFIX = ".open.jsonl"
+SEALED_SUFFIX = ".jsonl"
+CLAIMED_SUFFIX = ".compacting"
+
+logger = logging.getLogger(__name__)
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("ts", pa.float64()), ("event", pa.string()), ("session_id", pa.string()),
+        ("player_id", pa.string()), ("level", pa.int32()), ("prompt", pa.string()),
+        ("value", pa.float64()), ("detail", pa.string()),
+    ])
+
+
+class EventLog:
+    """Non-blocking event recorder backed by a buffered background writer"""
+
+    def __init__(self, directory=ANALYTICS_DIR, flush_interval=FLUSH_INTERVAL_SECONDS,
+                 max_buffered=MAX_BUFFERED_EVENTS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._buffer = deque(maxlen=max_buffered)
+        self.dropped = 0
+        self._segment = None
+        self._segment_started = 0.0
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, event, session_id=None, player_id=None, level=None, prompt=None, value=None, **detail):
+        """Queue one event; never blocks on I/O"""
+        if len(self._buffer) == self._buffer.maxlen:
+            # The writer has fallen far behind; the oldest event is overwritten
+            self.dropped += 1
+        self._buffer.append((
+            time.time(), event, session_id, player_id, level, prompt, value,
+            json.dumps(detail, separators=(",", ":"), default=str) if detail else None,
+        ))
+
+    # ===== WRITER THREAD =====
+    def _open_segment(self):
+        name = f"events-{int(time.time())}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._segment = os.path.join(self.directory, name + OPEN_SUFFIX)
+        self._segment_started = time.monotonic()
+
+    def _seal_segment(self):
+        if self._segment and os.path.exists(self._segment):
+            os.replace(self._segment, self._segment[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+        self._segment = None
+
+    def flush(self):
+        """Append everything buffered to the open segment; rotate it when due"""
+        with self._flush_lock:
+            if not self._buffer:
+                return 0
+            events = []
+            while self._buffer:
+                events.append(self._buffer.popleft())
+            if self._segment is None:
+                self._open_segment()
+            try:
+                with open(self._segment, "a", encoding="utf-8") as handle:
+                    handle.writelines(
+                        json.dumps(dict(zip(EVENT_COLUMNS, event)), separators=(",", ":")) + "\n"
+                        for event in events
+                    )
+            except OSError:
+                self._buffer.extendleft(reversed(events))
+                raise
+            if (os.path.getsize(self._segment) >= SEGMENT_MAX_BYTES
+                    or time.monotonic() - self._segment_started >= SEGMENT_MAX_AGE_SECONDS):
+                self._seal_segment()
+                if module_available("pyarrow"):
+                    compact(self.directory)
+            return len(events)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Analytics flush failed; events stay buffered")
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+        self._seal_segment()
+
+
+class NullEventLog:
+    """Stand-in used when analytics are disabled"""
+
+    dropped = 0
+
+    def record(self, *args, **kwargs):
+        pass
+
+    def flush(self):
+        return 0
+
+
+# ===== COMPACTION =====
+def _read_segment(path):
+    columns = {name: [] for name in EVENT_COLUMNS}
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a torn final line
+                continue
+            for name in EVENT_COLUMNS:
+                columns[name].append(row.get(name))
+    return columns
+
+
+def compact(directory=ANALYTICS_DIR):
+    """Convert sealed JSONL segments into Parquet files; returns the number compacted"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cutoff = time.time() - STALE_SEGMENT_SECONDS
+    for path in glob.glob(os.path.join(directory, "*" + OPEN_SUFFIX)):
+        if os.path.getmtime(path) < cutoff:
+            os.replace(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+    _reclaim_stale_claims(directory)
+
+    schema = arrow_schema()
+    compacted = 0
+    for path in sorted(glob.glob(os.path.join(directory, "*" + SEALED_SUFFIX))):
+        if path.endswith(OPEN_SUFFIX):
+            continue
+        # Claim the segment by renaming it, so concurrent compactors skip it
+        claimed = f"{path}.{os.getpid()}{CLAIMED_SUFFIX}"
+        try:
+            os.replace(path, claimed)
+            os.utime(claimed)  # the claim's age, for _reclaim_stale_claims
+        except FileNotFoundError:
+            continue
+        target = path[:-len(SEALED_SUFFIX)] + ".parquet"
+        tmp_path = target + ".tmp"
+        try:
+            table = pa.table(_read_segment(claimed), schema=schema)
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, target)
+        except Exception:
+            # Hand the segment back so the next compaction retries it
+            logger.exception("Could not compact %s; it stays a JSONL segment", path)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            os.replace(claimed, path)
+            continue
+        os.remove(claimed)
+        compacted += 1
+    return compacted
+
+
+def _reclaim_stale_claims(directory):
+    """Return segments whose compactor died to the sealed pool (or drop them if already compacted)"""
+    cutoff = time.time() - STALE_CLAIM_SECONDS
+    for claimed in glob.glob(os.path.join(directory, "*" + SEALED_SUFFIX + ".*" + CLAIMED_SUFFIX)):
+        try:
+            if os.path.getmtime(claimed) >= cutoff:
+                continue
+            path = claimed[:claimed.rindex(SEALED_SUFFIX) + len(SEALED_SUFFIX)]
+            if os.path.exists(path[:-len(SEALED_SUFFIX)] + ".parquet"):
+                # The compactor died after writing the Parquet file
+                os.remove(claimed)
+            else:
+                os.replace(claimed, path)
+        except FileNotFoundError:
+            continue  # another compactor reclaimed it first
+
+
+def load_events(directory=ANALYTICS_DIR, columns=None):
+    """Every compacted event as one pyarrow Table (for notebooks and ad-hoc analysis)"""
+    import pyarrow.parquet as pq
+
+    files = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+    if not files:
+        table = arrow_schema().empty_table()
+        return table.select(columns) if columns else table
+    return pq.ParquetDataset(files).read(columns=columns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("compact", "summary"))
+    parser.add_argument("--dir", default=ANALYTICS_DIR)
+    args = parser.parse_args(argv)
+    if not module_available("pyarrow"):
+        print("pyarrow is required: pip install pyarrow", file=sys.stderr)
+        return 1
+    if args.command == "compact":
+        print(f"Compacted {compact(args.dir)} segment(s) in {args.dir}")
+    else:
+        counts = Counter(load_events(args.dir, ["event"]).column("event").to_pylist())
+        for event, count in counts.most_common():
+            print(f"{event:24} {count:>10,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
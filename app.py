@@ -1,28 +1,42 @@
 import streamlit as st
 import time
-import random
-import json
-from datetime import datetime, timedelta
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
-import io
-import base64
-from collections import defaultdict
-import hashlib
-
-# Try to import diffusion with comprehensive fallback
-try:
-    import torch
-    from diffusers import StableDiffusionPipeline
-    DIFFUSION_AVAILABLE = True
-    HAS_TORCH = True
-except ImportError:
-    try:
-        import torch
-        HAS_TORCH = True
-        DIFFUSION_AVAILABLE = False
-    except ImportError:
-        HAS_TORCH = False
-        DIFFUSION_AVAILABLE = False
+from datetime import datetime
+import functools
+import re
+import uuid
+import weakref
+import hmac
+import os
+from html import escape
+
+from image_cache import ImageCache, generation_key
+from instrumentation import REGISTRY, inc, instrument_markdown, span, start_metrics_server, timed
+from inference_server import INFERENCE_URL, RemoteGenerationQueue, remote_diffusion_available
+from media_store import MediaStore, media_url, start_media_server
+from level_packs import DEFAULT_PACK, PACK_NAME_PATTERN, PackRegistry, compact_html
+from analytics import ANALYTICS_ENABLED, EventLog, NullEventLog
+from leaderboard import Leaderboard, SQLiteLeaderboardStore, week_key
+from admission import AdmissionController, regenerate_energy
+from achievements import AchievementEngine, DailyLogin, ImageGenerated, PromptScored, detect_styles
+from challenges import ChallengeBoard
+from originality import OriginalityIndex
+from generation_queue import CANCELLED, FAILED, BatchingGenerationQueue, GenerationRequest
+from pipeline_manager import PipelineManager, diffusion_available
+from preview_renderer import render_preview
+from player_state import decode_player_state
+from progress_store import WriteBehindProgress, open_progress_store
+from progression import PROGRESSION
+from prompt_scoring import IncrementalScorer
+
+# torch/diffusers are only imported by the pipeline manager on the first
+# generation request; here we just probe whether they are installed
+@st.cache_resource(show_spinner=False)
+def get_diffusion_available():
+    """Whether generation can run diffusion here, or on the inference server when one is configured"""
+    # With an inference server configured this worker never loads the model itself
+    return remote_diffusion_available(INFERENCE_URL) if INFERENCE_URL else diffusion_available()
+
+DIFFUSION_AVAILABLE = get_diffusion_available()
 
 # Configure Streamlit for production
 st.set_page_config(
@@ -32,239 +46,320 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# ===== COMPLETE 8-LEVEL SYSTEM =====
-LEVELS = {
-    1: {
-        "title": "Word Discovery", "icon": "🧙‍♂️", "theme_color": "#FF6B9D",
-        "description": "Master basic vocabulary and word-image relationships",
-        "learning_focus": "Understanding how words translate to visual elements",
-        "what_to_do": "Learn how individual words create visual magic! Start with simple, positive words that paint clear pictures in your mind.",
-        "how_to_do": "Use simple words like 'bright', 'magical', 'sparkle'. Focus on what you WANT to see, not what you don't want. Keep it under 6 words. Think like you're describing a scene to a friend.",
-        "step_by_step": [
-            "Pick a main subject (cat, dragon, castle)",
-            "Add 2-3 descriptive words (magical, bright, colorful)",
-            "Include at least one required keyword",
-            "Keep it positive and clear",
-            "Hit generate and see your creation!"
-        ],
-        "required_keywords": ["simple", "clear", "basic"],
-        "bonus_keywords": ["bright", "colorful", "happy", "cute", "small", "large"],
-        "secret_keywords": ["sparkle", "glow", "magical"],
-        "negative_prompts": ["blurry", "ugly", "distorted"],
-        "min_xp_to_pass": 100, "base_xp": 50, "bonus_xp": 20, "secret_xp": 50,
-        "max_words": 6, "difficulty_stars": 1,
-        "techniques": ["Positive prompting", "Basic descriptors", "Word prioritization"],
-        "example_prompt": "A simple magical cat with bright colorful sparkles",
-        "tutorial": "Start with simple, positive descriptions. Focus on what you WANT to see, not what you don't want."
-    },
-    2: {
-        "title": "Scene Architecture", "icon": "🏗️", "theme_color": "#4ECDC4",
-        "description": "Build complete scenes with Subject + Action + Setting structure",
-        "learning_focus": "Creating coherent visual narratives",
-        "what_to_do": "Build complete movie-like scenes! Learn the secret formula: WHO + WHAT + WHERE to create amazing visual stories.",
-        "how_to_do": "Pick your main character (WHO). Choose what they're doing (WHAT). Set the location (WHERE). Use scene-building keywords to enhance.",
-        "step_by_step": [
-            "Choose your main subject (dragon, princess, warrior)",
-            "Add an action (flying, dancing, fighting)",
-            "Set the scene (forest, castle, beach)",
-            "Use required keywords like 'scene', 'setting'",
-            "Make it mysterious with bonus words!"
-        ],
-        "required_keywords": ["scene", "setting", "environment"],
-        "bonus_keywords": ["garden", "forest", "castle", "beach", "mountain", "city"],
-        "secret_keywords": ["hidden", "mysterious", "ancient"],
-        "negative_prompts": ["empty", "boring", "plain"],
-        "min_xp_to_pass": 150, "base_xp": 70, "bonus_xp": 25, "secret_xp": 60,
-        "max_words": 10, "difficulty_stars": 2,
-        "techniques": ["Scene composition", "Environmental storytelling", "Action integration"],
-        "example_prompt": "A mysterious ancient forest scene with hidden magical creatures dancing",
-        "tutorial": "Use the formula: Subject + Action + Setting. Example: 'Dragon flying over mountain castle'"
-    },
-    3: {
-        "title": "Visual Control", "icon": "📸", "theme_color": "#9B59B6",
-        "description": "Master lighting, camera angles, and lens techniques",
-        "learning_focus": "Technical photography and cinematography concepts",
-        "what_to_do": "Become the director! Control lighting, camera angles, and visual effects like a movie director to create stunning, professional-looking images.",
-        "how_to_do": "Choose your lighting (golden hour, dramatic, soft). Pick camera angle (close-up, wide angle, macro). Add technical terms for quality. Think like a photographer!",
-        "step_by_step": [
-            "Start with your subject",
-            "Add lighting keywords (golden hour, dramatic)",
-            "Choose camera angle (macro, wide angle, close-up)",
-            "Include technical terms (professional, cinematic)",
-            "Combine all for movie-quality results!"
-        ],
-        "required_keywords": ["lighting", "angle", "lens"],
-        "bonus_keywords": ["golden hour", "dramatic", "soft light", "wide angle", "macro", "close-up"],
-        "secret_keywords": ["cinematic", "professional", "award-winning"],
-        "negative_prompts": ["dark", "harsh shadows", "overexposed"],
-        "min_xp_to_pass": 200, "base_xp": 90, "bonus_xp": 30, "secret_xp": 70,
-        "max_words": 12, "difficulty_stars": 3,
-        "techniques": ["Lighting control", "Camera positioning", "Lens selection"],
-        "example_prompt": "Professional macro lens close-up with soft golden hour lighting, cinematic angle",
-        "tutorial": "Control your 'camera': golden hour = warm light, wide angle = expansive view, macro = extreme close-up"
-    },
-    4: {
-        "title": "Style Mastery", "icon": "🎨", "theme_color": "#E74C3C",
-        "description": "Apply artistic movements and stylistic direction",
-        "learning_focus": "Art history and aesthetic choices",
-        "what_to_do": "Become an art historian! Learn to apply famous art styles like Picasso, Van Gogh, or futuristic cyberpunk to transform your images into masterpieces.",
-        "how_to_do": "Choose an art style (impressionist, cyberpunk, minimalist). Add style-specific keywords. Include quality terms. Reference famous art movements.",
-        "step_by_step": [
-            "Pick your base subject",
-            "Choose an art movement (impressionist, baroque, modern)",
-            "Add style keywords that match the movement",
-            "Include gallery/museum quality terms",
-            "Create your artistic masterpiece!"
-        ],
-        "required_keywords": ["style", "art", "aesthetic"],
-        "bonus_keywords": ["impressionist", "cyberpunk", "minimalist", "baroque", "renaissance", "modern"],
-        "secret_keywords": ["masterpiece", "gallery", "museum"],
-        "negative_prompts": ["amateur", "low quality", "generic"],
-        "min_xp_to_pass": 250, "base_xp": 110, "bonus_xp": 35, "secret_xp": 80,
-        "max_words": 15, "difficulty_stars": 4,
-        "techniques": ["Art movement integration", "Style consistency", "Aesthetic coherence"],
-        "example_prompt": "Impressionist style masterpiece painting with vibrant colors, museum gallery quality",
-        "tutorial": "Reference art movements: 'impressionist' = soft brushstrokes, 'cyberpunk' = neon + tech, 'minimalist' = clean + simple"
-    },
-    5: {
-        "title": "Technical Precision", "icon": "⚙️", "theme_color": "#F39C12",
-        "description": "Advanced parameters, negative prompts, and quality control",
-        "learning_focus": "Technical optimization and parameter control",
-        "what_to_do": "Master the technical side! Learn advanced techniques like negative prompting and quality parameters to create flawless, professional-grade images.",
-        "how_to_do": "Use technical quality terms (4k, ultra-detailed, sharp). Learn negative prompting to remove unwanted elements. Add precision words for clarity.",
-        "step_by_step": [
-            "Start with your main concept",
-            "Add quality enhancers (4k, ultra-detailed, sharp)",
-            "Include precision terms (technically perfect, flawless)",
-            "Use negative prompts to avoid unwanted elements",
-            "Create studio-quality masterpieces!"
-        ],
-        "required_keywords": ["detailed", "quality", "precise"],
-        "bonus_keywords": ["4k", "ultra-detailed", "high-resolution", "sharp", "crisp", "perfect"],
-        "secret_keywords": ["technically perfect", "flawless", "studio quality"],
-        "negative_prompts": ["blurry", "pixelated", "low quality", "amateur"],
-        "min_xp_to_pass": 300, "base_xp": 130, "bonus_xp": 40, "secret_xp": 90,
-        "max_words": 18, "difficulty_stars": 5,
-        "techniques": ["Negative prompting", "Quality enhancement", "Parameter optimization"],
-        "example_prompt": "Ultra-detailed 4k studio quality portrait, technically perfect lighting, crisp sharp focus",
-        "tutorial": "Use negative prompts to remove unwanted elements. Add quality words: '4k', 'detailed', 'sharp'"
-    },
-    6: {
-        "title": "Creative Formulas", "icon": "🔮", "theme_color": "#8E44AD",
-        "description": "Advanced prompt patterns and creative techniques",
-        "learning_focus": "Creative pattern recognition and innovation",
-        "what_to_do": "Unlock creative genius! Learn advanced prompt formulas and patterns to create surreal, imaginative, and groundbreaking artistic concepts.",
-        "how_to_do": "Use creative formulas like '[Object] made of [Material]' or '[Emotion] as [Physical form]'. Experiment with surreal combinations and abstract concepts.",
-        "step_by_step": [
-            "Choose your creative formula pattern",
-            "Pick unusual material combinations",
-            "Add conceptual or abstract elements",
-            "Include innovative breakthrough terms",
-            "Push the boundaries of imagination!"
-        ],
-        "required_keywords": ["creative", "innovative", "unique"],
-        "bonus_keywords": ["surreal", "imaginative", "artistic", "conceptual", "abstract", "experimental"],
-        "secret_keywords": ["breakthrough", "revolutionary", "groundbreaking"],
-        "negative_prompts": ["ordinary", "boring", "typical"],
-        "min_xp_to_pass": 350, "base_xp": 150, "bonus_xp": 45, "secret_xp": 100,
-        "max_words": 20, "difficulty_stars": 6,
-        "techniques": ["Creative formulas", "Pattern innovation", "Conceptual thinking"],
-        "example_prompt": "Surreal conceptual art: clock made of flowing water, innovative groundbreaking artistic vision",
-        "tutorial": "Use creative formulas: '[Object] made of [Material]', '[Emotion] as [Physical form]', '[Abstract] in [Real setting]'"
-    },
-    7: {
-        "title": "Professional Workflows", "icon": "💼", "theme_color": "#2C3E50",
-        "description": "Mood boards, iteration, and brand consistency",
-        "learning_focus": "Professional application and workflow management",
-        "what_to_do": "Think like a professional designer! Learn to create consistent brand imagery, mood boards, and systematic workflows for commercial projects.",
-        "how_to_do": "Plan your visual story. Create series of consistent images. Use systematic approach. Think about brand identity and commercial applications.",
-        "step_by_step": [
-            "Define your brand or project concept",
-            "Create consistent visual themes",
-            "Use systematic workflow approaches",
-            "Include professional industry terms",
-            "Build commercial-grade image series!"
-        ],
-        "required_keywords": ["professional", "consistent", "workflow"],
-        "bonus_keywords": ["mood board", "brand", "coherent", "systematic", "strategic", "planned"],
-        "secret_keywords": ["industry standard", "commercial grade", "enterprise"],
-        "negative_prompts": ["inconsistent", "random", "unplanned"],
-        "min_xp_to_pass": 400, "base_xp": 170, "bonus_xp": 50, "secret_xp": 110,
-        "max_words": 25, "difficulty_stars": 7,
-        "techniques": ["Mood board creation", "Brand consistency", "Workflow optimization"],
-        "example_prompt": "Professional brand-consistent mood board series, systematic workflow, industry standard commercial quality",
-        "tutorial": "Think like a pro: maintain consistency across images, plan your visual story, create series not singles"
-    },
-    8: {
-        "title": "Master Certification", "icon": "👑", "theme_color": "#C0392B",
-        "description": "Portfolio creation and advanced challenges",
-        "learning_focus": "Mastery demonstration and portfolio development",
-        "what_to_do": "Achieve mastery! Create your signature style, build an impressive portfolio, and demonstrate expert-level prompt engineering skills across all domains.",
-        "how_to_do": "Combine all techniques learned. Develop your unique artistic voice. Create portfolio-worthy pieces. Show virtuoso-level skills and innovation.",
-        "step_by_step": [
-            "Combine techniques from all previous levels",
-            "Develop your unique signature style",
-            "Create portfolio-quality masterpieces",
-            "Include legendary and iconic terms",
-            "Achieve prompt engineering mastery!"
-        ],
-        "required_keywords": ["master", "expert", "portfolio"],
-        "bonus_keywords": ["signature", "acclaimed", "renowned", "virtuoso", "exemplary", "extraordinary"],
-        "secret_keywords": ["legendary", "iconic", "timeless"],
-        "negative_prompts": ["novice", "basic", "beginner"],
-        "min_xp_to_pass": 500, "base_xp": 200, "bonus_xp": 60, "secret_xp": 150,
-        "max_words": 30, "difficulty_stars": 8,
-        "techniques": ["Portfolio curation", "Style signature", "Mastery demonstration"],
-        "example_prompt": "Legendary master portfolio piece: iconic timeless artwork showcasing virtuoso technique and extraordinary vision",
-        "tutorial": "Create your signature style. Combine all techniques you've learned. Show your unique artistic voice."
-    }
-}
+# ===== INSTRUMENTATION =====
+# Admin panel access: ?admin=<PROMPT_MASTER_ADMIN_TOKEN>; disabled when unset
+ADMIN_TOKEN = os.environ.get("PROMPT_MASTER_ADMIN_TOKEN", "")
 
-# ===== ACHIEVEMENTS SYSTEM =====
-ACHIEVEMENTS = {
-    "first_steps": {"name": "First Steps", "icon": "👶", "desc": "Created your first prompt", "xp": 25},
-    "word_collector": {"name": "Word Collector", "icon": "📚", "desc": "Used 25+ unique keywords", "xp": 100},
-    "secret_hunter": {"name": "Secret Hunter", "icon": "🔍", "desc": "Found 5 secret keywords", "xp": 150},
-    "combo_master": {"name": "Combo Master", "icon": "🔥", "desc": "Achieved 5x combo streak", "xp": 200},
-    "style_explorer": {"name": "Style Explorer", "icon": "🎨", "desc": "Tried 10 different art styles", "xp": 175},
-    "technical_expert": {"name": "Technical Expert", "icon": "⚙️", "desc": "Mastered negative prompting", "xp": 225},
-    "creative_genius": {"name": "Creative Genius", "icon": "🧠", "desc": "Created 10 innovative prompts", "xp": 300},
-    "speed_demon": {"name": "Speed Demon", "icon": "⚡", "desc": "Generated 10 images in 10 minutes", "xp": 150},
-    "perfectionist": {"name": "Perfectionist", "icon": "💎", "desc": "Got perfect scores on 3 levels", "xp": 250},
-    "daily_warrior": {"name": "Daily Warrior", "icon": "🗡️", "desc": "7-day login streak", "xp": 400},
-    "master_teacher": {"name": "Master Teacher", "icon": "🎓", "desc": "Completed all 8 levels", "xp": 1000}
-}
+@st.cache_resource(show_spinner=False)
+def get_metrics_server():
+    """Prometheus /metrics endpoint for this process"""
+    return start_metrics_server()
+
+get_metrics_server()
+instrument_markdown(st)
 
 # ===== SESSION STATE MANAGEMENT =====
 def initialize_comprehensive_session_state():
-    """Initialize all session state variables"""
+    """Initialize session-only UI state; player progress lives in a PlayerState"""
     defaults = {
-        'current_level': 1, 'total_xp': 0, 'completed_levels': set(), 'selected_level': None,
-        'achievements': set(), 'daily_streak': 1, 'coins': 200, 'gems': 5, 'energy': 100, 'max_energy': 100,
-        'combo_streak': 0, 'max_combo': 0, 'keywords_discovered': set(), 'secret_keywords_found': set(),
-        'images_generated_today': 0, 'generated_images': {}, 'current_generation_key': None,
-        'last_play_date': datetime.now().date(), 'session_start': datetime.now(),
-        'techniques_learned': set(), 'styles_tried': set(), 'perfect_scores': 0,
-        'user_portfolio': [], 'learning_path': [], 'tutorial_completed': set(),
-        'daily_challenges': {}, 'weekly_quest_progress': 0, 'rank': 'Novice',
-        'total_playtime': 0, 'prompt_quality_scores': [], 'favorite_styles': defaultdict(int),
-        'technique_mastery': defaultdict(int), 'creative_challenges_completed': 0,
-        'model_loaded': False, 'generation_mode': 'auto'
+        'selected_level': None, 'generation_mode': 'auto', 'live_scorers': {},
+        'generation_job': None
     }
     
     for key, value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
 
+# ===== PERSISTENT PROGRESS =====
+@st.cache_resource(show_spinner=False)
+def get_progress_writer():
+    """Write-behind progress store shared by every session in this process"""
+    return WriteBehindProgress(open_progress_store())
+
+def get_player_id():
+    """Stable player id carried in the ?player= URL parameter"""
+    if hasattr(st, "query_params"):
+        player_id = st.query_params.get("player")
+        if not player_id:
+            player_id = uuid.uuid4().hex
+            st.query_params["player"] = player_id
+        return player_id
+    
+    params = st.experimental_get_query_params()
+    player_id = params.get("player", [None])[0]
+    if not player_id:
+        player_id = uuid.uuid4().hex
+        st.experimental_set_query_params(**{**params, "player": player_id})
+    return player_id
+
+class _SessionEndMarker:
+    """Lives in session_state; its finalizer flushes progress when the session is dropped"""
+
+def load_player_progress():
+    """Restore saved progress once per session"""
+    if 'player' in st.session_state:
+        return
+    player_id = get_player_id()
+    writer = get_progress_writer()
+    document = writer.load(player_id)
+    player = decode_player_state(document)
+    st.session_state.player_id = player_id
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.player = player
+    st.session_state.saved_progress = player.to_bytes()
+    st.session_state.session_end_marker = marker = _SessionEndMarker()
+    weakref.finalize(marker, writer.flush)
+    st.session_state.cohort = get_cohort(player_id)
+    st.session_state.pack_name = get_pack_name()
+    update_leaderboard()
+    log_event("session_start", returning=document is not None, total_xp=player.total_xp)
+
+def save_player_progress():
+    """Stage this session's progress if it changed; the writer flushes in batches"""
+    document = st.session_state.player.to_bytes()
+    if document != st.session_state.saved_progress:
+        get_progress_writer().stage(st.session_state.player_id, document)
+        st.session_state.saved_progress = document
+        update_leaderboard()
+
+# ===== LEARNING ANALYTICS =====
+@st.cache_resource(show_spinner=False)
+def get_event_log():
+    """Process-wide append-only analytics log; recording never blocks the script"""
+    return EventLog() if ANALYTICS_ENABLED else NullEventLog()
+
+def log_event(event, level=None, prompt=None, value=None, **detail):
+    """Record an analytics event for this session"""
+    get_event_log().record(
+        event, session_id=st.session_state.get('session_id'), player_id=st.session_state.get('player_id'),
+        level=level, prompt=prompt, value=value, **detail
+    )
+
+# ===== LEVEL PACKS =====
+@st.cache_resource(show_spinner=False)
+def get_pack_registry():
+    """Compiled level packs shared by every session, reloaded when their files change"""
+    return PackRegistry()
+
+def get_pack_name():
+    """Curriculum from ?pack=, else the deployment default"""
+    if hasattr(st, "query_params"):
+        name = st.query_params.get("pack")
+    else:
+        name = st.experimental_get_query_params().get("pack", [None])[0]
+    return name if name and PACK_NAME_PATTERN.fullmatch(name) else DEFAULT_PACK
+
+def current_pack():
+    """Latest good version of this session's level pack"""
+    try:
+        return get_pack_registry().get(st.session_state.pack_name)
+    except KeyError:
+        st.session_state.pack_name = DEFAULT_PACK
+        return get_pack_registry().get(DEFAULT_PACK)
+
+# ===== LEADERBOARD =====
+LEADERBOARD_SIZE = 10
+LEADERBOARD_NEIGHBORS = 2
+COHORT_MAX_LENGTH = 40
+
+@st.cache_resource(show_spinner=False)
+def get_leaderboard():
+    """Ranked all-time and weekly boards shared by every session in this process"""
+    return Leaderboard(SQLiteLeaderboardStore())
+
+def get_cohort(player_id):
+    """Class or group code from ?cohort=, else the one remembered for this player"""
+    if hasattr(st, "query_params"):
+        cohort = st.query_params.get("cohort")
+    else:
+        cohort = st.experimental_get_query_params().get("cohort", [None])[0]
+    return (cohort or "").strip()[:COHORT_MAX_LENGTH] or get_leaderboard().cohort_of(player_id)
+
+def update_leaderboard():
+    """Move this player on every board they belong to (no-op when XP is unchanged)"""
+    get_leaderboard().update(
+        st.session_state.player_id, st.session_state.player.total_xp, cohort=st.session_state.cohort
+    )
+
+def leaderboard_rows_html(entries, player_id):
+    return "".join(
+        f'<tr style="color: {"#39ff14" if entry.player_id == player_id else "#ffffff"};">'
+        f'<td style="padding: 0.3rem 1rem;">#{entry.rank}</td>'
+        f'<td style="padding: 0.3rem 1rem;">{"YOU" if entry.player_id == player_id else entry.name}</td>'
+        f'<td style="padding: 0.3rem 1rem; text-align: right;">{entry.xp:,} XP</td></tr>'
+        for entry in entries
+    )
+
+@timed()
+def render_leaderboard():
+    """Top players and the player's own neighbourhood on the chosen board"""
+    leaderboard = get_leaderboard()
+    leaderboard.sync()
+    player_id = st.session_state.player_id
+    
+    st.markdown("### 🏅 **LEADERBOARD**")
+    cols = st.columns(2)
+    period = cols[0].radio("PERIOD", ["ALL TIME", "THIS WEEK"], horizontal=True, key="leaderboard_period")
+    scopes = ["EVERYONE"] + ([f"COHORT {st.session_state.cohort}"] if st.session_state.cohort else [])
+    scope = cols[1].radio("PLAYERS", scopes, horizontal=True, key="leaderboard_scope")
+    week = week_key() if period == "THIS WEEK" else None
+    cohort = st.session_state.cohort if scope != "EVERYONE" else None
+    
+    entries = leaderboard.top(LEADERBOARD_SIZE, cohort=cohort, week=week)
+    mine = leaderboard.rank(player_id, cohort=cohort, week=week)
+    if mine is not None and all(entry.player_id != player_id for entry in entries):
+        shown = {entry.player_id for entry in entries}
+        entries += [
+            entry for entry in leaderboard.neighbors(
+                player_id, LEADERBOARD_NEIGHBORS, LEADERBOARD_NEIGHBORS, cohort=cohort, week=week
+            )
+            if entry.player_id not in shown
+        ]
+    if not entries:
+        st.info("🏁 NO SCORES ON THIS BOARD YET - BE THE FIRST!")
+        return
+    
+    standing = (f"YOUR RANK: #{mine.rank} OF {leaderboard.size(cohort, week):,}" if mine
+                else "EARN XP TO JOIN THIS BOARD")
+    st.markdown(compact_html(f"""
+    <div style="background: rgba(0,0,0,0.9); border: 2px solid #00ffff; padding: 1rem; font-family: 'Orbitron', monospace;">
+        <div style="color: #ffff00; font-weight: 700; margin-bottom: 0.5rem;">{standing}</div>
+        <table style="width: 100%; border-collapse: collapse;">{leaderboard_rows_html(entries, player_id)}</table>
+    </div>
+    """), unsafe_allow_html=True)
+
+# ===== ORIGINALITY =====
+@st.cache_resource(show_spinner=False)
+def get_originality_index():
+    """Near-duplicate index over every prompt scored in this process, seeded from the analytics log"""
+    index = OriginalityIndex()
+    if ANALYTICS_ENABLED:
+        index.warm_from_analytics()
+    return index
+
+# ===== DAILY CHALLENGES =====
+@st.cache_resource(show_spinner=False)
+def get_challenge_board():
+    """Each day's seeded challenges and weekly quests, built once per process for every player"""
+    return ChallengeBoard()
+
+def todays_challenges():
+    return get_challenge_board().for_day(current_pack(), datetime.now().date())
+
+def challenge_rows_html(challenges, progress):
+    rows = []
+    for challenge in challenges:
+        value = progress.get(challenge.id, 0)
+        done = value >= challenge.target
+        rows.append(
+            f'<tr style="color: {"#39ff14" if done else "#ffffff"};">'
+            f'<td style="padding: 0.3rem 1rem;">{"✅" if done else challenge.icon} {escape(challenge.title)}</td>'
+            f'<td style="padding: 0.3rem 1rem; text-align: right;">{value}/{challenge.target}</td>'
+            f'<td style="padding: 0.3rem 1rem; text-align: right; color: #ffff00;">+{challenge.xp} XP • +{challenge.coins} 💰</td></tr>'
+        )
+    return "".join(rows)
+
+@timed()
+def render_daily_challenges():
+    """Today's challenges and this week's quests with the player's progress"""
+    challenge_set = todays_challenges()
+    progress = st.session_state.player.daily_challenges
+    st.markdown("### 📅 **DAILY CHALLENGES**")
+    st.markdown(compact_html(f"""
+    <div style="background: rgba(0,0,0,0.9); border: 2px solid #ff0080; padding: 1rem; font-family: 'Orbitron', monospace;">
+        <div style="color: #ffff00; font-weight: 700; margin-bottom: 0.5rem;">TODAY: {challenge_set.completed(progress, weekly=False)}/{len(challenge_set.daily)} COMPLETE</div>
+        <table style="width: 100%; border-collapse: collapse;">{challenge_rows_html(challenge_set.daily, progress)}</table>
+        <div style="color: #ffff00; font-weight: 700; margin: 1rem 0 0.5rem;">WEEKLY QUESTS: {challenge_set.completed(progress, weekly=True)}/{len(challenge_set.weekly)} COMPLETE</div>
+        <table style="width: 100%; border-collapse: collapse;">{challenge_rows_html(challenge_set.weekly, progress)}</table>
+    </div>
+    """), unsafe_allow_html=True)
+
 initialize_comprehensive_session_state()
+load_player_progress()
+
+# ===== SHARED DIFFUSION MODEL =====
+@st.cache_resource(show_spinner=False)
+def get_pipeline_manager():
+    """One diffusion pipeline manager per process, shared by every session"""
+    return PipelineManager()
+
+@st.cache_resource(show_spinner=False)
+def get_generation_queue():
+    """Process-wide queue that merges concurrent clicks into batched diffusion calls"""
+    if INFERENCE_URL:
+        return RemoteGenerationQueue(INFERENCE_URL)
+    return BatchingGenerationQueue(get_pipeline_manager().generate)
+
+@st.cache_resource(show_spinner=False)
+def get_media_store():
+    """Content-addressed image files plus the HTTP endpoint the browser loads them from"""
+    store = MediaStore()
+    if not INFERENCE_URL:
+        # In multi-worker mode the inference server serves the shared store
+        start_media_server(store)
+    return store
+
+# Started eagerly so a misconfigured media URL fails at startup, not on the first image
+get_media_store()
+
+@st.cache_resource(show_spinner=False)
+def get_image_cache():
+    """Generated images shared across sessions, keyed by prompt and parameters"""
+    return ImageCache(get_media_store())
+
+GENERATION_STEPS = 20
+GENERATION_SEED = 0
+IMAGE_SIZE = 512
+GALLERY_THUMBNAIL_SIZE = 128
+GALLERY_LENGTH = 6
+
+# ===== STORED IMAGES =====
+# Images are referenced by digest and loaded by the browser from the media
+# endpoint, so reruns never resend image bytes over the websocket.
+def show_stored_image(digest, caption):
+    """Show a stored image; clicking opens the full-size file"""
+    st.markdown(compact_html(f"""
+    <a href="{media_url(digest)}" target="_blank">
+        <img src="{media_url(digest)}" alt="{escape(caption)}" style="width:100%; border-radius:8px;">
+    </a>
+    <div style="text-align:center; color:#cccccc; font-size:0.9rem;">{escape(caption)}</div>
+    """), unsafe_allow_html=True)
+
+def show_recent_creations():
+    """Thumbnail strip of the player's latest images, linked to the full-size files"""
+    digests = list(st.session_state.player.generated_images)[-GALLERY_LENGTH:]
+    if not digests:
+        return
+    thumbnails = "".join(
+        f'<a href="{media_url(digest)}" target="_blank">'
+        f'<img src="{media_url(digest, GALLERY_THUMBNAIL_SIZE)}" loading="lazy" '
+        f'width="{GALLERY_THUMBNAIL_SIZE}" height="{GALLERY_THUMBNAIL_SIZE}" style="border-radius:6px;"></a>'
+        for digest in reversed(digests)
+    )
+    st.markdown("### 🖼️ **RECENT CREATIONS**")
+    st.markdown(f'<div style="display:flex; gap:0.5rem; flex-wrap:wrap;">{thumbnails}</div>', unsafe_allow_html=True)
 
 # ===== FIXED GAMING CSS WITH BETTER CONTRAST =====
-def apply_gaming_ui_css():
-    """Apply gaming-focused CSS with excellent text visibility"""
-    st.markdown("""
+# Subsetted WOFF2 files written by build_fonts.py, served by Streamlit from static/
+FONTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "fonts")
+UI_FONTS = {"Orbitron": ("400 900", "orbitron.woff2"), "Exo 2": ("300 900", "exo2.woff2")}
+
+def font_face_css():
+    """@font-face rules: an installed copy first, then the self-hosted subset once it is built and served"""
+    serving = st.get_option("server.enableStaticServing")
+    rules = []
+    for family, (weights, filename) in UI_FONTS.items():
+        sources = [f"local('{family}')"]
+        if serving and os.path.isfile(os.path.join(FONTS_DIR, filename)):
+            sources.append(f"url('app/static/fonts/{filename}') format('woff2')")
+        rules.append(
+            f"@font-face {{ font-family: '{family}'; src: {', '.join(sources)}; "
+            f"font-weight: {weights}; font-display: swap; }}"
+        )
+    return "\n".join(rules)
+
+GAMING_CSS = """
     <style>
-    @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@400;700;900&family=Exo+2:wght@300;400;600;700;900&family=Rajdhani:wght@300;400;600;700&display=swap');
-    
     /* Gaming color palette */
     :root {
         --neon-blue: #00ffff;
@@ -721,64 +816,72 @@ def apply_gaming_ui_css():
     }
     
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+@functools.lru_cache(maxsize=None)
+def minified_gaming_css():
+    """Strip comments and indentation from the stylesheet once per process"""
+    css = re.sub(r"/\*.*?\*/", "", GAMING_CSS, flags=re.S)
+    css = re.sub(r"\s*\n\s*", "\n", css)
+    css = re.sub(r"\n+", "\n", css).strip()
+    return css.replace("<style>", "<style>\n" + font_face_css(), 1)
+
+@timed()
+def apply_gaming_ui_css():
+    """Apply gaming-focused CSS with excellent text visibility"""
+    st.markdown(minified_gaming_css(), unsafe_allow_html=True)
 
 apply_gaming_ui_css()
 
 # ===== GAMING UI COMPONENTS =====
+@timed()
 def create_gaming_header():
     """Create epic gaming-style header"""
-    current_rank = calculate_user_rank()
+    current_rank = player_standing().label
     
     st.markdown(f"""
     <div class="gaming-hud-header">
         <div class="header-content">
             <h1 class="gaming-title">AI PROMPT MASTER</h1>
             <div style="font-family: 'Orbitron', monospace; font-size: 1.5rem; color: #ffffff; text-shadow: 0 0 3px #000000, 0 0 6px #000000, 0 0 10px #00ffff; margin-top: 1rem; font-weight: 700;">
-                LEVEL {st.session_state.current_level} • {current_rank} • {st.session_state.total_xp:,} XP
+                LEVEL {st.session_state.player.current_level} • {current_rank} • {st.session_state.player.total_xp:,} XP
             </div>
             <div style="font-size: 1.2rem; color: #ffffff; margin-top: 0.5rem; text-shadow: 0 0 3px #000000; font-weight: 600;">
-                {'🤖 AI READY' if st.session_state.model_loaded else '🎨 PREVIEW MODE'} • 
-                STREAK: {st.session_state.daily_streak} DAYS
+                {'🤖 AI READY' if DIFFUSION_AVAILABLE else '🎨 PREVIEW MODE'} • 
+                STREAK: {st.session_state.player.daily_streak} DAYS
             </div>
         </div>
     </div>
     """, unsafe_allow_html=True)
 
+@timed()
 def create_gaming_stats_hud():
     """Create gaming HUD-style stats bar"""
     
     stats = [
-        ("💎", st.session_state.gems, "GEMS", "#ff0080"),
-        ("🪙", st.session_state.coins, "COINS", "#ffff00"),
-        ("⚡", st.session_state.energy, "ENERGY", "#39ff14"),
-        ("🔥", st.session_state.combo_streak, "COMBO", "#ff4500"),
-        ("🏆", len(st.session_state.achievements), "ACHIEVEMENTS", "#00ffff"),
-        ("🎯", st.session_state.total_xp, "TOTAL XP", "#ff69b4")
+        ("💎", st.session_state.player.gems, "GEMS", "#ff0080"),
+        ("🪙", st.session_state.player.coins, "COINS", "#ffff00"),
+        ("⚡", st.session_state.player.energy, "ENERGY", "#39ff14"),
+        ("🔥", st.session_state.player.combo_streak, "COMBO", "#ff4500"),
+        ("🏆", len(st.session_state.player.achievements), "ACHIEVEMENTS", "#00ffff"),
+        ("🎯", st.session_state.player.total_xp, "TOTAL XP", "#ff69b4")
     ]
     
-    st.markdown('<div class="gaming-stats-hud">', unsafe_allow_html=True)
-    
-    for icon, value, label, color in stats:
-        st.markdown(f"""
-        <div class="stat-hud-item">
-            <span class="stat-icon" style="color: {color};">{icon}</span>
-            <div class="stat-value" style="color: {color};">{value}</div>
-            <div class="stat-label">{label}</div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    st.markdown('</div>', unsafe_allow_html=True)
+    items = "".join(
+        f'<div class="stat-hud-item"><span class="stat-icon" style="color: {color};">{icon}</span>'
+        f'<div class="stat-value" style="color: {color};">{value}</div><div class="stat-label">{label}</div></div>'
+        for icon, value, label, color in stats
+    )
     
     # Enhanced XP Progress Bar
-    current_xp = st.session_state.total_xp
-    next_rank_xp = get_next_rank_xp()
-    current_rank_xp = get_current_rank_base_xp(next_rank_xp)
-    
-    progress = (current_xp - current_rank_xp) / (next_rank_xp - current_rank_xp)
-    progress = max(0, min(1, progress))
-    
-    st.markdown(f"""
+    current_xp = st.session_state.player.total_xp
+    standing = player_standing()
+    next_rank_xp = standing.ceiling
+    progress = standing.progress
+    
+    # Stats bar and XP bar go out as one element
+    st.markdown(compact_html(f"""
+    <div class="gaming-stats-hud">{items}</div>
     <div class="gaming-xp-container">
         <div style="font-family: 'Orbitron', monospace; color: #ffffff; font-weight: 700; margin-bottom: 1rem; text-align: center; font-size: 1.2rem; text-shadow: 0 0 3px #000000, 0 0 6px #000000, 0 0 10px #00ffff;">
             RANK PROGRESS: {current_xp:,} / {next_rank_xp:,} XP ({int(progress * 100)}%)
@@ -787,20 +890,30 @@ def create_gaming_stats_hud():
             <div class="gaming-xp-bar" style="width: {progress * 100}%;"></div>
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """), unsafe_allow_html=True)
 
-def create_gaming_level_grid():
-    """Create gaming-style level selection grid"""
-    st.markdown("## 🗺️ **TRAINING ARENA**")
-    
-    # Progress overview
-    completed = len(st.session_state.completed_levels)
-    progress_percentage = (completed / len(LEVELS)) * 100
+# ===== STATIC HTML FRAGMENTS =====
+# Level cards and explanations are rendered when a pack is compiled; the grid
+# only depends on the pack version and a handful of progress values.
+@functools.lru_cache(maxsize=256)
+def level_grid_html(pack, current_level, completed_levels):
+    """Mastery overview plus every level card for one pack version and progress state"""
+    completed = len(completed_levels & pack.levels.keys())
+    progress_percentage = (completed / len(pack.levels)) * 100
+    
+    cards = []
+    for level_id in pack.levels:
+        if level_id in completed_levels:
+            cards.append(pack.card_html[(level_id, "completed")])
+        elif level_id <= current_level:
+            cards.append(pack.card_html[(level_id, "available")])
+        else:
+            cards.append(pack.card_html[(level_id, "locked")])
     
-    st.markdown(f"""
+    return compact_html(f"""
     <div style="text-align: center; margin: 2rem 0; background: rgba(0,0,0,0.95); padding: 2rem; border: 3px solid #00ffff;">
         <h3 style="color: #ffffff; margin-bottom: 1rem; font-family: 'Orbitron', monospace; font-size: 1.8rem; text-shadow: 0 0 3px #000000, 0 0 6px #000000, 0 0 10px #00ffff;">🌟 MASTERY PROGRESS</h3>
-        <div style="font-size: 4rem; font-weight: 900; color: #39ff14; margin: 1rem 0; font-family: 'Orbitron', monospace; text-shadow: 0 0 3px #000000, 0 0 6px #000000, 0 0 15px #39ff14;">{completed}/{len(LEVELS)}</div>
+        <div style="font-size: 4rem; font-weight: 900; color: #39ff14; margin: 1rem 0; font-family: 'Orbitron', monospace; text-shadow: 0 0 3px #000000, 0 0 6px #000000, 0 0 15px #39ff14;">{completed}/{len(pack.levels)}</div>
         <div style="margin: 1rem 0;">
             <div style="background: rgba(0,0,0,0.9); height: 25px; overflow: hidden; position: relative; border: 2px solid #39ff14;">
                 <div style="background: linear-gradient(90deg, #00ffff, #39ff14); height: 100%; width: {progress_percentage}%; transition: width 1s ease;"></div>
@@ -808,161 +921,339 @@ def create_gaming_level_grid():
         </div>
         <p style="color: #ffffff; font-size: 1.2rem; font-weight: 600; text-shadow: 0 0 3px #000000;">COMPLETION: {progress_percentage:.0f}%</p>
     </div>
-    """, unsafe_allow_html=True)
-    
-    # Level cards grid
-    st.markdown('<div class="gaming-level-grid">', unsafe_allow_html=True)
-    
-    for level_id, level_data in LEVELS.items():
-        is_unlocked = level_id <= st.session_state.current_level
-        is_completed = level_id in st.session_state.completed_levels
-        
-        card_class = "gaming-level-card"
-        if is_completed:
-            card_class += " completed"
-            status_text = "MASTERED"
-            status_color = "#39ff14"
-        elif is_unlocked:
-            status_text = "AVAILABLE"
-            status_color = "#00ffff"
-        else:
-            card_class += " locked"
-            status_text = "LOCKED"
-            status_color = "#666666"
-        
-        st.markdown(f"""
-        <div class="{card_class}">
-            <div class="level-card-header">
-                <div class="level-icon-large">{level_data['icon']}</div>
-                <h3 class="level-title">LEVEL {level_id}: {level_data['title']}</h3>
-                <div style="color: {status_color}; font-weight: 700; margin-top: 1rem; font-size: 1.1rem; text-shadow: 0 0 3px #000000, 0 0 6px #000000, 0 0 10px {status_color};">{status_text}</div>
-            </div>
-            <div class="level-card-body">
-                <p class="level-description">{level_data['description']}</p>
-                <div class="level-stats">
-                    <span class="level-stat">{'⭐' * level_data['difficulty_stars']}</span>
-                    <span class="level-stat">{level_data['min_xp_to_pass']} XP</span>
-                    <span class="level-stat">{level_data['max_words']} WORDS</span>
-                </div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+    """) + '\n<div class="gaming-level-grid">\n' + "\n".join(cards) + "\n</div>"
+
+@timed()
+def create_gaming_level_grid():
+    """Create gaming-style level selection grid"""
+    st.markdown("## 🗺️ **TRAINING ARENA**")
     
-    st.markdown('</div>', unsafe_allow_html=True)
+    pack = current_pack()
+    st.markdown(level_grid_html(
+        pack, st.session_state.player.current_level, frozenset(st.session_state.player.completed_levels)
+    ), unsafe_allow_html=True)
     
     # Action buttons
     st.markdown("### 🎮 **SELECT YOUR MISSION**")
     cols = st.columns(4)
     
-    for i, (level_id, level_data) in enumerate(LEVELS.items()):
+    for i, level_id in enumerate(pack.levels):
         col_idx = i % 4
-        is_unlocked = level_id <= st.session_state.current_level
+        is_unlocked = level_id <= st.session_state.player.current_level
         
         with cols[col_idx]:
             if is_unlocked:
                 if st.button(f"🚀 ENTER LEVEL {level_id}", key=f"enter_{level_id}", use_container_width=True):
                     st.session_state.selected_level = level_id
+                    st.session_state.level_entered_at = time.time()
+                    log_event("level_enter", level=level_id)
                     st.rerun()
             else:
                 st.button(f"🔒 LEVEL {level_id}", key=f"locked_{level_id}", disabled=True, use_container_width=True)
 
-def create_detailed_level_explanation(level_info):
+@timed()
+def create_detailed_level_explanation(level_id):
     """Create detailed learning explanation for each level with HIGH CONTRAST"""
-    st.markdown(f"""
-    <div class="level-explanation-box">
-        <div class="explanation-section">
-            <div class="explanation-title">🎯 WHAT YOU'LL DO</div>
-            <div class="explanation-text">{level_info['what_to_do']}</div>
-        </div>
-        
-        <div class="explanation-section">
-            <div class="explanation-title">📋 HOW TO DO IT</div>
-            <div class="explanation-text">{level_info['how_to_do']}</div>
+    st.markdown(current_pack().explanation_html[level_id], unsafe_allow_html=True)
+
+# Helper functions
+def player_standing():
+    """Rank and XP bracket from the compiled progression table; keeps the stored rank current"""
+    player = st.session_state.player
+    standing = PROGRESSION.standing(player.total_xp, len(player.achievements))
+    player.rank = standing.name
+    return standing
+
+def get_achievement_engine():
+    """Per-session achievement trackers, seeded from saved progress for the current pack version"""
+    pack = current_pack()
+    if st.session_state.get('achievement_engine_pack') != pack.digest:
+        st.session_state.achievement_engine = AchievementEngine(
+            unlocked=st.session_state.player.achievements,
+            progress=st.session_state.player.as_dict(),
+            catalogue=pack.achievements, levels=pack.levels
+        )
+        st.session_state.achievement_engine_pack = pack.digest
+    return st.session_state.achievement_engine
+
+def emit_game_event(event):
+    """Feed a gameplay event to the achievement engine and award any unlocks"""
+    engine = get_achievement_engine()
+    unlocked = engine.emit(event)
+    for achievement_id in unlocked:
+        achievement = engine.catalogue[achievement_id]
+        log_event("achievement_unlocked", level=getattr(event, 'level', None), value=achievement['xp'],
+                  achievement=achievement_id)
+        st.session_state.player.achievements.add(achievement_id)
+        st.session_state.player.total_xp += achievement['xp']
+        st.markdown(f"""
+        <div class="gaming-achievement-popup">
+            🏆 <strong>ACHIEVEMENT UNLOCKED!</strong><br>
+            {escape(achievement['icon'])} {escape(achievement['name'].upper())}<br>
+            {escape(achievement['desc'])}<br>
+            ✨ +{achievement['xp']} XP
         </div>
-        
-        <div class="explanation-section">
-            <div class="explanation-title">🔢 STEP-BY-STEP GUIDE</div>
-            <div class="step-list">
-    """, unsafe_allow_html=True)
-    
-    for i, step in enumerate(level_info['step_by_step'], 1):
+        """, unsafe_allow_html=True)
+    record_challenge_progress(event)
+    return unlocked
+
+def record_challenge_progress(event):
+    """Advance today's challenges and this week's quests, rewarding any the event completes"""
+    state = st.session_state.player
+    challenge_set = todays_challenges()
+    for challenge in challenge_set.record(event, state.daily_challenges):
+        log_event("challenge_completed", level=getattr(event, 'level', None), value=challenge.xp,
+                  challenge=challenge.id, weekly=challenge.weekly)
+        state.total_xp += challenge.xp
+        state.coins += challenge.coins
         st.markdown(f"""
-            <div class="step-item">
-                <span class="step-number">STEP {i}:</span> {step}
-            </div>
+        <div class="gaming-achievement-popup">
+            {'🗺️ <strong>WEEKLY QUEST COMPLETE!</strong>' if challenge.weekly else '📅 <strong>DAILY CHALLENGE COMPLETE!</strong>'}<br>
+            {challenge.icon} {escape(challenge.title).upper()}<br>
+            ✨ +{challenge.xp} XP • 💰 +{challenge.coins} COINS
+        </div>
         """, unsafe_allow_html=True)
+    state.weekly_quest_progress = challenge_set.completed(state.daily_challenges, weekly=True)
+
+def record_prompt_score(score, user_prompt, originality):
+    """Apply a scored prompt to the player's progress"""
+    state = st.session_state.player
+    pack = current_pack()
+    styles = detect_styles(user_prompt, pack.style_phrases)
+    state.total_xp += score.total_xp
+    state.keywords_discovered.update(score.keywords)
+    state.secret_keywords_found.update(score.secret)
+    state.styles_tried.update(styles)
+    state.prompt_quality_scores.append(score.total_xp)
+    if score.passed:
+        state.combo_streak += 1
+        state.max_combo = max(state.max_combo, state.combo_streak)
+        state.completed_levels.add(score.level)
+        state.current_level = min(len(pack.levels), max(state.current_level, score.level + 1))
+        if score.level in pack.creative_levels and originality.original:
+            state.creative_challenges_completed += 1
+    else:
+        state.combo_streak = 0
+    if score.perfect:
+        state.perfect_scores += 1
+        state.perfect_levels.add(score.level)
+    
+    log_event(
+        "prompt_scored", level=score.level, prompt=user_prompt, value=score.total_xp,
+        passed=score.passed, perfect=score.perfect, word_count=score.word_count,
+        over_word_limit=score.over_word_limit, required=score.required, bonus=score.bonus,
+        secret=score.secret, negative=score.negative, combo=state.combo_streak, originality=originality.score
+    )
+    emit_game_event(PromptScored(
+        level=score.level, keywords=tuple(score.keywords), secrets=tuple(score.secret), styles=styles,
+        passed=score.passed, perfect=score.perfect, combo=state.combo_streak, original=originality.original
+    ))
+
+@timed()
+def evaluate_prompt(level_id, user_prompt):
+    """Score the prompt, award XP and show the breakdown"""
+    score = current_pack().keyword_index.score(user_prompt, level_id)
+    originality = get_originality_index().add(user_prompt)
+    record_prompt_score(score, user_prompt, originality)
+    
+    cols = st.columns(5)
+    cols[0].metric("BASE XP", score.base_xp)
+    cols[1].metric("BONUS XP", score.bonus_xp, f"{len(score.bonus)} keywords")
+    cols[2].metric("SECRET XP", score.secret_xp, f"{len(score.secret)} found")
+    cols[3].metric("TOTAL XP", score.total_xp, f"-{score.penalty_xp} penalty" if score.penalty_xp else None)
+    cols[4].metric("ORIGINALITY", f"{originality.score:.0%}")
+    
+    if score.missing_required and not score.required:
+        st.warning(f"🎯 USE A REQUIRED KEYWORD: {', '.join(score.missing_required)}")
+    if score.negative:
+        st.warning(f"🚫 AVOID NEGATIVE TERMS: {', '.join(score.negative)}")
+    if score.over_word_limit:
+        st.warning(f"✂️ {score.word_count}/{score.max_words} WORDS - OVER THE LIMIT, XP HALVED")
+    if not originality.original:
+        st.info("🪞 VERY CLOSE TO AN EARLIER PROMPT - TRY YOUR OWN TWIST FOR ORIGINALITY")
+    if score.secret:
+        st.info(f"🔍 SECRET KEYWORDS DISCOVERED: {', '.join(score.secret)}")
+    if score.passed:
+        st.balloons()
+        st.success(f"🏆 LEVEL {level_id} PASSED! COMBO x{st.session_state.player.combo_streak}")
+
+def render_live_feedback(level_id, user_prompt):
+    """Word count, keyword hits and projected XP for the current draft"""
+    pack = current_pack()
+    entry = st.session_state.live_scorers.get(level_id)
+    if entry is None or entry[0] != pack.digest:
+        # A reloaded pack brings a new keyword index
+        entry = st.session_state.live_scorers[level_id] = (pack.digest, IncrementalScorer(pack.keyword_index, level_id))
+    score = entry[1].update(user_prompt)
+    level_info = pack.levels[level_id]
+    
+    words_color = "#ff0080" if score.over_word_limit else "#39ff14"
+    required = " ".join(
+        f"<span style='color: {'#39ff14' if k in score.required else '#666666'};'>{'✓' if k in score.required else '✗'} {escape(k)}</span>"
+        for k in level_info['required_keywords']
+    )
+    extras = escape(", ".join(score.bonus)) or "—"
+    negative = f" • <span style='color: #ff0080;'>🚫 {escape(', '.join(score.negative))}</span>" if score.negative else ""
     
-    st.markdown("""
-            </div>
-        </div>
+    st.markdown(f"""
+    <div style="background: rgba(0,0,0,0.9); padding: 1rem 1.5rem; border: 2px solid #00ffff; color: #ffffff; font-weight: 600; text-shadow: 0 0 3px #000000;">
+        <span style="color: {words_color};">📝 {score.word_count}/{score.max_words} WORDS</span> •
+        🎯 {required} • ⭐ BONUS: {extras} • 🔍 SECRETS: {len(score.secret)}{negative} •
+        <span style="color: #ffff00;">⚡ PROJECTED XP: {score.total_xp}</span>
     </div>
     """, unsafe_allow_html=True)
 
-# Helper functions
-def calculate_user_rank():
-    """Calculate user rank based on XP and achievements"""
-    xp = st.session_state.total_xp
-    achievements = len(st.session_state.achievements)
-    
-    if xp >= 2000 and achievements >= 8:
-        return "🏆 GRANDMASTER"
-    elif xp >= 1500 and achievements >= 6:
-        return "👑 MASTER"
-    elif xp >= 1000 and achievements >= 4:
-        return "🌟 EXPERT"
-    elif xp >= 500 and achievements >= 2:
-        return "🎯 ADVANCED"
-    elif xp >= 200:
-        return "🎨 INTERMEDIATE"
-    else:
-        return "🧙‍♂️ NOVICE"
-
-def get_next_rank_xp():
-    """Get XP needed for next rank"""
-    xp = st.session_state.total_xp
-    if xp < 200:
-        return 200
-    elif xp < 500:
-        return 500
-    elif xp < 1000:
-        return 1000
-    elif xp < 1500:
-        return 1500
-    elif xp < 2000:
-        return 2000
-    else:
-        return 2000
-
-def get_current_rank_base_xp(next_rank_xp):
-    """Get current rank base XP"""
-    if next_rank_xp == 200:
-        return 0
-    elif next_rank_xp == 500:
-        return 200
-    elif next_rank_xp == 1000:
-        return 500
-    elif next_rank_xp == 1500:
-        return 1000
-    elif next_rank_xp == 2000:
-        return 1500
-    else:
-        return 1500
+# Fragments rerun only the prompt editor on each edit instead of the whole
+# script; older Streamlit versions fall back to a plain function call
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+@_fragment
+@timed()
+def prompt_workbench(level_id, level_info):
+    """Prompt editor with live scoring feedback"""
+    user_prompt = st.text_area(
+        f"ENTER YOUR PROMPT (MAX {level_info['max_words']} WORDS):",
+        height=150,
+        placeholder=f"Example: {level_info['example_prompt']}",
+        key=f"prompt_draft_{level_id}"
+    )
+    render_live_feedback(level_id, user_prompt)
 
+# ===== BACKGROUND GENERATION JOBS =====
+# Generation runs as a job on the shared queue; the session only keeps a
+# handle to it, so reruns and widget clicks never block on inference.
+JOB_POLL_SECONDS = 0.5
+
+ADMISSION_MESSAGES = {
+    "energy": "⚡ OUT OF ENERGY! Energy recharges over time.",
+    "user_rate": "🐢 EASY, CHAMPION! You're generating faster than your fair share.",
+    "global_rate": "🌐 THE ARENA IS BUSY! Too many generations class-wide.",
+    "backlog": "🚦 GENERATION QUEUE IS FULL!",
+    "unavailable": "🔌 THE GENERATION SERVER IS NOT ANSWERING!",
+}
+
+@st.cache_resource(show_spinner=False)
+def get_admission_controller():
+    """Process-wide energy, rate-limit and backlog checks in front of the generation queue"""
+    return AdmissionController(get_generation_queue())
+
+def admit_generation(level_id, prompt, compute):
+    """Charge energy for one generation (diffusion jobs also face the shared limits), or explain the wait"""
+    admission = get_admission_controller().admit(st.session_state.player_id, st.session_state.player, compute=compute)
+    if not admission.admitted:
+        log_event("generation_rejected", level=level_id, prompt=prompt,
+                  value=admission.retry_after, reason=admission.reason)
+        st.warning(f"{ADMISSION_MESSAGES[admission.reason]} Try again in {format_wait(admission.retry_after)}.")
+    return admission.admitted
+
+def refund_generation():
+    """Give back the energy of this session's diffusion job when it ends without an image"""
+    get_admission_controller().refund(st.session_state.player_id, st.session_state.player)
+
+def format_wait(seconds):
+    """Human-friendly rounded duration, e.g. '45s' or '3m 20s'"""
+    seconds = max(1, int(round(seconds)))
+    minutes, seconds = divmod(seconds, 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+def start_generation_job(level_id, key, user_prompt, request):
+    """Submit a generation job for this session, superseding any earlier one"""
+    cancel_generation_job()
+    queue = get_generation_queue()
+    try:
+        job = queue.submit(request, key)
+    except ConnectionError as exc:  # the inference server went away after admission
+        log_event("generation_rejected", level=level_id, prompt=user_prompt, value=0.0,
+                  reason="unavailable", error=str(exc))
+        refund_generation()
+        st.warning(ADMISSION_MESSAGES["unavailable"])
+        return
+    st.session_state.generation_job = {
+        'job_id': job.id, 'level_id': level_id, 'key': key, 'prompt': user_prompt,
+        'submitted_at': time.time()
+    }
+    # Abandoned sessions must not keep the model busy
+    weakref.finalize(st.session_state.session_end_marker, queue.cancel, job.id)
+
+def cancel_generation_job():
+    """Cancel this session's running job, if any"""
+    active = st.session_state.get('generation_job')
+    if active:
+        if get_generation_queue().cancel(active['job_id']):
+            refund_generation()
+        st.session_state.generation_job = None
+        log_event("generation_cancelled", level=active['level_id'], prompt=active['prompt'],
+                  value=time.time() - active['submitted_at'])
+
+@timed()
+def track_generation_job(level_id):
+    """Stream progress of this session's job and finish it once the image is ready"""
+    active = st.session_state.get('generation_job')
+    if not active or active['level_id'] != level_id:
+        return
+    queue = get_generation_queue()
+    job = queue.poll(active['job_id'])
+    if job is None:
+        # Forgotten by the queue (e.g. an inference server restart) before it finished
+        st.session_state.generation_job = None
+        refund_generation()
+        return
+    
+    progress_bar = st.empty()
+    preview_slot = st.empty()
+    # Any widget interaction stops this loop with a rerun; the job keeps running
+    while not job.done:
+        if job.step:
+            label = f"🎨 STEP {job.step}/{job.total_steps}"
+        else:
+            try:
+                label = f"⏳ QUEUED, ABOUT {format_wait(queue.estimated_wait())} TO GO..."
+            except ConnectionError:
+                label = "⏳ QUEUED..."
+        progress_bar.progress(job.progress, text=label)
+        if job.preview is not None:
+            preview_slot.image(job.preview, width=128, caption="LIVE PREVIEW")
+        time.sleep(JOB_POLL_SECONDS)
+    progress_bar.empty()
+    preview_slot.empty()
+    st.session_state.generation_job = None
+    
+    elapsed = time.time() - active['submitted_at']
+    if job.status in (CANCELLED, FAILED):
+        refund_generation()
+    if job.status == CANCELLED:
+        return
+    if job.status == FAILED:
+        log_event("generation_failed", level=level_id, prompt=active['prompt'], value=elapsed, error=str(job.error))
+        st.error(f"⚠️ GENERATION FAILED: {job.error}")
+        return
+    digest = job.digest or get_image_cache().put(active['key'], job.result)
+    log_event("image_generated", level=level_id, prompt=active['prompt'], value=elapsed,
+              renderer="diffusion", cached=False, digest=digest)
+    st.session_state.player.add_image(digest)
+    st.session_state.player.images_generated_today += 1
+    emit_game_event(ImageGenerated(level=level_id))
+    show_stored_image(digest, active['prompt'])
+    st.success("🎉 IMAGE GENERATED!")
+    evaluate_prompt(level_id, active['prompt'])
+
+@timed()
 def play_enhanced_level(level_id):
     """Enhanced level play with detailed explanations and HIGH CONTRAST"""
-    level_info = LEVELS[level_id]
+    pack = current_pack()
+    level_info = pack.levels[level_id]
     
     # Level header with better contrast
     st.markdown(f"""
     <div style="background: linear-gradient(45deg, rgba(0,0,0,0.9), {level_info['theme_color']}); 
                 padding: 3rem; margin: 2rem 0; border: 3px solid {level_info['theme_color']};">
         <div style="display: flex; align-items: center; gap: 2rem;">
-            <div style="font-size: 6rem; filter: drop-shadow(0 0 15px {level_info['theme_color']});">{level_info['icon']}</div>
+            <div style="font-size: 6rem; filter: drop-shadow(0 0 15px {level_info['theme_color']});">{escape(level_info['icon'])}</div>
             <div>
                 <h1 style="color: #ffffff; font-family: 'Orbitron', monospace; font-size: 3rem; margin: 0; text-shadow: 0 0 3px #000000, 0 0 6px #000000, 0 0 20px {level_info['theme_color']}; font-weight: 900;">
-                    LEVEL {level_id}: {level_info['title'].upper()}
+                    LEVEL {level_id}: {escape(level_info['title'].upper())}
                 </h1>
-                <p style="color: #ffffff; font-size: 1.4rem; margin: 1rem 0; text-shadow: 0 0 3px #000000; font-weight: 600;">{level_info['description']}</p>
+                <p style="color: #ffffff; font-size: 1.4rem; margin: 1rem 0; text-shadow: 0 0 3px #000000; font-weight: 600;">{escape(level_info['description'])}</p>
                 <div style="display: flex; gap: 2rem; margin-top: 1rem;">
                     <span style="background: rgba(0,0,0,0.9); padding: 0.8rem 1.5rem; color: #ffff00; font-weight: 700; border: 2px solid #ffff00; text-shadow: 0 0 3px #000000;">
                         DIFFICULTY: {'⭐' * level_info['difficulty_stars']}
@@ -970,6 +1261,9 @@ def play_enhanced_level(level_id):
                     <span style="background: rgba(0,0,0,0.9); padding: 0.8rem 1.5rem; color: #00ffff; font-weight: 700; border: 2px solid #00ffff; text-shadow: 0 0 3px #000000;">
                         TARGET: {level_info['min_xp_to_pass']} XP
                     </span>
+                    <span style="background: rgba(0,0,0,0.9); padding: 0.8rem 1.5rem; color: #39ff14; font-weight: 700; border: 2px solid #39ff14; text-shadow: 0 0 3px #000000;">
+                        MAX: {pack.xp_tables[level_id]['max']} XP
+                    </span>
                 </div>
             </div>
         </div>
@@ -977,33 +1271,114 @@ def play_enhanced_level(level_id):
     """, unsafe_allow_html=True)
     
     # Detailed explanation with high contrast
-    create_detailed_level_explanation(level_info)
+    create_detailed_level_explanation(level_id)
     
     # Interactive prompt area
     st.markdown("### 🎮 **TRAINING GROUND**")
     
-    # Add your existing prompt input and generation logic here
-    user_prompt = st.text_area(
-        f"ENTER YOUR PROMPT (MAX {level_info['max_words']} WORDS):",
-        height=150,
-        placeholder=f"Example: {level_info['example_prompt']}"
-    )
+    prompt_workbench(level_id, level_info)
+    user_prompt = st.session_state.get(f"prompt_draft_{level_id}", "")
     
     col1, col2 = st.columns([2, 1])
     
-    with col1:
-        if st.button("🚀 GENERATE IMAGE", type="primary"):
-            if user_prompt.strip():
-                st.success("🎉 IMAGE GENERATED! (Add your generation logic here)")
-            else:
-                st.error("⚠️ ENTER A PROMPT TO CONTINUE!")
-    
     with col2:
         if st.button("🏠 RETURN TO ARENA"):
+            cancel_generation_job()
+            entered_at = st.session_state.get('level_entered_at')
+            log_event("level_exit", level=level_id, value=time.time() - entered_at if entered_at else None)
             st.session_state.selected_level = None
             st.rerun()
+    
+    with col1:
+        if st.button("🚀 GENERATE IMAGE", type="primary"):
+            if not user_prompt.strip():
+                st.error("⚠️ ENTER A PROMPT TO CONTINUE!")
+            elif DIFFUSION_AVAILABLE:
+                cache = get_image_cache()
+                key = generation_key(
+                    user_prompt, level_info['negative_prompts'],
+                    GENERATION_SEED, GENERATION_STEPS, IMAGE_SIZE, IMAGE_SIZE
+                )
+                digest = cache.get(key)
+                if admit_generation(level_id, user_prompt.strip(), compute=digest is None):
+                    if digest is None:
+                        request = GenerationRequest(
+                            prompt=user_prompt.strip(),
+                            negative_prompt=", ".join(level_info['negative_prompts']),
+                            seed=GENERATION_SEED, steps=GENERATION_STEPS, width=IMAGE_SIZE, height=IMAGE_SIZE
+                        )
+                        start_generation_job(level_id, key, user_prompt.strip(), request)
+                    else:
+                        log_event("image_generated", level=level_id, prompt=user_prompt.strip(), value=0.0,
+                                  renderer="diffusion", cached=True, digest=digest)
+                        st.session_state.player.add_image(digest)
+                        st.session_state.player.images_generated_today += 1
+                        emit_game_event(ImageGenerated(level=level_id))
+                        show_stored_image(digest, user_prompt.strip())
+                        st.success("🎉 IMAGE GENERATED!")
+                        evaluate_prompt(level_id, user_prompt)
+            elif admit_generation(level_id, user_prompt.strip(), compute=False):
+                cache = get_image_cache()
+                key = generation_key(
+                    user_prompt, (), GENERATION_SEED, 0, IMAGE_SIZE, IMAGE_SIZE,
+                    renderer=f"preview:{level_info['theme_color']}"
+                )
+                digest = cache.get(key)
+                started = time.perf_counter()
+                cached = digest is not None
+                if not cached:
+                    digest = cache.put(key, render_preview(user_prompt, level_info['theme_color'], IMAGE_SIZE))
+                log_event("image_generated", level=level_id, prompt=user_prompt.strip(),
+                          value=time.perf_counter() - started, renderer="preview", cached=cached, digest=digest)
+                st.session_state.player.add_image(digest)
+                st.session_state.player.images_generated_today += 1
+                emit_game_event(ImageGenerated(level=level_id))
+                show_stored_image(digest, user_prompt.strip())
+                st.success("🎉 PREVIEW GENERATED! (AI generation unavailable on this server)")
+                evaluate_prompt(level_id, user_prompt)
+        
+        track_generation_job(level_id)
+
+    show_recent_creations()
+
+# ===== ADMIN PANEL =====
+def is_admin():
+    """Whether this session presented the admin token"""
+    if not ADMIN_TOKEN:
+        return False
+    if hasattr(st, "query_params"):
+        token = st.query_params.get("admin", "")
+    else:
+        token = st.experimental_get_query_params().get("admin", [""])[0]
+    return hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+def render_admin_panel():
+    """Per-process timing and payload metrics for operators"""
+    counters, histograms = REGISTRY.snapshot()
+    with st.expander("📊 PERFORMANCE METRICS (ADMIN)"):
+        reruns = sum(counters.get("reruns_total", {}).values())
+        st.markdown(f"**Reruns this process:** {reruns:,}")
+        spans = histograms.get("span_seconds", {})
+        st.table([
+            {
+                "span": dict(key)["span"], "calls": h.count,
+                "mean ms": round(1000 * h.sum / h.count, 2),
+                "p50 ≤ ms": 1000 * h.quantile(0.5), "p95 ≤ ms": 1000 * h.quantile(0.95),
+                "total s": round(h.sum, 2),
+            }
+            for key, h in sorted(spans.items(), key=lambda item: -item[1].sum)
+        ])
+        payloads = histograms.get("markdown_bytes", {})
+        st.table([
+            {
+                "caller": dict(key)["caller"], "calls": h.count,
+                "mean bytes": int(h.sum / h.count), "total KB": round(h.sum / 1024, 1),
+            }
+            for key, h in sorted(payloads.items(), key=lambda item: -item[1].sum)
+        ])
 
 # ===== MAIN APPLICATION =====
+@timed()
 def main():
     """Main application with gaming UI"""
     
@@ -1011,31 +1386,39 @@ def main():
     create_gaming_header()
     
     # Gaming stats HUD
+    regenerate_energy(st.session_state.player)
     create_gaming_stats_hud()
     
     # Daily login bonus
-    today = datetime.now().date()
-    if st.session_state.last_play_date != today:
-        st.session_state.last_play_date = today
-        st.session_state.daily_streak += 1
-        bonus_coins = st.session_state.daily_streak * 15
-        bonus_energy = 25
-        st.session_state.coins += bonus_coins
-        st.session_state.energy = min(st.session_state.max_energy, st.session_state.energy + bonus_energy)
-        
-        st.markdown(f"""
-        <div class="gaming-achievement-popup">
-            🎁 <strong>DAILY LOGIN BONUS!</strong><br>
-            💰 +{bonus_coins} COINS<br>
-            ⚡ +{bonus_energy} ENERGY<br>
-            🔥 STREAK: {st.session_state.daily_streak} DAYS!
-        </div>
-        """, unsafe_allow_html=True)
+    with span("daily_bonus"):
+        today = datetime.now().date()
+        if st.session_state.player.last_play_date != today:
+            st.session_state.player.last_play_date = today
+            st.session_state.player.images_generated_today = 0
+            st.session_state.player.daily_streak += 1
+            bonus_coins = st.session_state.player.daily_streak * 15
+            bonus_energy = 25
+            st.session_state.player.coins += bonus_coins
+            st.session_state.player.energy = min(st.session_state.player.max_energy, st.session_state.player.energy + bonus_energy)
+            
+            st.markdown(f"""
+            <div class="gaming-achievement-popup">
+                🎁 <strong>DAILY LOGIN BONUS!</strong><br>
+                💰 +{bonus_coins} COINS<br>
+                ⚡ +{bonus_energy} ENERGY<br>
+                🔥 STREAK: {st.session_state.player.daily_streak} DAYS!
+            </div>
+            """, unsafe_allow_html=True)
+            emit_game_event(DailyLogin(streak=st.session_state.player.daily_streak))
+    
+    # A reloaded pack may have dropped the level this session was playing
+    if st.session_state.selected_level not in current_pack().levels:
+        st.session_state.selected_level = None
     
     # Main content
     if st.session_state.selected_level is None:
         # Welcome message for new users
-        if st.session_state.total_xp == 0:
+        if st.session_state.player.total_xp == 0:
             st.markdown(f"""
             <div style="background: rgba(0,0,0,0.95); padding: 3rem; margin: 2rem 0; border: 3px solid #00ffff; text-align: center;">
                 <h2 style="color: #39ff14; font-family: 'Orbitron', monospace; font-size: 2.5rem; margin-bottom: 2rem; text-shadow: 0 0 3px #000000, 0 0 6px #000000, 0 0 15px #39ff14;">
@@ -1056,10 +1439,19 @@ def main():
         
         # Level selection grid
         create_gaming_level_grid()
+        render_daily_challenges()
+        render_leaderboard()
     
     else:
         # Play selected level
         play_enhanced_level(st.session_state.selected_level)
+    
+    with span("save_player_progress"):
+        save_player_progress()
+    
+    if is_admin():
+        render_admin_panel()
 
 if __name__ == "__main__":
+    inc("reruns_total", view="arena" if st.session_state.selected_level is None else "level")
     main()
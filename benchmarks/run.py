@@ -0,0 +1,329 @@
+"""Benchmark rerun cost, scoring, previews, leaderboard updates, originality lookups and diffusion latency
+
+Usage (from the repository root):
+    python -m benchmarks.run                      # full run, compare with baseline
+    python -m benchmarks.run --quick              # fewer iterations, for CI
+    python -m benchmarks.run --only scoring,preview
+    python -m benchmarks.run --update-baseline    # accept current numbers
+
+Results are written as JSON (``benchmarks/results.json`` by default). Every
+metric records which direction is better; a metric that is worse than the
+baseline by more than ``--tolerance`` is reported as a regression and the
+exit status is 1. Inputs are generated from a fixed seed, so runs on the
+same machine are comparable.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(ROOT, "benchmarks")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_RESULTS = os.path.join(BENCHMARK_DIR, "results.json")
+DEFAULT_TOLERANCE = 0.2
+SEED = 1234
+FILLER_WORDS = (
+    "a", "the", "with", "and", "in", "of", "on", "at", "under", "beautiful", "small", "large",
+    "cat", "dog", "tree", "river", "city", "robot", "girl", "boy", "sky", "mountain", "house",
+)
+
+# Keep benchmark runs away from real player data, caches and ports
+_SANDBOX = tempfile.mkdtemp(prefix="prompt-master-bench-")
+for _name, _value in {
+    "PROMPT_MASTER_DATA_DIR": os.path.join(_SANDBOX, "data"),
+    "PROMPT_MASTER_CACHE_DIR": os.path.join(_SANDBOX, "cache"),
+    "PROMPT_MASTER_MEDIA_DIR": os.path.join(_SANDBOX, "media"),
+    "PROMPT_MASTER_MEDIA_PORT": "0",
+    "PROMPT_MASTER_METRICS_PORT": "0",
+}.items():
+    os.environ.setdefault(_name, _value)
+# The rerun benchmark reads the app's own spans
+os.environ["PROMPT_MASTER_METRICS"] = "1"
+sys.path.insert(0, ROOT)
+
+from levels import LEVELS  # noqa: E402  (after the environment is sandboxed)
+
+
+def metric(value, unit, better="lower"):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def summarize(name, samples, unit="ms"):
+    """Median and p95 of a list of samples"""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        f"{name}.median": metric(statistics.median(ordered), unit),
+        f"{name}.p95": metric(p95, unit),
+    }
+
+
+def best_rate(count, body, repeats):
+    """Highest ``count``/second over several timed runs of ``body`` (filters scheduler noise)"""
+    best = 0.0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        body()
+        best = max(best, count / (time.perf_counter() - started))
+    return best
+
+
+def synthetic_prompts(count, seed=SEED):
+    """Prompts mixing every level's keywords with filler words"""
+    rng = random.Random(seed)
+    vocabulary = sorted({
+        keyword
+        for level in LEVELS.values()
+        for tier in ("required_keywords", "bonus_keywords", "secret_keywords", "negative_prompts")
+        for keyword in level[tier]
+    })
+    prompts = []
+    for _ in range(count):
+        words = rng.choices(vocabulary, k=rng.randint(1, 5)) + rng.choices(FILLER_WORDS, k=rng.randint(2, 20))
+        rng.shuffle(words)
+        prompts.append(" ".join(words))
+    return prompts
+
+
+# ===== BENCHMARKS =====
+def _main_span_seconds():
+    from instrumentation import REGISTRY
+
+    _, histograms = REGISTRY.snapshot()
+    histogram = histograms.get("span_seconds", {}).get((("span", "main"),))
+    return histogram.sum if histogram else 0.0
+
+
+def bench_rerun(iterations):
+    """Script rerun cost via AppTest for the arena and every level view
+
+    AppTest polls for completion every 100 ms, so wall-clock samples are
+    quantized; the app's own ``main`` span (same process) is used instead.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    views = [("arena", None)] + [(f"level_{level_id}", level_id) for level_id in LEVELS]
+    for view, level_id in views:
+        app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+        app.run()
+        if level_id is not None:
+            app.session_state["selected_level"] = level_id
+            app.run()
+        if app.exception:
+            raise RuntimeError(f"{view} view raised: {app.exception[0].value}")
+        samples = []
+        for _ in range(iterations):
+            before = _main_span_seconds()
+            app.run()
+            samples.append((_main_span_seconds() - before) * 1000)
+        results.update(summarize(f"rerun.{view}", samples))
+    return results
+
+
+def bench_scoring(count, repeats):
+    """Keyword scoring throughput against one level and against all levels"""
+    from prompt_scoring import KEYWORD_INDEX
+
+    prompts = synthetic_prompts(count)
+    level_ids = list(LEVELS)
+
+    def one_level():
+        for index, prompt in enumerate(prompts):
+            KEYWORD_INDEX.score(prompt, level_ids[index % len(level_ids)])
+
+    def all_levels():
+        for prompt in prompts:
+            KEYWORD_INDEX.score_all(prompt)
+
+    single = best_rate(count, one_level, repeats)
+    every = best_rate(count, all_levels, repeats)
+    return {
+        "scoring.one_level": metric(single, "prompts/s", "higher"),
+        "scoring.all_levels": metric(every, "prompts/s", "higher"),
+    }
+
+
+def bench_preview(count, repeats):
+    """Procedural preview renders per second at the in-game size"""
+    from preview_renderer import render_preview
+
+    prompts = synthetic_prompts(count, seed=SEED + 1)
+    colors = [level["theme_color"] for level in LEVELS.values()]
+    # Warms module-level lookup tables; the caption font is Latin-1 only, so
+    # this also checks that emoji and CJK prompts still render
+    render_preview("猫 dragon ✨ sparkle", colors[0])
+
+    def render_all():
+        for index, prompt in enumerate(prompts):
+            render_preview(prompt, colors[index % len(colors)])
+
+    return {"preview.render_rate": metric(best_rate(count, render_all, repeats), "images/s", "higher")}
+
+
+def bench_leaderboard(players, repeats):
+    """XP updates and rank/top-K/neighbour queries per second on an in-memory board"""
+    from leaderboard import Leaderboard
+
+    rng = random.Random(SEED)
+    board = Leaderboard()
+    for index in range(players):
+        board.update(f"p{index}", rng.randint(0, 3000), cohort=f"c{index % 50}")
+    gains = [(f"p{rng.randrange(players)}", rng.randint(1, 100)) for _ in range(1000)]
+
+    def updates():
+        for player_id, gain in gains:
+            board.update(player_id, board.rank(player_id).xp + gain)
+
+    def queries():
+        for player_id, _ in gains:
+            board.top(10)
+            board.neighbors(player_id, cohort=board.cohort_of(player_id))
+
+    return {
+        "leaderboard.updates": metric(best_rate(len(gains), updates, repeats), "updates/s", "higher"),
+        "leaderboard.queries": metric(best_rate(len(gains), queries, repeats), "queries/s", "higher"),
+    }
+
+
+def bench_originality(history, queries, repeats):
+    """Batch signature throughput and single-prompt lookups against a ``history``-prompt index"""
+    from originality import OriginalityIndex
+
+    index = OriginalityIndex()
+    prompts = synthetic_prompts(history, seed=SEED + 2)
+    started = time.perf_counter()
+    index.extend(prompts)
+    build_rate = history / (time.perf_counter() - started)
+    fresh = synthetic_prompts(queries, seed=SEED + 3)
+
+    def lookups():
+        for prompt in fresh:
+            index.query(prompt)
+
+    return {
+        "originality.bulk_index": metric(build_rate, "prompts/s", "higher"),
+        "originality.batch_query": metric(
+            best_rate(queries, lambda: index.query_many(fresh), repeats), "prompts/s", "higher"),
+        "originality.query": metric(best_rate(queries, lookups, repeats), "queries/s", "higher"),
+    }
+
+
+def bench_diffusion(steps, batch_sizes):
+    """Per-step latency for several batch sizes; skipped without torch/diffusers"""
+    from generation_queue import GenerationRequest
+    from pipeline_manager import PipelineManager, diffusion_available
+
+    if not diffusion_available():
+        return {}
+    manager = PipelineManager(idle_timeout=0)
+    started = time.perf_counter()
+    manager.warm_up(background=False)
+    results = {"diffusion.load": metric((time.perf_counter() - started) * 1000, "ms")}
+    for batch_size in batch_sizes:
+        requests = [GenerationRequest(prompt=prompt, steps=steps) for prompt in synthetic_prompts(batch_size)]
+        stamps = []
+        started = time.perf_counter()
+        manager.generate(requests, on_step=lambda step, previews: stamps.append(time.perf_counter()))
+        total = (time.perf_counter() - started) * 1000
+        step_ms = [(b - a) * 1000 for a, b in zip([started] + stamps, stamps)]
+        results.update(summarize(f"diffusion.batch_{batch_size}.step", step_ms))
+        results[f"diffusion.batch_{batch_size}.total"] = metric(total, "ms")
+    return results
+
+
+# ===== REPORTING =====
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(), "platform": platform.platform(),
+        "cpu_count": os.cpu_count(), "commit": commit, "timestamp": time.time(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """(name, baseline, current, relative change) for every metric that got worse"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous["value"]:
+            continue
+        change = (current["value"] - previous["value"]) / previous["value"]
+        worse = change > tolerance if current["better"] == "lower" else change < -tolerance
+        if worse:
+            regressions.append((name, previous["value"], current["value"], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer iterations")
+    parser.add_argument("--only", help="comma-separated subset of: rerun,scoring,preview,leaderboard,originality,diffusion")
+    parser.add_argument("--output", default=DEFAULT_RESULTS)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    scale = 0.2 if args.quick else 1.0
+    repeats = 3 if args.quick else 5
+    suites = {
+        "rerun": lambda: bench_rerun(max(10, int(30 * scale))),
+        "scoring": lambda: bench_scoring(int(20000 * scale), repeats),
+        "preview": lambda: bench_preview(max(50, int(100 * scale)), repeats),
+        "leaderboard": lambda: bench_leaderboard(int(50000 * scale), repeats),
+        "originality": lambda: bench_originality(int(100000 * scale), 1000, repeats),
+        "diffusion": lambda: bench_diffusion(steps=5 if args.quick else 20, batch_sizes=(1, 2, 4)),
+    }
+    selected = args.only.split(",") if args.only else list(suites)
+    unknown = set(selected) - set(suites)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name in selected:
+        started = time.perf_counter()
+        suite_results = suites[name]()
+        print(f"{name}: {len(suite_results)} metric(s) in {time.perf_counter() - started:.1f}s"
+              + ("" if suite_results else " (skipped)"), file=sys.stderr)
+        results.update(suite_results)
+
+    report = {"environment": environment(), "results": results}
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+    width = max((len(name) for name in results), default=0)
+    for name, value in sorted(results.items()):
+        print(f"{name:<{width}}  {value['value']:>12.2f} {value['unit']}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    with open(args.baseline, encoding="utf-8") as handle:
+        baseline = json.load(handle)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for name, previous, current, change in regressions:
+        print(f"REGRESSION {name}: {previous:.2f} -> {current:.2f} ({change:+.0%})")
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Subset the UI fonts to the glyphs the app actually renders and emit WOFF2
+
+Usage:
+    pip install fonttools brotli
+    python build_fonts.py [--src fonts/src] [--out static/fonts]
+
+Source files are the variable TTFs from Google Fonts (SIL Open Font License):
+    fonts/src/Orbitron[wght].ttf
+    fonts/src/Exo2[wght].ttf
+The app references the output from its @font-face rules only once the files
+exist and Streamlit's static file server is on (``--server.enableStaticServing
+true``, which run_workers.py passes when the fonts are built).
+"""
+import argparse
+import ast
+import os
+import string
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Output name -> source file; must match UI_FONTS in app.py
+FONT_FACES = {
+    "orbitron.woff2": "Orbitron[wght].ttf",
+    "exo2.woff2": "Exo2[wght].ttf",
+}
+
+# Modules whose string literals end up on screen (LEVELS, ACHIEVEMENTS, UI copy)
+TEXT_SOURCES = ["app.py", "levels.py", "level_packs.py", "challenges.py"]
+
+
+def collect_ui_text(paths):
+    """Every character appearing in a string literal of the given modules"""
+    chars = set(string.printable)
+    for path in paths:
+        with open(path, encoding="utf-8") as handle:
+            tree = ast.parse(handle.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                chars.update(node.value)
+    # Emoji and control characters are never in these fonts; skip them
+    return "".join(sorted(c for c in chars if c.isprintable() and ord(c) < 0x2600))
+
+
+def pack_text():
+    """Every string in the level packs found in PACKS_DIR"""
+    from level_packs import available_packs, pack_path, parse_pack
+
+    def strings(value):
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            for item in value.values():
+                yield from strings(item)
+        elif isinstance(value, list):
+            for item in value:
+                yield from strings(item)
+
+    text = set()
+    for name in available_packs():
+        path = pack_path(name)
+        if path:
+            with open(path, "rb") as handle:
+                for value in strings(parse_pack(handle.read(), path)):
+                    text.update(value)
+    return text
+
+
+def subset_font(source, target, text):
+    from fontTools import subset
+
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["kern", "liga", "calt", "locl"]
+    options.name_IDs = ["*"]
+    options.notdef_outline = True
+    font = subset.load_font(source, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    subset.save_font(font, target, options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--src", default=os.path.join(ROOT, "fonts", "src"))
+    parser.add_argument("--out", default=os.path.join(ROOT, "static", "fonts"))
+    args = parser.parse_args(argv)
+
+    text = collect_ui_text([os.path.join(ROOT, path) for path in TEXT_SOURCES])
+    # Glyphs from level packs; rebuild the fonts after adding a pack in a new script
+    text = "".join(sorted(set(text) | {c for c in pack_text() if c.isprintable() and ord(c) < 0x2600}))
+    os.makedirs(args.out, exist_ok=True)
+    missing = []
+    for target_name, source_name in FONT_FACES.items():
+        source = os.path.join(args.src, source_name)
+        if not os.path.exists(source):
+            missing.append(source)
+            continue
+        target = os.path.join(args.out, target_name)
+        subset_font(source, target, text)
+        print(f"{target_name}: {os.path.getsize(source):,} -> {os.path.getsize(target):,} bytes ({len(text)} glyphs)")
+    if missing:
+        print("Missing source fonts:\n  " + "\n  ".join(missing), file=sys.stderr)
+        return 1
+    print("Serve them with: streamlit run app.py --server.enableStaticServing true")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
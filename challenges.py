@@ -0,0 +1,241 @@
+"""Seeded daily challenges and weekly quests built from a pack's keyword pools
+
+Every process derives the same set for a given pack version and day (or ISO
+week) because the generator is seeded from both, so all players share one
+set without any coordination. A ``ChallengeBoard`` builds each set once per
+process; every challenge carries a precompiled predicate and is routed by
+event type, so recording progress touches only the challenges that listen to
+the incoming event. Player progress is a ``{challenge_id: progress}`` mapping
+persisted in ``PlayerState.daily_challenges``.
+
+Usage:
+    python challenges.py [--date 2024-05-01] [--pack default]   # print the set for a day
+"""
+import argparse
+import random
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable
+
+from achievements import ImageGenerated, PromptScored
+from leaderboard import week_key
+from level_packs import DEFAULT_PACK, load_pack
+
+DAILY_CHALLENGES = 3
+WEEKLY_QUESTS = 2
+SETS_RETAINED = 16  # built sets kept per process (days x pack versions)
+
+
+@dataclass(frozen=True)
+class Challenge:
+    id: str
+    weekly: bool
+    title: str
+    icon: str
+    event_type: type
+    target: int
+    xp: int
+    coins: int
+    measure: Callable  # event -> progress it contributes (or the value reached, for peaks)
+    peak: bool = False  # progress is the best single value rather than a running total
+
+    def advance(self, progress, event):
+        """Progress after ``event``, capped at the target"""
+        value = self.measure(event)
+        if not value:
+            return progress
+        return min(self.target, max(progress, value) if self.peak else progress + value)
+
+
+# ===== TEMPLATES =====
+# Each template draws its parameters from the seeded generator and the pack's
+# levels; predicates close over frozen parameters so they never re-read the pack.
+# Templates that target a level return None when the pack has no eligible level.
+def _use_keyword(rng, levels, weekly):
+    if not levels:
+        return None
+    level_id = rng.choice(list(levels))
+    keyword = rng.choice(levels[level_id]["bonus_keywords"])
+    return dict(
+        title=f"Use “{keyword}” in a LEVEL {level_id} prompt", icon="🔤", event_type=PromptScored,
+        target=1, xp=30, coins=20,
+        measure=lambda e: e.level == level_id and keyword in e.keywords,
+    )
+
+
+def _pass_level(rng, levels, weekly):
+    if not levels:
+        return None
+    level_id, times = rng.choice(list(levels)), (5 if weekly else 2)
+    return dict(
+        title=f"Pass LEVEL {level_id} {times} times", icon="🏆", event_type=PromptScored,
+        target=times, xp=150 if weekly else 40, coins=100 if weekly else 25,
+        measure=lambda e: e.passed and e.level == level_id,
+    )
+
+
+def _find_secrets(rng, levels, weekly):
+    if weekly:
+        count = rng.choice((3, 4, 5))
+        return dict(
+            title=f"Use secret keywords {count} times", icon="🔍", event_type=PromptScored,
+            target=count, xp=250, coins=150, measure=lambda e: len(e.secrets),
+        )
+    if not levels:
+        return None
+    level_id = rng.choice(list(levels))
+    return dict(
+        title=f"Discover a secret keyword in LEVEL {level_id}", icon="🔍", event_type=PromptScored,
+        target=1, xp=60, coins=40, measure=lambda e: e.level == level_id and len(e.secrets),
+    )
+
+
+def _generate_images(rng, levels, weekly):
+    count = rng.choice((15, 20, 25) if weekly else (2, 3, 4))
+    return dict(
+        title=f"Generate {count} images", icon="🎨", event_type=ImageGenerated,
+        target=count, xp=150 if weekly else 30, coins=100 if weekly else 20, measure=lambda e: 1,
+    )
+
+
+def _reach_combo(rng, levels, weekly):
+    combo = rng.choice((6, 8) if weekly else (3, 4))
+    return dict(
+        title=f"Reach a x{combo} combo", icon="🔥", event_type=PromptScored,
+        target=combo, xp=200 if weekly else 50, coins=120 if weekly else 30,
+        measure=lambda e: e.combo, peak=True,
+    )
+
+
+def _perfect_scores(rng, levels, weekly):
+    count = rng.choice((2, 3)) if weekly else 1
+    return dict(
+        title=f"Score {count} perfect prompt{'s' if count > 1 else ''}", icon="💎", event_type=PromptScored,
+        target=count, xp=100 * count, coins=60 * count, measure=lambda e: e.perfect,
+    )
+
+
+DAILY_TEMPLATES = (_use_keyword, _use_keyword, _pass_level, _find_secrets, _generate_images, _reach_combo)
+WEEKLY_TEMPLATES = (_pass_level, _find_secrets, _generate_images, _reach_combo, _perfect_scores)
+
+
+def eligible_levels(levels, weekly):
+    """Levels challenges may target: daily ones stay in the first half of the curriculum"""
+    ids = sorted(level_id for level_id, level in levels.items() if level["bonus_keywords"])
+    if not weekly:
+        ids = ids[:max(1, (len(ids) + 1) // 2)]
+    return {level_id: levels[level_id] for level_id in ids}
+
+
+def generate_challenges(pack, period, weekly, count):
+    """The deterministic challenge list for one period of a pack version"""
+    rng = random.Random(f"{pack.digest}:{period}")
+    levels = eligible_levels(pack.levels, weekly)
+    templates = WEEKLY_TEMPLATES if weekly else DAILY_TEMPLATES
+    challenges, titles = [], set()
+    for template in rng.sample(templates, len(templates)):
+        spec = template(rng, levels, weekly)
+        if spec is None or spec["title"] in titles:
+            continue
+        titles.add(spec["title"])
+        challenges.append(Challenge(id=f"{pack.digest[:8]}:{period}:{len(challenges)}", weekly=weekly, **spec))
+        if len(challenges) == count:
+            break
+    return challenges
+
+
+# ===== SHARED SETS =====
+class ChallengeSet:
+    """One day's challenges plus that week's quests, indexed by event type"""
+
+    def __init__(self, day, challenges):
+        self.day = day
+        self.challenges = tuple(challenges)
+        self.ids = frozenset(challenge.id for challenge in self.challenges)
+        self._by_event = {}
+        for challenge in self.challenges:
+            self._by_event.setdefault(challenge.event_type, []).append(challenge)
+
+    @property
+    def daily(self):
+        return [challenge for challenge in self.challenges if not challenge.weekly]
+
+    @property
+    def weekly(self):
+        return [challenge for challenge in self.challenges if challenge.weekly]
+
+    def record(self, event, progress):
+        """Advance ``progress`` in place; return the challenges this event completed"""
+        if any(challenge_id not in self.ids for challenge_id in progress):
+            # Yesterday's (or last week's) entries expire with their set
+            for challenge_id in [key for key in progress if key not in self.ids]:
+                del progress[challenge_id]
+        completed = []
+        for challenge in self._by_event.get(type(event), ()):
+            before = progress.get(challenge.id, 0)
+            if before >= challenge.target:
+                continue
+            after = challenge.advance(before, event)
+            if after != before:
+                progress[challenge.id] = after
+                if after >= challenge.target:
+                    completed.append(challenge)
+        return completed
+
+    def completed(self, progress, weekly=None):
+        return sum(
+            1 for challenge in self.challenges
+            if (weekly is None or challenge.weekly == weekly) and progress.get(challenge.id, 0) >= challenge.target
+        )
+
+
+class ChallengeBoard:
+    """Process-wide cache of challenge sets, built once per pack version and day"""
+
+    def __init__(self, daily=DAILY_CHALLENGES, weekly=WEEKLY_QUESTS, retained=SETS_RETAINED):
+        self.daily = daily
+        self.weekly = weekly
+        self.retained = retained
+        self._lock = threading.Lock()
+        self._sets = {}  # (pack digest, day) -> ChallengeSet, in build order
+
+    def for_day(self, pack, day=None):
+        day = day or date.today()
+        key = (pack.digest, day)
+        challenge_set = self._sets.get(key)
+        if challenge_set is not None:
+            return challenge_set
+        with self._lock:
+            challenge_set = self._sets.get(key)
+            if challenge_set is None:
+                challenge_set = self._sets[key] = ChallengeSet(
+                    day,
+                    generate_challenges(pack, day.isoformat(), False, self.daily)
+                    + generate_challenges(pack, week_key(day), True, self.weekly),
+                )
+                while len(self._sets) > self.retained:
+                    del self._sets[next(iter(self._sets))]
+            return challenge_set
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--pack", default=DEFAULT_PACK)
+    args = parser.parse_args(argv)
+
+    challenge_set = ChallengeBoard().for_day(load_pack(args.pack), args.date)
+    for heading, challenges in (
+        (f"Daily challenges for {args.date}", challenge_set.daily),
+        (f"Weekly quests for {week_key(args.date)}", challenge_set.weekly),
+    ):
+        print(heading)
+        for challenge in challenges:
+            print(f"  {challenge.icon} {challenge.title:<44} +{challenge.xp} XP  +{challenge.coins} coins")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Cross-session request batching for diffusion generation, exposed as pollable jobs"""
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+
+from instrumentation import inc, observe
+
+BATCH_WINDOW_SECONDS = 0.25
+MAX_BATCH_SIZE = 8
+PREVIEW_INTERVAL = 5  # steps between low-resolution latent previews
+JOB_RETENTION_SECONDS = 300
+INITIAL_BATCH_SECONDS = 20.0  # wait estimate until the first batch has been timed
+BATCH_TIME_SMOOTHING = 0.3
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+@dataclass(frozen=True)
+class GenerationRequest:
+    """Everything needed to reproduce one generated image"""
+    prompt: str
+    negative_prompt: str = ""
+    seed: int = 0
+    steps: int = 20
+    width: int = 512
+    height: int = 512
+    guidance_scale: float = 7.5
+
+    @property
+    def batch_key(self):
+        """Requests sharing this key can run in the same pipeline call"""
+        return (self.steps, self.width, self.height, self.guidance_scale)
+
+
+class GenerationCancelled(Exception):
+    """Raised from the step callback to abort a batch nobody is waiting for"""
+
+
+class GenerationJob:
+    """Handle on one queued generation: poll its progress, wait for it or cancel it
+
+    Fields are written by the worker thread and read by session threads; each
+    is a single attribute assignment, so readers see a consistent value.
+    """
+
+    def __init__(self, request, key=None):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.key = key  # image cache key the result belongs under
+        self.digest = None  # media digest, once an owner has stored the result
+        self.status = QUEUED
+        self.step = 0
+        self.preview = None  # low-resolution image of the current latents
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.finished_at = None
+        self._cancel_requested = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def total_steps(self):
+        return self.request.steps
+
+    @property
+    def progress(self):
+        return min(1.0, self.step / self.total_steps) if self.total_steps else 0.0
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_requested.is_set()
+
+    def cancel(self):
+        """Ask for the job to stop; returns False if it already finished"""
+        self._cancel_requested.set()
+        return not self.done
+
+    def wait(self, timeout=None):
+        """Block until the job finishes and return its image (None if cancelled)"""
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def _finish(self, status, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.status = status
+        self.preview = None
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+
+class BatchingGenerationQueue:
+    """Collect requests from every session and run them as batched pipeline calls
+
+    ``run_batch(requests, on_step)`` receives requests sharing a ``batch_key``
+    and must return one image per request, in order. It calls
+    ``on_step(step, previews)`` after each denoising step, where ``previews``
+    is a zero-argument callable returning one preview image per request;
+    ``on_step`` raises ``GenerationCancelled`` once every job in the batch
+    has been cancelled, which aborts the pipeline call.
+    """
+
+    def __init__(self, run_batch, window=BATCH_WINDOW_SECONDS, max_batch_size=MAX_BATCH_SIZE):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending = queue.Queue()
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._outstanding = 0
+        self.seconds_per_batch = INITIAL_BATCH_SECONDS
+        self._worker = threading.Thread(target=self._run, name="generation-batcher", daemon=True)
+        self._worker.start()
+
+    # ===== JOB API =====
+    def submit(self, request, key=None):
+        """Queue a request and return its ``GenerationJob``"""
+        job = GenerationJob(request, key)
+        with self._jobs_lock:
+            self._prune_finished()
+            self._jobs[job.id] = job
+            self._outstanding += 1
+        self._pending.put(job)
+        return job
+
+    def poll(self, job_id):
+        """The job with this id, or None once it has been forgotten"""
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job by id; queued jobs are dropped, running batches abort at the next step"""
+        job = self.poll(job_id)
+        return job.cancel() if job is not None else False
+
+    def _prune_finished(self):
+        cutoff = time.monotonic() - JOB_RETENTION_SECONDS
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @property
+    def backlog(self):
+        """Jobs submitted but not finished, including the batch in flight"""
+        return self._outstanding
+
+    def estimated_wait(self, jobs=None):
+        """Seconds until ``jobs`` of the outstanding jobs (default: all) finish, from timed batches"""
+        jobs = self._outstanding if jobs is None else jobs
+        batches = -(-jobs // self.max_batch_size)
+        return batches * self.seconds_per_batch
+
+    def _finish(self, job, status, result=None, error=None):
+        job._finish(status, result, error)
+        inc("generation_jobs_total", status=status)
+        with self._jobs_lock:
+            self._outstanding -= 1
+
+    def _collect(self):
+        """Block for the first request, then gather more until the window closes"""
+        items = [self._pending.get()]
+        deadline = time.monotonic() + self.window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            groups = defaultdict(list)
+            for job in self._collect():
+                groups[job.request.batch_key].append(job)
+            for jobs in groups.values():
+                for start in range(0, len(jobs), self.max_batch_size):
+                    self._run_chunk(jobs[start:start + self.max_batch_size])
+
+    def _run_chunk(self, jobs):
+        # Callers may have given up while their request was queued
+        for job in jobs:
+            if job.cancel_requested:
+                self._finish(job, CANCELLED)
+        jobs = [job for job in jobs if not job.done]
+        if not jobs:
+            return
+        started = time.monotonic()
+        for job in jobs:
+            job.status = RUNNING
+            observe("generation_queue_wait_seconds", started - job.submitted_at)
+        observe("generation_batch_size", len(jobs), bounds=(1, 2, 4, 8, 16))
+
+        def on_step(step, previews):
+            for job in jobs:
+                job.step = step
+            if all(job.cancel_requested for job in jobs):
+                raise GenerationCancelled()
+            if step % PREVIEW_INTERVAL == 0:
+                for job, preview in zip(jobs, previews()):
+                    job.preview = preview
+
+        try:
+            images = self.run_batch([job.request for job in jobs], on_step)
+        except GenerationCancelled:
+            for job in jobs:
+                self._finish(job, CANCELLED)
+            return
+        except Exception as exc:
+            for job in jobs:
+                self._finish(job, FAILED, error=exc)
+            return
+        elapsed = time.monotonic() - started
+        self.seconds_per_batch += BATCH_TIME_SMOOTHING * (elapsed - self.seconds_per_batch)
+        for job, image in zip(jobs, images):
+            if job.cancel_requested:
+                self._finish(job, CANCELLED)
+            else:
+                self._finish(job, DONE, result=image)
@@ -0,0 +1,112 @@
+"""Generation-key index over the content-addressed media store, shared by every session"""
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import features
+
+from instrumentation import timed
+from media_store import MediaStore
+
+CACHE_DIR = os.environ.get(
+    "PROMPT_MASTER_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "images"),
+)
+INDEX_MEMORY_ENTRIES = 100_000
+
+
+def normalize_prompt(prompt):
+    """Case- and whitespace-insensitive form of a prompt"""
+    return " ".join(prompt.lower().split())
+
+
+def generation_key(prompt, negative_prompts, seed, steps, width, height, renderer="diffusion"):
+    """Stable hash of everything that determines a generated image"""
+    payload = json.dumps({
+        "prompt": normalize_prompt(prompt),
+        "negative": sorted(normalize_prompt(p) for p in negative_prompts),
+        "seed": seed,
+        "steps": steps,
+        "size": [width, height],
+        "renderer": renderer,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """Map generation keys to media digests; image bytes live in the ``MediaStore``
+
+    A hit costs one dictionary lookup (or one tiny index file read after a
+    restart) and image bytes never pass through the Streamlit process again:
+    the browser fetches them from the media endpoint by digest.
+    """
+
+    def __init__(self, store=None, directory=CACHE_DIR, image_format=None):
+        self.store = store or MediaStore()
+        self.directory = directory
+        self.image_format = image_format or ("WEBP" if features.check("webp") else "PNG")
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def extension(self):
+        return "." + self.image_format.lower()
+
+    def _index_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, key, digest):
+        with self._lock:
+            self._index[key] = digest
+            self._index.move_to_end(key)
+            if len(self._index) > INDEX_MEMORY_ENTRIES:
+                self._index.popitem(last=False)
+
+    def get(self, key):
+        """Return the media digest of the image for ``key`` or None"""
+        with self._lock:
+            digest = self._index.get(key)
+            if digest is not None:
+                self._index.move_to_end(key)
+                self.hits += 1
+                return digest
+        try:
+            with open(self._index_path(key), encoding="ascii") as handle:
+                digest = handle.read().strip()
+        except FileNotFoundError:
+            digest = None
+        if digest is None or self.store.locate(digest) is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._remember(key, digest)
+        with self._lock:
+            self.hits += 1
+        return digest
+
+    @timed("image_cache_put")
+    def put(self, key, image):
+        """Encode ``image`` once, store it by content and index it under ``key``"""
+        buffer = io.BytesIO()
+        if self.image_format == "WEBP":
+            image.save(buffer, format="WEBP", quality=90, method=4)
+        else:
+            image.save(buffer, format=self.image_format, optimize=True)
+        digest = self.store.put(buffer.getvalue(), self.extension)
+
+        path = self._index_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="ascii") as handle:
+            handle.write(digest)
+        os.replace(tmp_path, path)
+
+        self._remember(key, digest)
+        return digest
@@ -0,0 +1,346 @@
+"""Standalone inference server for multi-worker deployments, and its client
+
+In the default single-process mode each Streamlit process owns its pipeline
+and generation queue. With ``PROMPT_MASTER_INFERENCE_URL`` set, UI workers
+instead send jobs to one server process (started by ``run_workers.py``),
+which holds the only copy of the model. The server writes finished images to
+the shared media store and serves it, so workers pass digests, not bytes.
+
+Job API (JSON over localhost HTTP):
+    POST   /jobs          submit a GenerationRequest (+ cache ``key``) -> {"id": ...}
+    GET    /jobs/<id>     status, step, base64 PNG preview, result digest
+    DELETE /jobs/<id>     cancel
+    GET    /stats?jobs=N  backlog, estimated wait and whether diffusion can run
+
+Usage:
+    python inference_server.py [--host 127.0.0.1] [--port 8600]
+"""
+import argparse
+import base64
+import io
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from PIL import Image
+
+from generation_queue import (
+    CANCELLED, DONE, FAILED, QUEUED, BatchingGenerationQueue, GenerationRequest,
+)
+
+INFERENCE_URL = os.environ.get("PROMPT_MASTER_INFERENCE_URL") or None
+INFERENCE_HOST = os.environ.get("PROMPT_MASTER_INFERENCE_HOST", "127.0.0.1")
+INFERENCE_PORT = int(os.environ.get("PROMPT_MASTER_INFERENCE_PORT", "8600"))
+REQUEST_TIMEOUT_SECONDS = 5
+STATS_TTL_SECONDS = 1.0
+FINISHED = (DONE, FAILED, CANCELLED)
+JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})$")
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceUnavailable(ConnectionError):
+    """The inference server could not be reached or gave an unusable answer"""
+
+
+# ===== SERVER =====
+class InferenceService:
+    """The generation queue plus result storage, independent of the HTTP layer"""
+
+    def __init__(self, queue, cache, diffusion=True):
+        self.queue = queue
+        self.cache = cache
+        self.diffusion = diffusion
+        self._lock = threading.Lock()
+
+    def submit(self, payload):
+        key = payload.pop("key")
+        return self.queue.submit(GenerationRequest(**payload), key).id
+
+    def describe(self, job_id):
+        job = self.queue.poll(job_id)
+        if job is None:
+            return None
+        state = {
+            "id": job.id, "status": job.status, "step": job.step,
+            "total_steps": job.total_steps, "error": str(job.error) if job.error else None,
+            "preview": None, "digest": None,
+        }
+        if job.status == DONE:
+            state["digest"] = self._store_result(job)
+        elif job.preview is not None:
+            buffer = io.BytesIO()
+            job.preview.save(buffer, format="PNG")
+            state["preview"] = base64.b64encode(buffer.getvalue()).decode("ascii")
+        return state
+
+    def _store_result(self, job):
+        """Write the finished image to the shared cache once, on first poll"""
+        with self._lock:
+            if job.digest is None:
+                job.digest = self.cache.put(job.key, job.result)
+        return job.digest
+
+    def cancel(self, job_id):
+        return self.queue.cancel(job_id)
+
+    def stats(self, jobs=None):
+        return {
+            "backlog": self.queue.backlog,
+            "estimated_wait": self.queue.estimated_wait(jobs),
+            "max_batch_size": self.queue.max_batch_size,
+            "diffusion": self.diffusion,
+        }
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    service = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("inference %s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            job_id = self.service.submit(json.loads(self.rfile.read(length)))
+        except (KeyError, TypeError, ValueError) as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+        self._send_json(201, {"id": job_id})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            jobs = parse_qs(url.query).get("jobs", [None])[0]
+            if jobs is not None and not jobs.isdigit():
+                self._send_json(400, {"error": f"jobs must be a non-negative integer, not {jobs!r}"})
+                return
+            self._send_json(200, self.service.stats(int(jobs) if jobs else None))
+            return
+        match = JOB_PATH.match(url.path)
+        state = self.service.describe(match.group(1)) if match else None
+        if state is None:
+            self._send_json(404, {"error": "unknown job"})
+            return
+        self._send_json(200, state)
+
+    def do_DELETE(self):
+        match = JOB_PATH.match(self.path)
+        if not match:
+            self._send_json(404, {"error": "unknown job"})
+            return
+        self._send_json(200, {"cancelled": self.service.cancel(match.group(1))})
+
+
+def serve(host=INFERENCE_HOST, port=INFERENCE_PORT):
+    """Run the model, the generation queue and the media endpoint in this process"""
+    from image_cache import ImageCache
+    from instrumentation import start_metrics_server
+    from media_store import MediaStore, start_media_server
+    from pipeline_manager import PipelineManager, diffusion_available
+
+    store = MediaStore()
+    if start_media_server(store) is None:
+        logger.warning("Media endpoint port is taken; images will not be served by this process")
+    start_metrics_server()
+    manager = PipelineManager()
+    diffusion = diffusion_available()
+    if diffusion:
+        manager.warm_up()
+    else:
+        logger.warning("torch/diffusers are not installed; UI workers will stay in preview mode")
+    service = InferenceService(BatchingGenerationQueue(manager.generate), ImageCache(store), diffusion)
+    handler = type("BoundInferenceRequestHandler", (InferenceRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    logger.info("Inference server listening on http://%s:%s", host, port)
+    server.serve_forever()
+
+
+# ===== CLIENT =====
+def remote_diffusion_available(base_url=INFERENCE_URL):
+    """Whether the inference server can run diffusion (False if it cannot be reached)"""
+    try:
+        response = requests.get(f"{base_url.rstrip('/')}/stats", timeout=REQUEST_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        return bool(response.json().get("diffusion"))
+    except (requests.RequestException, ValueError):
+        logger.warning("Could not reach the inference server at %s; using preview mode", base_url, exc_info=True)
+        return False
+
+
+class RemoteGenerationJob:
+    """Client-side view of a job on the inference server, mirroring ``GenerationJob``
+
+    Reading ``done`` refreshes the job from the server, so a polling loop
+    costs one small request per iteration. A job whose server stops
+    answering ends FAILED with an ``InferenceUnavailable`` error.
+    """
+
+    def __init__(self, client, job_id, total_steps):
+        self._client = client
+        self.id = job_id
+        self.total_steps = total_steps
+        self.status = QUEUED
+        self.step = 0
+        self.preview = None
+        self.result = None
+        self.digest = None  # the server stores results in the shared media store
+        self.error = None
+
+    @property
+    def progress(self):
+        return min(1.0, self.step / self.total_steps) if self.total_steps else 0.0
+
+    @property
+    def done(self):
+        if self.status not in FINISHED:
+            self.refresh()
+        return self.status in FINISHED
+
+    def refresh(self):
+        try:
+            state = self._client.job_state(self.id)
+        except InferenceUnavailable as exc:
+            # The server may still run it, but this session can no longer follow it
+            self._client.cancel(self.id)
+            self.status, self.error = FAILED, exc
+            return
+        if state is None:
+            self.status, self.error = FAILED, RuntimeError("Job lost by the inference server")
+            return
+        self._apply(state)
+
+    def _apply(self, state):
+        self.status = state["status"]
+        self.step = state["step"]
+        self.digest = state["digest"]
+        if state["error"]:
+            self.error = RuntimeError(state["error"])
+        self.preview = Image.open(io.BytesIO(base64.b64decode(state["preview"]))) if state["preview"] else None
+
+    def cancel(self):
+        return self._client.cancel(self.id)
+
+    def wait(self, timeout=None, interval=0.5):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.done and (deadline is None or time.monotonic() < deadline):
+            time.sleep(interval)
+        if self.error is not None:
+            raise self.error
+        return self.digest
+
+
+class RemoteGenerationQueue:
+    """Drop-in replacement for ``BatchingGenerationQueue`` backed by the inference server
+
+    ``submit`` takes the image cache ``key`` as well, so the server can
+    index the finished image where every UI worker will find it. Calls that
+    cannot reach the server raise ``InferenceUnavailable``.
+    """
+
+    def __init__(self, base_url=INFERENCE_URL):
+        self.base_url = base_url.rstrip("/")
+        self._session = requests.Session()
+        self._stats = None
+        self._stats_at = 0.0
+
+    def _request(self, method, path, missing_ok=False, **kwargs):
+        """Decoded JSON reply (None for a 404 when ``missing_ok``); raises InferenceUnavailable"""
+        try:
+            response = self._session.request(
+                method, f"{self.base_url}{path}", timeout=REQUEST_TIMEOUT_SECONDS, **kwargs
+            )
+            if missing_ok and response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as exc:
+            raise InferenceUnavailable(f"Inference server at {self.base_url} is unavailable: {exc}") from exc
+
+    def submit(self, request, key=None):
+        job_id = self._request("POST", "/jobs", json={**asdict(request), "key": key})["id"]
+        self._stats = None
+        return RemoteGenerationJob(self, job_id, request.steps)
+
+    def job_state(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}", missing_ok=True)
+
+    def poll(self, job_id):
+        """A fresh handle on a job, or None once the server has forgotten it"""
+        try:
+            state = self.job_state(job_id)
+        except InferenceUnavailable as exc:
+            job = RemoteGenerationJob(self, job_id, 0)
+            job.status, job.error = FAILED, exc
+            return job
+        if state is None:
+            return None
+        job = RemoteGenerationJob(self, job_id, state["total_steps"])
+        job._apply(state)
+        return job
+
+    def cancel(self, job_id):
+        try:
+            state = self._request("DELETE", f"/jobs/{job_id}", missing_ok=True)
+        except InferenceUnavailable:
+            logger.warning("Could not cancel inference job %s", job_id, exc_info=True)
+            return False
+        return bool(state and state["cancelled"])
+
+    def stats(self, jobs=None):
+        if jobs is not None:
+            return self._fetch_stats(jobs)
+        # Backlog is read on every admission check; a one-second view is plenty
+        if self._stats is None or time.monotonic() - self._stats_at > STATS_TTL_SECONDS:
+            self._stats = self._fetch_stats(None)
+            self._stats_at = time.monotonic()
+        return self._stats
+
+    def _fetch_stats(self, jobs):
+        return self._request("GET", "/stats", params={"jobs": jobs} if jobs is not None else None)
+
+    @property
+    def backlog(self):
+        return self.stats()["backlog"]
+
+    @property
+    def max_batch_size(self):
+        return self.stats()["max_batch_size"]
+
+    def estimated_wait(self, jobs=None):
+        return self.stats(jobs)["estimated_wait"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=INFERENCE_HOST)
+    parser.add_argument("--port", type=int, default=INFERENCE_PORT)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    serve(args.host, args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
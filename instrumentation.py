@@ -0,0 +1,229 @@
+"""Lightweight tracing: timed spans, counters and histograms with Prometheus export
+
+Metrics are process-local and cheap enough to leave on in production. With
+``PROMPT_MASTER_METRICS=0`` the decorators return functions unchanged and
+``span()`` hands back a shared no-op context, so disabled instrumentation
+costs one attribute lookup per call site.
+"""
+import bisect
+import contextlib
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENABLED = os.environ.get("PROMPT_MASTER_METRICS", "1") != "0"
+METRICS_HOST = os.environ.get("PROMPT_MASTER_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("PROMPT_MASTER_METRICS_PORT", "9464"))
+METRIC_PREFIX = "prompt_master_"
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (coarse but allocation-free)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Registry:
+    """Named counter and histogram families keyed by label tuples"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._counters.setdefault(name, {})
+            family[key] = family.get(key, 0) + amount
+
+    def observe(self, name, value, bounds=TIME_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._histograms.setdefault(name, {})
+            histogram = family.get(key)
+            if histogram is None:
+                histogram = family[key] = Histogram(bounds)
+            histogram.observe(value)
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def snapshot(self):
+        """Copies of every family, safe to read without holding the lock"""
+        with self._lock:
+            counters = {name: dict(family) for name, family in self._counters.items()}
+            histograms = {}
+            for name, family in self._histograms.items():
+                histograms[name] = {}
+                for key, histogram in family.items():
+                    copy = Histogram(histogram.bounds)
+                    copy.counts, copy.sum, copy.count = list(histogram.counts), histogram.sum, histogram.count
+                    histograms[name][key] = copy
+        return counters, histograms
+
+    def render_prometheus(self):
+        """Text exposition format 0.0.4"""
+        counters, histograms = self.snapshot()
+        lines = []
+        for name, family in sorted(counters.items()):
+            metric = METRIC_PREFIX + name
+            lines += _header(metric, "counter", self._help.get(name))
+            lines += [f"{metric}{_labels(key)} {value}" for key, value in sorted(family.items())]
+        for name, family in sorted(histograms.items()):
+            metric = METRIC_PREFIX + name
+            lines += _header(metric, "histogram", self._help.get(name))
+            for key, histogram in sorted(family.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric}_bucket{_labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{metric}_sum{_labels(key)} {histogram.sum}")
+                lines.append(f"{metric}_count{_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _header(metric, kind, text):
+    return ([f"# HELP {metric} {text}"] if text else []) + [f"# TYPE {metric} {kind}"]
+
+
+def _labels(key):
+    if not key:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+
+REGISTRY = Registry()
+REGISTRY.describe("span_seconds", "Wall time of instrumented render functions and pipeline stages")
+REGISTRY.describe("reruns_total", "Streamlit script runs")
+REGISTRY.describe("markdown_bytes", "Bytes sent per st.markdown call, by calling function")
+
+
+# ===== SPANS =====
+_NULL_SPAN = contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def _timed_span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe("span_seconds", time.perf_counter() - started, span=name)
+
+
+def span(name):
+    """Context manager timing a block under ``name``"""
+    return _timed_span(name) if METRICS_ENABLED else _NULL_SPAN
+
+
+def timed(name=None):
+    """Decorator timing every call of a function; identity when metrics are off"""
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                REGISTRY.observe("span_seconds", time.perf_counter() - started, span=span_name)
+        return wrapper
+    return decorate
+
+
+def inc(name, amount=1, **labels):
+    if METRICS_ENABLED:
+        REGISTRY.inc(name, amount, **labels)
+
+
+def observe(name, value, bounds=TIME_BUCKETS, **labels):
+    if METRICS_ENABLED:
+        REGISTRY.observe(name, value, bounds, **labels)
+
+
+def instrument_markdown(module):
+    """Wrap ``module.markdown`` (i.e. ``st.markdown``) once to count bytes per caller"""
+    original = module.markdown
+    if not METRICS_ENABLED or getattr(original, "_instrumented", False):
+        return
+
+    @functools.wraps(original)
+    def markdown(body, *args, **kwargs):
+        caller = sys._getframe(1).f_code.co_name
+        REGISTRY.observe("markdown_bytes", len(str(body).encode("utf-8")), BYTE_BUCKETS, caller=caller)
+        return original(body, *args, **kwargs)
+
+    markdown._instrumented = True
+    module.markdown = markdown
+
+
+# ===== ENDPOINT =====
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def log_message(self, format, *args):
+        logger.debug("metrics %s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics on a daemon thread; returns None if disabled or the port is taken"""
+    if not METRICS_ENABLED:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    except OSError as exc:
+        logger.info("Metrics endpoint not started on %s:%s (%s)", host, port, exc)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,416 @@
+"""Ranked leaderboards kept in indexable skip lists
+
+Every board (all time, per cohort, per ISO week and per cohort and week) is an
+``IndexableSkipList`` ordered by ``(-xp, player_id)``. An XP change is one
+O(log n) remove and insert per board, and rank, top-K and neighbour queries
+are O(log n) lookups plus the entries returned, so page views never sort.
+Totals are persisted through the write-behind buffer to a small SQLite table
+that every process also polls for rows written by other workers.
+"""
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from progress_store import DATA_DIR, FLUSH_INTERVAL_SECONDS, WriteBehindBuffer
+
+LEADERBOARD_DB = os.environ.get("PROMPT_MASTER_LEADERBOARD_DB", os.path.join(DATA_DIR, "leaderboard.sqlite3"))
+WEEKS_RETAINED = int(os.environ.get("PROMPT_MASTER_LEADERBOARD_WEEKS", "8"))
+SYNC_INTERVAL_SECONDS = 5.0
+# Rows committed slightly out of timestamp order by other workers are still seen
+SYNC_OVERLAP_SECONDS = 5.0
+MAX_LEVELS = 32
+
+
+def week_key(day=None):
+    """ISO week label such as ``2024-W07`` (sorts chronologically)"""
+    year, week, _ = (day or date.today()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def public_name(player_id):
+    """Stable pseudonym; player ids double as login tokens and are never shown"""
+    return "PLAYER " + hashlib.sha256(player_id.encode("utf-8")).hexdigest()[:6].upper()
+
+
+# ===== INDEXABLE SKIP LIST =====
+class _Node:
+    __slots__ = ("value", "next", "width")
+
+    def __init__(self, value, height):
+        self.value = value
+        self.next = [None] * height
+        # width[level]: how many positions the link at that level skips
+        self.width = [1] * height
+
+
+class IndexableSkipList:
+    """Sorted collection of unique values with O(log n) insert, remove, rank and lookup by position"""
+
+    def __init__(self, seed=None):
+        self._head = _Node(None, MAX_LEVELS)
+        self._levels = 1  # levels in use; searches never visit the empty ones above
+        self._random = random.Random(seed)
+        self._size = 0
+
+    @classmethod
+    def from_sorted(cls, values, seed=None):
+        """Build from already sorted unique values in O(n)"""
+        skiplist = cls(seed)
+        heights = [skiplist._height() for _ in values]
+        skiplist._levels = max(heights, default=1)
+        last = [skiplist._head] * skiplist._levels
+        last_position = [-1] * skiplist._levels
+        for position, (value, height) in enumerate(zip(values, heights)):
+            node = _Node(value, height)
+            for level in range(height):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level], last_position[level] = node, position
+        skiplist._size = len(heights)
+        for level in range(skiplist._levels):
+            last[level].width[level] = skiplist._size - last_position[level]
+        return skiplist
+
+    def __len__(self):
+        return self._size
+
+    def _height(self):
+        height = 1
+        while height < MAX_LEVELS and self._random.random() < 0.5:
+            height += 1
+        return height
+
+    def _path(self, value):
+        """Rightmost node before ``value`` on every level, with positions skipped per level"""
+        chain = [None] * self._levels
+        skipped = [0] * self._levels
+        node = self._head
+        for level in reversed(range(self._levels)):
+            following = node.next[level]
+            while following is not None and following.value < value:
+                skipped[level] += node.width[level]
+                node = following
+                following = node.next[level]
+            chain[level] = node
+        return chain, skipped
+
+    def insert(self, value):
+        height = self._height()
+        if height > self._levels:
+            for level in range(self._levels, height):
+                # An unused head link spans the whole list
+                self._head.next[level] = None
+                self._head.width[level] = self._size + 1
+            self._levels = height
+        chain, skipped = self._path(value)
+        new = _Node(value, height)
+        steps = 0
+        for level in range(height):
+            previous = chain[level]
+            new.next[level] = previous.next[level]
+            previous.next[level] = new
+            new.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += skipped[level]
+        for level in range(height, self._levels):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, value):
+        chain, _ = self._path(value)
+        target = chain[0].next[0]
+        if target is None or target.value != value:
+            raise KeyError(value)
+        height = len(target.next)
+        for level in range(height):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(height, self._levels):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def bisect_left(self, value):
+        """Number of stored values smaller than ``value``"""
+        return sum(self._path(value)[1])
+
+    def _node_at(self, index):
+        remaining = index + 1
+        node = self._head
+        for level in reversed(range(self._levels)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        return self._node_at(index).value
+
+    def slice(self, start, stop):
+        """Values at positions ``start`` to ``stop - 1``: O(log n + stop - start)"""
+        start, stop = max(0, start), min(stop, self._size)
+        if start >= stop:
+            return []
+        node = self._node_at(start)
+        values = []
+        for _ in range(stop - start):
+            values.append(node.value)
+            node = node.next[0]
+        return values
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.value
+            node = node.next[0]
+
+
+# ===== LEADERBOARD =====
+@dataclass(frozen=True)
+class LeaderboardEntry:
+    rank: int  # competition ranking: tied players share a rank
+    player_id: str
+    xp: int
+
+    @property
+    def name(self):
+        return public_name(self.player_id)
+
+
+class Leaderboard:
+    """All-time and weekly boards, optionally per cohort, maintained on every XP change"""
+
+    def __init__(self, store=None, weeks_retained=WEEKS_RETAINED, sync_interval=SYNC_INTERVAL_SECONDS):
+        self.store = store
+        self.weeks_retained = weeks_retained
+        self.sync_interval = sync_interval
+        self._writer = None
+        if store is not None:
+            self._writer = WriteBehindBuffer(store, FLUSH_INTERVAL_SECONDS, name="leaderboard-flusher")
+        self._lock = threading.RLock()
+        self._boards = {}  # (cohort or None, week or None) -> IndexableSkipList
+        self._totals = {}  # player_id -> all-time XP
+        self._weekly = {}  # player_id -> {week: XP earned that week}
+        self._cohorts = {}  # player_id -> cohort or None
+        self._updated_at = {}  # player_id -> time of the last local change
+        self._watermark = 0.0
+        self._last_sync = 0.0
+        self._pruned_before = None
+        if store is not None:
+            self.sync(force=True)
+
+    # ----- maintenance -----
+    def _board(self, cohort, week):
+        board = self._boards.get((cohort, week))
+        if board is None:
+            board = self._boards[(cohort, week)] = IndexableSkipList()
+        return board
+
+    def _scopes(self, player_id):
+        """(board key, XP on that board) for every board the player is on"""
+        cohort = self._cohorts.get(player_id)
+        scopes = [((None, None), self._totals[player_id])]
+        if cohort:
+            scopes.append(((cohort, None), self._totals[player_id]))
+        for week, xp in self._weekly.get(player_id, {}).items():
+            scopes.append(((None, week), xp))
+            if cohort:
+                scopes.append(((cohort, week), xp))
+        return scopes
+
+    def _set(self, player_id, cohort, total_xp, weekly):
+        """Replace a player's standing on every board"""
+        if player_id in self._totals:
+            for key, xp in self._scopes(player_id):
+                self._boards[key].remove((-xp, player_id))
+        oldest = self._oldest_week()
+        self._totals[player_id] = total_xp
+        self._cohorts[player_id] = cohort or None
+        self._weekly[player_id] = {week: xp for week, xp in weekly.items() if week >= oldest}
+        for key, xp in self._scopes(player_id):
+            self._board(*key).insert((-xp, player_id))
+
+    def _oldest_week(self):
+        return week_key(date.today() - timedelta(weeks=self.weeks_retained - 1))
+
+    def update(self, player_id, total_xp, cohort=None, day=None):
+        """Record a player's current total; the gain since the last update counts toward this week"""
+        with self._lock:
+            previous = self._totals.get(player_id)
+            cohort = cohort or self._cohorts.get(player_id)
+            if previous == total_xp and cohort == self._cohorts.get(player_id):
+                return
+            weekly = dict(self._weekly.get(player_id, {}))
+            if previous is not None and total_xp != previous:
+                week = week_key(day)
+                weekly[week] = weekly.get(week, 0) + total_xp - previous
+            self._set(player_id, cohort, total_xp, weekly)
+            self._updated_at[player_id] = time.time()
+            if self._writer is not None:
+                # A copy: _prune edits the live dict while the flusher encodes it
+                self._writer.stage(player_id, (self._cohorts[player_id], total_xp, dict(self._weekly[player_id])))
+
+    def cohort_of(self, player_id):
+        with self._lock:
+            return self._cohorts.get(player_id)
+
+    def sync(self, force=False):
+        """Apply rows other workers wrote since the last sync (throttled unless ``force``)"""
+        if self.store is None:
+            return 0
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_sync < self.sync_interval:
+                return 0
+            self._last_sync = now
+            rows = self.store.changed_since(self._watermark - SYNC_OVERLAP_SECONDS)
+            if not self._totals:
+                return self._load(rows)
+            applied = 0
+            for player_id, cohort, total_xp, weekly, updated_at in rows:
+                self._watermark = max(self._watermark, updated_at)
+                # Skip rows older than a change this process has not flushed yet
+                if updated_at <= self._updated_at.get(player_id, 0.0):
+                    continue
+                self._set(player_id, cohort, total_xp, weekly)
+                applied += 1
+            self._prune(self._oldest_week())
+            return applied
+
+    def _load(self, rows):
+        """Initial load: sort each board once and build it in bulk"""
+        oldest = self._oldest_week()
+        members = {}
+        for player_id, cohort, total_xp, weekly, updated_at in rows:
+            self._watermark = max(self._watermark, updated_at)
+            self._totals[player_id] = total_xp
+            self._cohorts[player_id] = cohort or None
+            self._weekly[player_id] = {week: xp for week, xp in weekly.items() if week >= oldest}
+            for key, xp in self._scopes(player_id):
+                members.setdefault(key, []).append((-xp, player_id))
+        for key, values in members.items():
+            values.sort()
+            self._boards[key] = IndexableSkipList.from_sorted(values)
+        self._pruned_before = oldest
+        return len(rows)
+
+    def _prune(self, oldest):
+        """Drop weekly boards that aged out; runs once per week boundary"""
+        if oldest == self._pruned_before:
+            return
+        self._pruned_before = oldest
+        for cohort, week in [key for key in self._boards if key[1] is not None and key[1] < oldest]:
+            del self._boards[(cohort, week)]
+        for player_id, weekly in self._weekly.items():
+            for week in [week for week in weekly if week < oldest]:
+                del weekly[week]
+
+    def flush(self):
+        return self._writer.flush() if self._writer is not None else 0
+
+    # ----- queries -----
+    def size(self, cohort=None, week=None):
+        with self._lock:
+            board = self._boards.get((cohort, week))
+            return len(board) if board else 0
+
+    def _entry(self, board, key):
+        # Competition rank: one plus the number of players with strictly more XP
+        rank = board.bisect_left((key[0], "")) + 1
+        return LeaderboardEntry(rank=rank, player_id=key[1], xp=-key[0])
+
+    def top(self, count, cohort=None, week=None):
+        with self._lock:
+            board = self._boards.get((cohort, week))
+            if not board:
+                return []
+            return [self._entry(board, key) for key in board.slice(0, count)]
+
+    def _key(self, player_id, cohort, week):
+        if player_id not in self._totals:
+            return None
+        if week is None:
+            return (-self._totals[player_id], player_id)
+        xp = self._weekly[player_id].get(week)
+        return None if xp is None else (-xp, player_id)
+
+    def rank(self, player_id, cohort=None, week=None):
+        """The player's entry on a board, or None if they are not on it"""
+        with self._lock:
+            board = self._boards.get((cohort, week))
+            key = self._key(player_id, cohort, week)
+            if not board or key is None or (cohort and self._cohorts.get(player_id) != cohort):
+                return None
+            return self._entry(board, key)
+
+    def neighbors(self, player_id, above=2, below=2, cohort=None, week=None):
+        """Entries around the player (inclusive), ordered best first"""
+        with self._lock:
+            board = self._boards.get((cohort, week))
+            key = self._key(player_id, cohort, week)
+            if not board or key is None or (cohort and self._cohorts.get(player_id) != cohort):
+                return []
+            position = board.bisect_left(key)
+            return [self._entry(board, k) for k in board.slice(position - above, position + below + 1)]
+
+
+# ===== PERSISTENCE =====
+class SQLiteLeaderboardStore:
+    """One row per player: cohort, all-time XP and recent weekly XP"""
+
+    def __init__(self, path=LEADERBOARD_DB):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leaderboard ("
+            "player_id TEXT PRIMARY KEY, cohort TEXT, total_xp INTEGER NOT NULL, "
+            "weekly TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS leaderboard_updated ON leaderboard (updated_at)")
+
+    def save_many(self, records):
+        """Persist ``{player_id: (cohort, total_xp, weekly)}`` in one transaction"""
+        if not records:
+            return
+        now = time.time()
+        rows = [
+            (player_id, cohort, total_xp, json.dumps(weekly, separators=(",", ":")), now)
+            for player_id, (cohort, total_xp, weekly) in records.items()
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO leaderboard (player_id, cohort, total_xp, weekly, updated_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(player_id) DO UPDATE SET cohort = excluded.cohort, total_xp = excluded.total_xp, "
+                    "weekly = excluded.weekly, updated_at = excluded.updated_at",
+                    rows,
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def changed_since(self, timestamp):
+        """(player_id, cohort, total_xp, weekly, updated_at) rows written after ``timestamp``"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT player_id, cohort, total_xp, weekly, updated_at FROM leaderboard WHERE updated_at > ?",
+                (timestamp,),
+            ).fetchall()
+        return [(player_id, cohort, xp, json.loads(weekly), at) for player_id, cohort, xp, weekly, at in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,417 @@
+"""Curriculum packs: level and achievement definitions loaded from JSON or YAML files
+
+A pack is validated against ``LEVEL_SCHEMA`` and compiled into a
+``CompiledPack`` holding everything derived from it: the keyword index,
+level card and explanation HTML, and per-level XP tables. Compiled packs are
+pickled under ``PACK_CACHE_DIR`` keyed by the hash of the pack file, so a
+pack version is compiled once and every later process just loads it.
+``PackRegistry`` watches the pack files and swaps in new versions without a
+restart. The built-in curriculum in levels.py is the ``default`` pack unless
+``packs/default.json`` overrides it.
+
+Usage:
+    python level_packs.py list
+    python level_packs.py validate packs/spring.yaml
+    python level_packs.py compile                        # warm the cache for every pack
+    python level_packs.py export default > packs/my-class.json
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+from html import escape
+
+from achievements import CREATIVE_TAG, LEVEL_TAGS, build_trackers, style_phrases, tagged_levels
+from levels import ACHIEVEMENTS, LEVELS
+from pipeline_manager import module_available
+from prompt_scoring import KeywordIndex, tokenize
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PACKS_DIR = os.environ.get("PROMPT_MASTER_PACKS_DIR", os.path.join(ROOT, "packs"))
+PACK_CACHE_DIR = os.environ.get("PROMPT_MASTER_PACK_CACHE_DIR", os.path.join(ROOT, ".cache", "packs"))
+DEFAULT_PACK = os.environ.get("PROMPT_MASTER_PACK", "default")
+PACK_CHECK_SECONDS = 2.0
+COMPILED_FORMAT = 3  # bump whenever compilation or the HTML templates change
+PACK_EXTENSIONS = (".json", ".yaml", ".yml")
+PACK_NAME_PATTERN = re.compile(r"[a-z0-9][a-z0-9_-]{0,63}")
+COLOR_PATTERN = re.compile(r"#[0-9a-fA-F]{6}")
+
+# Field -> type; lists hold strings, integers must be non-negative
+LEVEL_SCHEMA = {
+    "title": str, "icon": str, "theme_color": str, "description": str, "learning_focus": str,
+    "what_to_do": str, "how_to_do": str, "step_by_step": list,
+    "required_keywords": list, "bonus_keywords": list, "secret_keywords": list, "negative_prompts": list,
+    "min_xp_to_pass": int, "base_xp": int, "bonus_xp": int, "secret_xp": int,
+    "max_words": int, "difficulty_stars": int, "techniques": list, "example_prompt": str, "tutorial": str,
+}
+# Optional level fields: "tags" mark the levels achievements key off (achievements.LEVEL_TAGS)
+OPTIONAL_LEVEL_SCHEMA = {"tags": list}
+KEYWORD_FIELDS = ("required_keywords", "bonus_keywords", "secret_keywords", "negative_prompts")
+ACHIEVEMENT_SCHEMA = {"name": str, "icon": str, "desc": str, "xp": int}
+# Achievements are unlocked by trackers in achievements.py; packs can retitle or drop them
+TRACKED_ACHIEVEMENTS = frozenset(build_trackers())
+
+logger = logging.getLogger(__name__)
+
+
+class PackError(ValueError):
+    """A pack file that cannot be parsed or fails validation"""
+
+    def __init__(self, source, problems):
+        self.problems = problems
+        super().__init__(f"{source}: " + "; ".join(problems))
+
+
+# ===== VALIDATION =====
+def _check_fields(prefix, entry, schema, problems, optional=None):
+    if not isinstance(entry, dict):
+        problems.append(f"{prefix} must be a mapping")
+        return
+    optional = optional or {}
+    for field, kind in {**schema, **optional}.items():
+        value = entry.get(field)
+        if value is None:
+            if field not in optional:
+                problems.append(f"{prefix}.{field} is missing")
+        elif kind is int and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+            problems.append(f"{prefix}.{field} must be a non-negative integer")
+        elif kind is list and not (isinstance(value, list) and all(isinstance(item, str) for item in value)):
+            problems.append(f"{prefix}.{field} must be a list of strings")
+        elif kind is str and not isinstance(value, str):
+            problems.append(f"{prefix}.{field} must be a string")
+    unknown = sorted(set(entry) - set(schema) - set(optional))
+    if unknown:
+        problems.append(f"{prefix} has unknown fields: {', '.join(unknown)}")
+
+
+def validate_pack(data, source="pack"):
+    """Normalized ``(title, levels, achievements)``; raises PackError listing every problem"""
+    if not isinstance(data, dict):
+        raise PackError(source, ["top level must be a mapping"])
+    problems = []
+    raw_levels = data.get("levels")
+    if isinstance(raw_levels, list):
+        raw_levels = dict(enumerate(raw_levels, 1))
+    if not isinstance(raw_levels, dict) or not raw_levels:
+        raise PackError(source, ["levels must be a non-empty mapping or list"])
+
+    levels = {}
+    for key, level in raw_levels.items():
+        try:
+            level_id = int(key)
+        except (TypeError, ValueError):
+            problems.append(f"level id {key!r} is not an integer")
+            continue
+        prefix = f"levels.{level_id}"
+        _check_fields(prefix, level, LEVEL_SCHEMA, problems, OPTIONAL_LEVEL_SCHEMA)
+        if not isinstance(level, dict):
+            continue
+        tags = level.get("tags")
+        if isinstance(tags, list):
+            unknown_tags = sorted(set(tags) - set(LEVEL_TAGS))
+            if unknown_tags:
+                problems.append(f"{prefix}.tags has unknown tags {unknown_tags} (known: {', '.join(LEVEL_TAGS)})")
+        if isinstance(level.get("theme_color"), str) and not COLOR_PATTERN.fullmatch(level["theme_color"]):
+            problems.append(f"{prefix}.theme_color must look like #1a2b3c")
+        if level.get("required_keywords") == []:
+            problems.append(f"{prefix}.required_keywords must not be empty")
+        for field in KEYWORD_FIELDS:
+            keywords = level.get(field)
+            if isinstance(keywords, list):
+                # A keyword without word tokens would sit on the trie root and match every prompt
+                blank = [keyword for keyword in keywords if isinstance(keyword, str) and not tokenize(keyword)]
+                if blank:
+                    problems.append(f"{prefix}.{field} has keywords without any words: {blank}")
+        if level.get("max_words") == 0:
+            problems.append(f"{prefix}.max_words must be at least 1")
+        levels[level_id] = level
+    # Progress is stored as "highest unlocked level", so ids must run 1..N
+    if levels and sorted(levels) != list(range(1, len(levels) + 1)):
+        problems.append(f"level ids must be 1..{len(levels)}, got {sorted(levels)}")
+
+    achievements = data.get("achievements", ACHIEVEMENTS)
+    if not isinstance(achievements, dict):
+        problems.append("achievements must be a mapping")
+        achievements = {}
+    for achievement_id, achievement in achievements.items():
+        if achievement_id not in TRACKED_ACHIEVEMENTS:
+            problems.append(f"achievements.{achievement_id} has no tracker (known: {', '.join(sorted(TRACKED_ACHIEVEMENTS))})")
+        _check_fields(f"achievements.{achievement_id}", achievement, ACHIEVEMENT_SCHEMA, problems)
+
+    title = data.get("title", "")
+    if not isinstance(title, str):
+        problems.append("title must be a string")
+    if problems:
+        raise PackError(source, problems)
+    return title, {level_id: levels[level_id] for level_id in sorted(levels)}, dict(achievements)
+
+
+# ===== HTML FRAGMENTS =====
+# Pack text is escaped: packs are authored outside the code base
+LEVEL_CARD_STATUS = {
+    "completed": ("gaming-level-card completed", "MASTERED", "#39ff14"),
+    "available": ("gaming-level-card", "AVAILABLE", "#00ffff"),
+    "locked": ("gaming-level-card locked", "LOCKED", "#666666"),
+}
+
+
+def compact_html(html):
+    """Drop indentation and blank lines so markdown keeps the block as raw HTML"""
+    return "\n".join(line.strip() for line in html.splitlines() if line.strip())
+
+
+def level_card_html(level_id, level_data, status):
+    """HTML for one level card in the given status"""
+    card_class, status_text, status_color = LEVEL_CARD_STATUS[status]
+    return compact_html(f"""
+    <div class="{card_class}">
+        <div class="level-card-header">
+            <div class="level-icon-large">{escape(level_data['icon'])}</div>
+            <h3 class="level-title">LEVEL {level_id}: {escape(level_data['title'])}</h3>
+            <div style="color: {status_color}; font-weight: 700; margin-top: 1rem; font-size: 1.1rem; text-shadow: 0 0 3px #000000, 0 0 6px #000000, 0 0 10px {status_color};">{status_text}</div>
+        </div>
+        <div class="level-card-body">
+            <p class="level-description">{escape(level_data['description'])}</p>
+            <div class="level-stats">
+                <span class="level-stat">{'⭐' * level_data['difficulty_stars']}</span>
+                <span class="level-stat">{level_data['min_xp_to_pass']} XP</span>
+                <span class="level-stat">{level_data['max_words']} WORDS</span>
+            </div>
+        </div>
+    </div>
+    """)
+
+
+def level_explanation_html(level_info):
+    """What/how/step-by-step explanation box for a level"""
+    steps = "".join(
+        f'<div class="step-item"><span class="step-number">STEP {i}:</span> {escape(step)}</div>'
+        for i, step in enumerate(level_info['step_by_step'], 1)
+    )
+    return compact_html(f"""
+    <div class="level-explanation-box">
+        <div class="explanation-section">
+            <div class="explanation-title">🎯 WHAT YOU'LL DO</div>
+            <div class="explanation-text">{escape(level_info['what_to_do'])}</div>
+        </div>
+        <div class="explanation-section">
+            <div class="explanation-title">📋 HOW TO DO IT</div>
+            <div class="explanation-text">{escape(level_info['how_to_do'])}</div>
+        </div>
+        <div class="explanation-section">
+            <div class="explanation-title">🔢 STEP-BY-STEP GUIDE</div>
+            <div class="step-list">{steps}</div>
+        </div>
+    </div>
+    """)
+
+
+def xp_table(level):
+    """XP constants of a level plus the best score it allows"""
+    return {
+        "base": level["base_xp"], "per_bonus": level["bonus_xp"], "per_secret": level["secret_xp"],
+        "per_negative": -level["bonus_xp"], "to_pass": level["min_xp_to_pass"],
+        "max": level["base_xp"] + level["bonus_xp"] * len(level["bonus_keywords"])
+               + level["secret_xp"] * len(level["secret_keywords"]),
+    }
+
+
+# ===== COMPILED PACKS =====
+class CompiledPack:
+    """A validated pack with its keyword index, HTML fragments and XP tables precomputed"""
+
+    def __init__(self, name, digest, title, levels, achievements):
+        self.name = name
+        self.digest = digest
+        self.title = title
+        self.levels = levels
+        self.achievements = achievements
+        self.keyword_index = KeywordIndex(levels)
+        self.card_html = {
+            (level_id, status): level_card_html(level_id, level, status)
+            for level_id, level in levels.items() for status in LEVEL_CARD_STATUS
+        }
+        self.explanation_html = {level_id: level_explanation_html(level) for level_id, level in levels.items()}
+        self.xp_tables = {level_id: xp_table(level) for level_id, level in levels.items()}
+        self.style_phrases = style_phrases(levels)
+        self.creative_levels = tagged_levels(levels, CREATIVE_TAG)
+
+
+def pack_path(name, directory=PACKS_DIR):
+    """The file defining pack ``name``, or None"""
+    for extension in PACK_EXTENSIONS:
+        path = os.path.join(directory, name + extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def parse_pack(data, path):
+    """Decode pack file bytes as JSON or YAML (YAML needs the optional pyyaml)"""
+    if path.endswith(".json"):
+        loader = json.loads
+    else:
+        if not module_available("yaml"):
+            raise PackError(path, ["YAML packs need pyyaml: pip install pyyaml"])
+        import yaml
+
+        loader = yaml.safe_load
+    try:
+        return loader(data)
+    except Exception as exc:  # JSONDecodeError, YAMLError, UnicodeDecodeError
+        raise PackError(path, [f"cannot parse: {exc}"]) from exc
+
+
+def builtin_pack_source():
+    return {"title": "Prompt Master Academy", "levels": LEVELS, "achievements": ACHIEVEMENTS}
+
+
+def pack_source(name, directory=PACKS_DIR):
+    """(raw bytes, path) for a pack; the built-in default has no path"""
+    if not PACK_NAME_PATTERN.fullmatch(name):
+        raise KeyError(name)
+    path = pack_path(name, directory)
+    if path is not None:
+        with open(path, "rb") as handle:
+            return handle.read(), path
+    if name == "default":
+        return json.dumps(builtin_pack_source(), sort_keys=True, ensure_ascii=False).encode("utf-8"), None
+    raise KeyError(name)
+
+
+def load_pack(name, directory=PACKS_DIR, cache_dir=PACK_CACHE_DIR):
+    """Compiled pack from the cache if this file version was compiled before, else compile and cache it"""
+    data, path = pack_source(name, directory)
+    digest = hashlib.sha256(data).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{name}-{digest[:24]}-v{COMPILED_FORMAT}.pickle")
+    try:
+        with open(cache_path, "rb") as handle:
+            state = pickle.load(handle)
+        if state.get("digest") == digest:
+            pack = CompiledPack.__new__(CompiledPack)
+            pack.__dict__.update(state)
+            return pack
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.warning("Discarding unreadable compiled pack %s", cache_path, exc_info=True)
+
+    source = path or "levels.py"
+    parsed = parse_pack(data, path) if path else builtin_pack_source()
+    title, levels, achievements = validate_pack(parsed, source)
+    pack = CompiledPack(name, digest, title or name, levels, achievements)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as handle:
+        # Attributes only, so the cache does not depend on how this module was imported
+        pickle.dump(vars(pack), handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return pack
+
+
+def available_packs(directory=PACKS_DIR):
+    names = {"default"}
+    if os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            name, extension = os.path.splitext(filename)
+            if extension in PACK_EXTENSIONS and PACK_NAME_PATTERN.fullmatch(name):
+                names.add(name)
+    return sorted(names)
+
+
+class PackRegistry:
+    """Process-wide compiled packs, reloaded when their files change
+
+    Files are checked at most every ``check_interval`` seconds per pack. A
+    pack that fails to load after an edit keeps serving its last good version.
+    """
+
+    def __init__(self, directory=PACKS_DIR, cache_dir=PACK_CACHE_DIR, check_interval=PACK_CHECK_SECONDS):
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._packs = {}  # name -> (CompiledPack, file signature)
+        self._checked = {}  # name -> monotonic time of the last file check
+
+    def _signature(self, name):
+        path = pack_path(name, self.directory)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def get(self, name=DEFAULT_PACK):
+        """Latest good version of a pack; KeyError for unknown names"""
+        now = time.monotonic()
+        entry = self._packs.get(name)
+        if entry is not None and now - self._checked.get(name, 0.0) < self.check_interval:
+            return entry[0]
+        with self._lock:
+            entry = self._packs.get(name)
+            self._checked[name] = now
+            try:
+                signature = self._signature(name) if PACK_NAME_PATTERN.fullmatch(name) else None
+                if entry is not None and signature == entry[1]:
+                    return entry[0]
+                pack = load_pack(name, self.directory, self.cache_dir)
+            except (PackError, OSError, KeyError) as exc:
+                if entry is None:
+                    raise
+                logger.error("Keeping pack %r version %s: %s", name, entry[0].digest[:12], exc)
+                return entry[0]
+            if entry is None or pack.digest != entry[0].digest:
+                logger.info("Loaded pack %r version %s", name, pack.digest[:12])
+            self._packs[name] = (pack, signature)
+            return pack
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("list", "validate", "compile", "export"))
+    parser.add_argument("target", nargs="?", help="pack file (validate) or pack name (export)")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name in available_packs():
+            print(f"{name:<24} {pack_path(name) or 'built-in (levels.py)'}")
+    elif args.command == "validate":
+        if not args.target:
+            parser.error("validate needs a pack file")
+        with open(args.target, "rb") as handle:
+            data = handle.read()
+        try:
+            title, levels, achievements = validate_pack(parse_pack(data, args.target), args.target)
+        except PackError as exc:
+            print(f"{args.target}: {len(exc.problems)} problem(s)", file=sys.stderr)
+            for problem in exc.problems:
+                print(f"  - {problem}", file=sys.stderr)
+            return 1
+        print(f"{args.target}: OK ({len(levels)} levels, {len(achievements)} achievements)")
+    elif args.command == "compile":
+        failed = 0
+        for name in available_packs():
+            started = time.perf_counter()
+            try:
+                pack = load_pack(name)
+            except PackError as exc:
+                print(exc, file=sys.stderr)
+                failed += 1
+                continue
+            print(f"{name:<24} {pack.digest[:12]}  {len(pack.levels)} levels  {time.perf_counter() - started:.3f}s")
+        return 1 if failed else 0
+    else:
+        data, path = pack_source(args.target or "default")
+        json.dump(parse_pack(data, path) if path else json.loads(data), sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""Curriculum definitions: the 8 training levels and the achievement catalogue"""
+
+# ===== COMPLETE 8-LEVEL SYSTEM =====
+LEVELS = {
+    1: {
+        "title": "Word Discovery", "icon": "🧙‍♂️", "theme_color": "#FF6B9D",
+        "description": "Master basic vocabulary and word-image relationships",
+        "learning_focus": "Understanding how words translate to visual elements",
+        "what_to_do": "Learn how individual words create visual magic! Start with simple, positive words that paint clear pictures in your mind.",
+        "how_to_do": "Use simple words like 'bright', 'magical', 'sparkle'. Focus on what you WANT to see, not what you don't want. Keep it under 6 words. Think like you're describing a scene to a friend.",
+        "step_by_step": [
+            "Pick a main subject (cat, dragon, castle)",
+            "Add 2-3 descriptive words (magical, bright, colorful)",
+            "Include at least one required keyword",
+            "Keep it positive and clear",
+            "Hit generate and see your creation!"
+        ],
+        "required_keywords": ["simple", "clear", "basic"],
+        "bonus_keywords": ["bright", "colorful", "happy", "cute", "small", "large"],
+        "secret_keywords": ["sparkle", "glow", "magical"],
+        "negative_prompts": ["blurry", "ugly", "distorted"],
+        "min_xp_to_pass": 100, "base_xp": 50, "bonus_xp": 20, "secret_xp": 50,
+        "max_words": 6, "difficulty_stars": 1,
+        "techniques": ["Positive prompting", "Basic descriptors", "Word prioritization"],
+        "example_prompt": "A simple magical cat with bright colorful sparkles",
+        "tutorial": "Start with simple, positive descriptions. Focus on what you WANT to see, not what you don't want."
+    },
+    2: {
+        "title": "Scene Architecture", "icon": "🏗️", "theme_color": "#4ECDC4",
+        "description": "Build complete scenes with Subject + Action + Setting structure",
+        "learning_focus": "Creating coherent visual narratives",
+        "what_to_do": "Build complete movie-like scenes! Learn the secret formula: WHO + WHAT + WHERE to create amazing visual stories.",
+        "how_to_do": "Pick your main character (WHO). Choose what they're doing (WHAT). Set the location (WHERE). Use scene-building keywords to enhance.",
+        "step_by_step": [
+            "Choose your main subject (dragon, princess, warrior)",
+            "Add an action (flying, dancing, fighting)",
+            "Set the scene (forest, castle, beach)",
+            "Use required keywords like 'scene', 'setting'",
+            "Make it mysterious with bonus words!"
+        ],
+        "required_keywords": ["scene", "setting", "environment"],
+        "bonus_keywords": ["garden", "forest", "castle", "beach", "mountain", "city"],
+        "secret_keywords": ["hidden", "mysterious", "ancient"],
+        "negative_prompts": ["empty", "boring", "plain"],
+        "min_xp_to_pass": 150, "base_xp": 70, "bonus_xp": 25, "secret_xp": 60,
+        "max_words": 10, "difficulty_stars": 2,
+        "techniques": ["Scene composition", "Environmental storytelling", "Action integration"],
+        "example_prompt": "A mysterious ancient forest scene with hidden magical creatures dancing",
+        "tutorial": "Use the formula: Subject + Action + Setting. Example: 'Dragon flying over mountain castle'"
+    },
+    3: {
+        "title": "Visual Control", "icon": "📸", "theme_color": "#9B59B6",
+        "description": "Master lighting, camera angles, and lens techniques",
+        "learning_focus": "Technical photography and cinematography concepts",
+        "what_to_do": "Become the director! Control lighting, camera angles, and visual effects like a movie director to create stunning, professional-looking images.",
+        "how_to_do": "Choose your lighting (golden hour, dramatic, soft). Pick camera angle (close-up, wide angle, macro). Add technical terms for quality. Think like a photographer!",
+        "step_by_step": [
+            "Start with your subject",
+            "Add lighting keywords (golden hour, dramatic)",
+            "Choose camera angle (macro, wide angle, close-up)",
+            "Include technical terms (professional, cinematic)",
+            "Combine all for movie-quality results!"
+        ],
+        "required_keywords": ["lighting", "angle", "lens"],
+        "bonus_keywords": ["golden hour", "dramatic", "soft light", "wide angle", "macro", "close-up"],
+        "secret_keywords": ["cinematic", "professional", "award-winning"],
+        "negative_prompts": ["dark", "harsh shadows", "overexposed"],
+        "min_xp_to_pass": 200, "base_xp": 90, "bonus_xp": 30, "secret_xp": 70,
+        "max_words": 12, "difficulty_stars": 3,
+        "techniques": ["Lighting control", "Camera positioning", "Lens selection"],
+        "example_prompt": "Professional macro lens close-up with soft golden hour lighting, cinematic angle",
+        "tutorial": "Control your 'camera': golden hour = warm light, wide angle = expansive view, macro = extreme close-up"
+    },
+    4: {
+        "title": "Style Mastery", "icon": "🎨", "theme_color": "#E74C3C",
+        "description": "Apply artistic movements and stylistic direction",
+        "learning_focus": "Art history and aesthetic choices",
+        "what_to_do": "Become an art historian! Learn to apply famous art styles like Picasso, Van Gogh, or futuristic cyberpunk to transform your images into masterpieces.",
+        "how_to_do": "Choose an art style (impressionist, cyberpunk, minimalist). Add style-specific keywords. Include quality terms. Reference famous art movements.",
+        "step_by_step": [
+            "Pick your base subject",
+            "Choose an art movement (impressionist, baroque, modern)",
+            "Add style keywords that match the movement",
+            "Include gallery/museum quality terms",
+            "Create your artistic masterpiece!"
+        ],
+        "required_keywords": ["style", "art", "aesthetic"],
+        "bonus_keywords": ["impressionist", "cyberpunk", "minimalist", "baroque", "renaissance", "modern"],
+        "secret_keywords": ["masterpiece", "gallery", "museum"],
+        "negative_prompts": ["amateur", "low quality", "generic"],
+        "min_xp_to_pass": 250, "base_xp": 110, "bonus_xp": 35, "secret_xp": 80,
+        "max_words": 15, "difficulty_stars": 4,
+        "techniques": ["Art movement integration", "Style consistency", "Aesthetic coherence"],
+        "tags": ["style"],
+        "example_prompt": "Impressionist style masterpiece painting with vibrant colors, museum gallery quality",
+        "tutorial": "Reference art movements: 'impressionist' = soft brushstrokes, 'cyberpunk' = neon + tech, 'minimalist' = clean + simple"
+    },
+    5: {
+        "title": "Technical Precision", "icon": "⚙️", "theme_color": "#F39C12",
+        "description": "Advanced parameters, negative prompts, and quality control",
+        "learning_focus": "Technical optimization and parameter control",
+        "what_to_do": "Master the technical side! Learn advanced techniques like negative prompting and quality parameters to create flawless, professional-grade images.",
+        "how_to_do": "Use technical quality terms (4k, ultra-detailed, sharp). Learn negative prompting to remove unwanted elements. Add precision words for clarity.",
+        "step_by_step": [
+            "Start with your main concept",
+            "Add quality enhancers (4k, ultra-detailed, sharp)",
+            "Include precision terms (technically perfect, flawless)",
+            "Use negative prompts to avoid unwanted elements",
+            "Create studio-quality masterpieces!"
+        ],
+        "required_keywords": ["detailed", "quality", "precise"],
+        "bonus_keywords": ["4k", "ultra-detailed", "high-resolution", "sharp", "crisp", "perfect"],
+        "secret_keywords": ["technically perfect", "flawless", "studio quality"],
+        "negative_prompts": ["blurry", "pixelated", "low quality", "amateur"],
+        "min_xp_to_pass": 300, "base_xp": 130, "bonus_xp": 40, "secret_xp": 90,
+        "max_words": 18, "difficulty_stars": 5,
+        "techniques": ["Negative prompting", "Quality enhancement", "Parameter optimization"],
+        "tags": ["negative_prompting"],
+        "example_prompt": "Ultra-detailed 4k studio quality portrait, technically perfect lighting, crisp sharp focus",
+        "tutorial": "Use negative prompts to remove unwanted elements. Add quality words: '4k', 'detailed', 'sharp'"
+    },
+    6: {
+        "title": "Creative Formulas", "icon": "🔮", "theme_color": "#8E44AD",
+        "description": "Advanced prompt patterns and creative techniques",
+        "learning_focus": "Creative pattern recognition and innovation",
+        "what_to_do": "Unlock creative genius! Learn advanced prompt formulas and patterns to create surreal, imaginative, and groundbreaking artistic concepts.",
+        "how_to_do": "Use creative formulas like '[Object] made of [Material]' or '[Emotion] as [Physical form]'. Experiment with surreal combinations and abstract concepts.",
+        "step_by_step": [
+            "Choose your creative formula pattern",
+            "Pick unusual material combinations",
+            "Add conceptual or abstract elements",
+            "Include innovative breakthrough terms",
+            "Push the boundaries of imagination!"
+        ],
+        "required_keywords": ["creative", "innovative", "unique"],
+        "bonus_keywords": ["surreal", "imaginative", "artistic", "conceptual", "abstract", "experimental"],
+        "secret_keywords": ["breakthrough", "revolutionary", "groundbreaking"],
+        "negative_prompts": ["ordinary", "boring", "typical"],
+        "min_xp_to_pass": 350, "base_xp": 150, "bonus_xp": 45, "secret_xp": 100,
+        "max_words": 20, "difficulty_stars": 6,
+        "techniques": ["Creative formulas", "Pattern innovation", "Conceptual thinking"],
+        "tags": ["creative"],
+        "example_prompt": "Surreal conceptual art: clock made of flowing water, innovative groundbreaking artistic vision",
+        "tutorial": "Use creative formulas: '[Object] made of [Material]', '[Emotion] as [Physical form]', '[Abstract] in [Real setting]'"
+    },
+    7: {
+        "title": "Professional Workflows", "icon": "💼", "theme_color": "#2C3E50",
+        "description": "Mood boards, iteration, and brand consistency",
+        "learning_focus": "Professional application and workflow management",
+        "what_to_do": "Think like a professional designer! Learn to create consistent brand imagery, mood boards, and systematic workflows for commercial projects.",
+        "how_to_do": "Plan your visual story. Create series of consistent images. Use systematic approach. Think about brand identity and commercial applications.",
+        "step_by_step": [
+            "Define your brand or project concept",
+            "Create consistent visual themes",
+            "Use systematic workflow approaches",
+            "Include professional industry terms",
+            "Build commercial-grade image series!"
+        ],
+        "required_keywords": ["professional", "consistent", "workflow"],
+        "bonus_keywords": ["mood board", "brand", "coherent", "systematic", "strategic", "planned"],
+        "secret_keywords": ["industry standard", "commercial grade", "enterprise"],
+        "negative_prompts": ["inconsistent", "random", "unplanned"],
+        "min_xp_to_pass": 400, "base_xp": 170, "bonus_xp": 50, "secret_xp": 110,
+        "max_words": 25, "difficulty_stars": 7,
+        "techniques": ["Mood board creation", "Brand consistency", "Workflow optimization"],
+        "example_prompt": "Professional brand-consistent mood board series, systematic workflow, industry standard commercial quality",
+        "tutorial": "Think like a pro: maintain consistency across images, plan your visual story, create series not singles"
+    },
+    8: {
+        "title": "Master Certification", "icon": "👑", "theme_color": "#C0392B",
+        "description": "Portfolio creation and advanced challenges",
+        "learning_focus": "Mastery demonstration and portfolio development",
+        "what_to_do": "Achieve mastery! Create your signature style, build an impressive portfolio, and demonstrate expert-level prompt engineering skills across all domains.",
+        "how_to_do": "Combine all techniques learned. Develop your unique artistic voice. Create portfolio-worthy pieces. Show virtuoso-level skills and innovation.",
+        "step_by_step": [
+            "Combine techniques from all previous levels",
+            "Develop your unique signature style",
+            "Create portfolio-quality masterpieces",
+            "Include legendary and iconic terms",
+            "Achieve prompt engineering mastery!"
+        ],
+        "required_keywords": ["master", "expert", "portfolio"],
+        "bonus_keywords": ["signature", "acclaimed", "renowned", "virtuoso", "exemplary", "extraordinary"],
+        "secret_keywords": ["legendary", "iconic", "timeless"],
+        "negative_prompts": ["novice", "basic", "beginner"],
+        "min_xp_to_pass": 500, "base_xp": 200, "bonus_xp": 60, "secret_xp": 150,
+        "max_words": 30, "difficulty_stars": 8,
+        "techniques": ["Portfolio curation", "Style signature", "Mastery demonstration"],
+        "example_prompt": "Legendary master portfolio piece: iconic timeless artwork showcasing virtuoso technique and extraordinary vision",
+        "tutorial": "Create your signature style. Combine all techniques you've learned. Show your unique artistic voice."
+    }
+}
+
+# ===== ACHIEVEMENTS SYSTEM =====
+ACHIEVEMENTS = {
+    "first_steps": {"name": "First Steps", "icon": "👶", "desc": "Created your first prompt", "xp": 25},
+    "word_collector": {"name": "Word Collector", "icon": "📚", "desc": "Used 25+ unique keywords", "xp": 100},
+    "secret_hunter": {"name": "Secret Hunter", "icon": "🔍", "desc": "Found 5 secret keywords", "xp": 150},
+    "combo_master": {"name": "Combo Master", "icon": "🔥", "desc": "Achieved 5x combo streak", "xp": 200},
+    "style_explorer": {"name": "Style Explorer", "icon": "🎨", "desc": "Tried 10 different art styles", "xp": 175},
+    "technical_expert": {"name": "Technical Expert", "icon": "⚙️", "desc": "Mastered negative prompting", "xp": 225},
+    "creative_genius": {"name": "Creative Genius", "icon": "🧠", "desc": "Created 10 innovative prompts", "xp": 300},
+    "speed_demon": {"name": "Speed Demon", "icon": "⚡", "desc": "Generated 10 images in 10 minutes", "xp": 150},
+    "perfectionist": {"name": "Perfectionist", "icon": "💎", "desc": "Got perfect scores on 3 levels", "xp": 250},
+    "daily_warrior": {"name": "Daily Warrior", "icon": "🗡️", "desc": "7-day login streak", "xp": 400},
+    "master_teacher": {"name": "Master Teacher", "icon": "🎓", "desc": "Completed all 8 levels", "xp": 1000}
+}
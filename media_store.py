@@ -0,0 +1,245 @@
+"""Content-addressed image files served over HTTP with ETag and Range support
+
+Generated images never live in session state: they are written once to disk
+under their SHA-256 digest and the browser fetches them from a small media
+endpoint. Because a digest names immutable content, responses carry a strong
+ETag and a one-year immutable cache lifetime. Thumbnails are rendered once
+per size and stored next to the originals.
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+MEDIA_DIR = os.environ.get(
+    "PROMPT_MASTER_MEDIA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "media"),
+)
+MEDIA_HOST = os.environ.get("PROMPT_MASTER_MEDIA_HOST", "127.0.0.1")
+MEDIA_PORT = int(os.environ.get("PROMPT_MASTER_MEDIA_PORT", "8502"))
+# Address each player's browser uses to reach the media endpoint, e.g. "/media"
+# behind a same-origin reverse proxy. The localhost default only works for a
+# browser on this machine, so it is refused when the endpoint binds beyond loopback.
+MEDIA_URL = os.environ.get("PROMPT_MASTER_MEDIA_URL")
+MEDIA_BASE_URL = (MEDIA_URL or f"http://localhost:{MEDIA_PORT}/media").rstrip("/")
+LOOPBACK_HOSTS = frozenset({"127.0.0.1", "localhost", "::1"})
+MEMORY_BUDGET_BYTES = int(os.environ.get("PROMPT_MASTER_MEDIA_MEMORY_BYTES", 64 * 1024 * 1024))
+THUMBNAIL_SIZES = (128, 256)
+
+CONTENT_TYPES = {".webp": "image/webp", ".png": "image/png", ".jpg": "image/jpeg"}
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class MediaStore:
+    """Immutable files named by the SHA-256 of their bytes, with a hot LRU in memory"""
+
+    def __init__(self, directory=MEDIA_DIR, max_memory_bytes=MEMORY_BUDGET_BYTES):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._thumbnail_locks = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, name, extension):
+        return os.path.join(self.directory, name[:2], name + extension)
+
+    def locate(self, digest):
+        """(path, content type) of a stored original, or None"""
+        for extension, content_type in CONTENT_TYPES.items():
+            path = self._path(digest, extension)
+            if os.path.exists(path):
+                return path, content_type
+        return None
+
+    def _write(self, path, data):
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+
+    def put(self, data, extension=".webp"):
+        """Store encoded image bytes and return their digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        self._write(self._path(digest, extension), data)
+        self._remember(self._path(digest, extension), data)
+        return digest
+
+    def _remember(self, path, data):
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(path, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[path] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def read(self, path):
+        """Bytes of a stored file, from memory when hot"""
+        with self._lock:
+            data = self._memory.get(path)
+            if data is not None:
+                self._memory.move_to_end(path)
+                return data
+        with open(path, "rb") as handle:
+            data = handle.read()
+        self._remember(path, data)
+        return data
+
+    def thumbnail(self, digest, size):
+        """(path, content type) of a ``size`` px thumbnail, rendered on first request"""
+        path = self._path(f"{digest}-{size}", ".webp")
+        if os.path.exists(path):
+            return path, "image/webp"
+        original = self.locate(digest)
+        if original is None:
+            return None
+        with self._lock:
+            lock = self._thumbnail_locks.setdefault(path, threading.Lock())
+        with lock:
+            if not os.path.exists(path):
+                image = Image.open(io.BytesIO(self.read(original[0])))
+                image.thumbnail((size, size))
+                buffer = io.BytesIO()
+                image.save(buffer, format="WEBP", quality=80)
+                self._write(path, buffer.getvalue())
+        with self._lock:
+            self._thumbnail_locks.pop(path, None)
+        return path, "image/webp"
+
+
+def check_media_url(host=MEDIA_HOST):
+    """Fail at startup if image URLs would point at each browser's own machine"""
+    if host not in LOOPBACK_HOSTS and not MEDIA_URL:
+        raise ValueError(
+            f"The media endpoint binds to {host}, so other machines will load images, but "
+            "PROMPT_MASTER_MEDIA_URL is not set and image URLs would point at localhost. "
+            "Set it to an address students' browsers can reach, e.g. \"/media\" behind a "
+            "reverse proxy or \"https://arena.example.org/media\"."
+        )
+
+
+def media_url(digest, thumbnail=None):
+    """Browser-facing URL of a stored image or one of its thumbnails"""
+    url = f"{MEDIA_BASE_URL}/{digest}"
+    return f"{url}?thumb={thumbnail}" if thumbnail else url
+
+
+# ===== HTTP ENDPOINT =====
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    """GET/HEAD /media/<digest>[?thumb=<size>] with conditional and ranged responses"""
+
+    store = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("media %s - %s", self.address_string(), format % args)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _resolve(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "media" or not DIGEST_PATTERN.match(parts[1]):
+            return None, None
+        digest = parts[1]
+        thumb = parse_qs(url.query).get("thumb", [None])[0]
+        if thumb is None:
+            return self.store.locate(digest), f'"{digest}"'
+        if not thumb.isdigit() or int(thumb) not in THUMBNAIL_SIZES:
+            return None, None
+        return self.store.thumbnail(digest, int(thumb)), f'"{digest}-{thumb}"'
+
+    def _serve(self, send_body):
+        found, etag = self._resolve()
+        if found is None:
+            self.send_error(404)
+            return
+        path, content_type = found
+
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self._send_cache_headers(etag)
+            self.end_headers()
+            return
+
+        data = self.store.read(path)
+        size = len(data)
+        start, end = 0, size - 1
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range", etag) == etag:
+            match = RANGE_PATTERN.match(range_header.strip())
+            if match and (match.group(1) or match.group(2)):
+                if match.group(1):
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                else:
+                    start = max(0, size - int(match.group(2)))
+                if start > end or start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self._send_cache_headers(etag)
+        self.end_headers()
+        if send_body:
+            view = memoryview(data)[start:end + 1]
+            for offset in range(0, len(view), CHUNK_SIZE):
+                self.wfile.write(view[offset:offset + CHUNK_SIZE])
+
+    def _send_cache_headers(self, etag):
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.send_header("Access-Control-Allow-Origin", "*")
+
+
+def start_media_server(store, host=MEDIA_HOST, port=MEDIA_PORT):
+    """Serve ``store`` on a daemon thread; returns None if the port is taken
+
+    With several app workers on one machine the first one to bind serves
+    the shared media directory for all of them.
+    """
+    check_media_url(host)
+    handler = type("BoundMediaRequestHandler", (MediaRequestHandler,), {"store": store})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as exc:
+        logger.info("Media endpoint not started on %s:%s (%s)", host, port, exc)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="media-server", daemon=True).start()
+    return server
@@ -0,0 +1,278 @@
+"""Near-duplicate prompt detection with MinHash signatures and LSH banding
+
+Each prompt becomes a set of word unigram and bigram shingles, summarised by
+a ``NUM_PERM``-value MinHash signature; the fraction of equal signature values
+estimates the Jaccard similarity of two prompts. Signatures are cut into
+``BANDS`` bands whose hashes go into one sorted array, so candidate lookup is
+a single vectorised ``searchsorted`` instead of a pass over the history. Only
+candidates that share a band with the query are compared, which keeps a query
+well under a millisecond at a million prompts. New prompts wait in a small
+dict until a batch of them is merged into the sorted array.
+
+Signatures for a batch of prompts are computed together with numpy: every
+shingle of the batch is hashed under all permutations in one array operation
+(multiply-shift hashing, no modulo) and reduced per prompt with
+``np.minimum.reduceat`` along contiguous rows.
+
+Usage:
+    python originality.py stats                      # index the analytics log and report its size
+    python originality.py query "a cat made of glass" [-k 5]
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+
+from analytics import ANALYTICS_DIR, load_events
+from pipeline_manager import module_available
+from prompt_scoring import tokenize
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: prompts sharing ~50% of shingles usually collide
+EMPTY_HASH = 0xFFFFFFFF  # fills the signature of a prompt without words
+SEED = 42
+# Pending band entries are merged into the sorted index once they reach this
+# many, or 1/MERGE_FRACTION of the index, whichever is larger
+MERGE_THRESHOLD = 4096
+MERGE_FRACTION = 64
+MAX_CANDIDATES = 512  # most recent matches per band examined for one query
+SIGNATURE_BATCH = 1024  # prompts hashed per array operation (bounds temporary memory)
+NEAREST = 3
+# Below this originality a prompt counts as a variation of an earlier one
+ORIGINALITY_THRESHOLD = 0.5
+
+_KEY_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+logger = logging.getLogger(__name__)
+
+
+def shingles(text):
+    """Stable 32-bit hashes of the prompt's word unigrams and bigrams"""
+    tokens = tokenize(text)
+    grams = set(tokens)
+    grams.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def _empty(signatures):
+    return (signatures == EMPTY_HASH).all(axis=1)
+
+
+@dataclass(frozen=True)
+class Originality:
+    score: float  # 1.0 = nothing similar seen before, 0.0 = exact repeat
+    nearest: tuple = ()  # (estimated similarity, prompt), most similar first
+
+    @property
+    def original(self):
+        return self.score >= ORIGINALITY_THRESHOLD
+
+
+class MinHasher:
+    """``num_perm`` universal hash permutations applied to shingle hashes"""
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, seed=SEED):
+        if num_perm % bands:
+            raise ValueError(f"{num_perm} permutations do not split into {bands} bands")
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Multiply-shift hashing: the high 32 bits of (a*h + b) mod 2**64, odd a
+        self._a = (rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        # Mixed into band hashes so equal rows in different bands never collide
+        self._band_salt = rng.integers(1, 1 << 63, bands, dtype=np.uint64)
+
+    def signatures(self, texts):
+        """(len(texts), num_perm) uint32 signatures; prompts without words get EMPTY_HASH rows"""
+        texts = list(texts)
+        out = np.full((len(texts), self.num_perm), EMPTY_HASH, dtype=np.uint32)
+        for start in range(0, len(texts), SIGNATURE_BATCH):
+            sets = [shingles(text) for text in texts[start:start + SIGNATURE_BATCH]]
+            rows = [row for row, values in enumerate(sets) if len(values)]
+            if not rows:
+                continue
+            values = np.concatenate([sets[row] for row in rows])
+            offsets = np.cumsum([0] + [len(sets[row]) for row in rows[:-1]])
+            # One row per permutation keeps the reduction on contiguous memory
+            hashed = np.multiply(self._a[:, None], values)  # wraps modulo 2**64
+            hashed += self._b[:, None]
+            hashed >>= np.uint64(32)
+            out[start + np.asarray(rows)] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        return out
+
+    def band_keys(self, signatures):
+        """(n, bands) uint64 hash of each band of each signature"""
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        keys = np.broadcast_to(self._band_salt, (len(signatures), self.bands)).copy()
+        for row in range(self.rows):
+            keys = keys * _KEY_MULTIPLIER + bands[:, :, row]  # wraps modulo 2**64
+        return keys
+
+
+class OriginalityIndex:
+    """Incrementally updated LSH index over every prompt seen, answering nearest-prompt queries"""
+
+    def __init__(self, hasher=None, merge_threshold=MERGE_THRESHOLD):
+        self.hasher = hasher or MinHasher()
+        self.merge_threshold = merge_threshold
+        self._lock = threading.Lock()
+        self._signatures = np.empty((1024, self.hasher.num_perm), dtype=np.uint32)
+        self._prompts = []
+        self._keys = np.empty(0, dtype=np.uint64)  # sorted band keys ...
+        self._ids = np.empty(0, dtype=np.int64)  # ... and the prompt id of each
+        self._pending = {}  # band key -> prompt ids not yet merged
+        self._pending_entries = 0
+
+    def __len__(self):
+        return len(self._prompts)
+
+    def query(self, text, k=NEAREST):
+        """Originality of ``text`` against everything indexed so far"""
+        return self.query_many([text], k)[0]
+
+    def query_many(self, texts, k=NEAREST):
+        """Batch query; signatures and band keys for all texts are computed together"""
+        signatures = self.hasher.signatures(texts)
+        keys = self.hasher.band_keys(signatures)
+        with self._lock:
+            return [self._match(signature, row, k)[0] for signature, row in zip(signatures, keys)]
+
+    def add(self, text, k=NEAREST):
+        """Score ``text`` against earlier prompts, then index it"""
+        signature = self.hasher.signatures([text])
+        keys = self.hasher.band_keys(signature)
+        with self._lock:
+            originality, repeat = self._match(signature[0], keys[0], k)
+            # Exact repeats (and empty prompts) add nothing but bucket growth
+            if not repeat and not _empty(signature)[0]:
+                self._insert([text], signature, keys)
+        return originality
+
+    def extend(self, texts):
+        """Bulk-index prompts without scoring them (warm start); repeats are indexed once"""
+        texts = list(texts)
+        signatures = self.hasher.signatures(texts)
+        rows = np.ascontiguousarray(signatures).view(np.dtype((np.void, signatures.itemsize * signatures.shape[1])))
+        _, first = np.unique(rows.ravel(), return_index=True)
+        first.sort()
+        first = first[~_empty(signatures[first])]
+        signatures = signatures[first]
+        keys = self.hasher.band_keys(signatures)
+        with self._lock:
+            self._insert([texts[row] for row in first.tolist()], signatures, keys)
+
+    def warm_from_analytics(self, directory=ANALYTICS_DIR, background=True):
+        """Index previously scored prompts from the compacted analytics log (needs pyarrow)"""
+        if not module_available("pyarrow"):
+            return None
+        if background:
+            thread = threading.Thread(target=self.warm_from_analytics, args=(directory, False),
+                                      name="originality-warmup", daemon=True)
+            thread.start()
+            return thread
+        started = time.perf_counter()
+        table = load_events(directory, ["event", "prompt"])
+        prompts = [
+            prompt for event, prompt in zip(table.column("event").to_pylist(), table.column("prompt").to_pylist())
+            if event == "prompt_scored" and prompt
+        ]
+        self.extend(prompts)
+        logger.info("Indexed %d prompts for originality in %.1fs", len(prompts), time.perf_counter() - started)
+        return None
+
+    # ===== INTERNALS (caller holds the lock) =====
+    def _candidates(self, keys):
+        found = []
+        if len(self._keys):
+            lows = np.searchsorted(self._keys, keys, side="left")
+            highs = np.searchsorted(self._keys, keys, side="right")
+            for low, high in zip(lows.tolist(), highs.tolist()):
+                if high > low:
+                    found.append(self._ids[max(low, high - MAX_CANDIDATES):high])
+        for key in keys.tolist():
+            ids = self._pending.get(key)
+            if ids:
+                found.append(np.asarray(ids[-MAX_CANDIDATES:], dtype=np.int64))
+        return np.unique(np.concatenate(found)) if found else None
+
+    def _match(self, signature, keys, k):
+        """(Originality, whether the prompt is an exact repeat)"""
+        candidates = self._candidates(keys)
+        if candidates is None:
+            return Originality(1.0), False
+        similarity = (self._signatures[candidates] == signature).mean(axis=1)
+        order = np.argsort(-similarity, kind="stable")[:k]
+        nearest = tuple((float(similarity[i]), self._prompts[candidates[i]]) for i in order)
+        best = nearest[0][0]
+        return Originality(round(1.0 - best, 3), nearest), best == 1.0
+
+    def _insert(self, texts, signatures, keys):
+        start = len(self._prompts)
+        needed = start + len(texts)
+        if needed > len(self._signatures):
+            grown = np.empty((max(needed, 2 * len(self._signatures)), self.hasher.num_perm), dtype=np.uint32)
+            grown[:start] = self._signatures[:start]
+            self._signatures = grown
+        self._signatures[start:needed] = signatures
+        self._prompts.extend(texts)
+        if len(texts) >= self.merge_threshold:
+            self._merge(keys.ravel(), np.repeat(np.arange(start, needed, dtype=np.int64), self.hasher.bands))
+            return
+        for prompt_id, row in enumerate(keys.tolist(), start):
+            for key in row:
+                self._pending.setdefault(key, []).append(prompt_id)
+        self._pending_entries += keys.size
+        if self._pending_entries >= max(self.merge_threshold, len(self._keys) // MERGE_FRACTION):
+            pending_keys = np.fromiter(
+                (key for key, ids in self._pending.items() for _ in ids), dtype=np.uint64, count=self._pending_entries)
+            pending_ids = np.fromiter(
+                (prompt_id for ids in self._pending.values() for prompt_id in ids),
+                dtype=np.int64, count=self._pending_entries)
+            self._pending.clear()
+            self._pending_entries = 0
+            self._merge(pending_keys, pending_ids)
+
+    def _merge(self, keys, ids):
+        """Fold new (key, id) pairs into the sorted arrays; ids stay ascending within a key"""
+        order = np.lexsort((ids, keys))
+        keys, ids = keys[order], ids[order]
+        positions = np.searchsorted(self._keys, keys, side="right")
+        self._keys = np.insert(self._keys, positions, keys)
+        self._ids = np.insert(self._ids, positions, ids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("stats", "query"))
+    parser.add_argument("prompt", nargs="?")
+    parser.add_argument("-k", type=int, default=5, help="nearest prompts to show")
+    parser.add_argument("--dir", default=ANALYTICS_DIR)
+    args = parser.parse_args(argv)
+    if not module_available("pyarrow"):
+        print("pyarrow is required to read the analytics log: pip install pyarrow", file=sys.stderr)
+        return 1
+
+    index = OriginalityIndex()
+    started = time.perf_counter()
+    index.warm_from_analytics(args.dir, background=False)
+    print(f"Indexed {len(index):,} prompts in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    if args.command == "query":
+        if not args.prompt:
+            parser.error("query needs a prompt")
+        started = time.perf_counter()
+        result = index.query(args.prompt, args.k)
+        print(f"Originality {result.score:.0%} ({(time.perf_counter() - started) * 1000:.2f} ms)")
+        for similarity, prompt in result.nearest:
+            print(f"  {similarity:>5.0%}  {prompt}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
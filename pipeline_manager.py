@@ -0,0 +1,186 @@
+"""Process-wide Stable Diffusion pipeline manager shared by every Streamlit session
+
+torch and diffusers are imported lazily inside the manager, so importing this
+module (and starting the app) never pays their multi-second import cost.
+"""
+import functools
+import gc
+import importlib.util
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from instrumentation import timed
+
+MODEL_ID = os.environ.get("PROMPT_MASTER_MODEL_ID", "runwayml/stable-diffusion-v1-5")
+MODEL_IDLE_TIMEOUT = float(os.environ.get("PROMPT_MASTER_MODEL_IDLE_TIMEOUT", "900"))
+
+# Linear projection of the four SD 1.x latent channels to RGB; a cheap stand-in
+# for a VAE decode that is good enough for a live thumbnail
+LATENT_RGB_FACTORS = (
+    (0.298, 0.207, 0.208),
+    (0.187, 0.286, 0.173),
+    (-0.158, 0.189, 0.264),
+    (-0.184, -0.271, -0.473),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def module_available(name):
+    """Whether a module is installed, checked without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def diffusion_available():
+    """Capability probe for real generation: torch and diffusers both installed"""
+    return module_available("torch") and module_available("diffusers")
+
+
+def latent_previews(latents):
+    """One low-resolution (1/8 scale) RGB image per latent in the batch"""
+    import torch
+    from PIL import Image
+
+    factors = torch.tensor(LATENT_RGB_FACTORS, dtype=latents.dtype, device=latents.device)
+    rgb = torch.einsum("bchw,cr->bhwr", latents, factors)
+    frames = ((rgb + 1) * 127.5).clamp(0, 255).to(torch.uint8).cpu().numpy()
+    return [Image.fromarray(frame) for frame in frames]
+
+
+class PipelineManager:
+    """Load the diffusion pipeline once per process and drop it after an idle period
+
+    Loading happens lazily on the first ``acquire()``; every session afterwards
+    shares the same weights. A daemon reaper thread releases the model once it
+    has been idle for ``idle_timeout`` seconds (``0`` keeps it loaded forever).
+    """
+
+    def __init__(self, model_id=MODEL_ID, idle_timeout=MODEL_IDLE_TIMEOUT):
+        self.model_id = model_id
+        self.idle_timeout = idle_timeout
+        self._pipe = None
+        self._state_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # Diffusers schedulers keep per-call state, so inference is serialized
+        self._inference_lock = threading.Lock()
+        self._in_use = 0
+        self._last_used = time.monotonic()
+        self._reaper = None
+        self.load_count = 0
+
+    @property
+    def is_loaded(self):
+        return self._pipe is not None
+
+    @timed("pipeline_load")
+    def _load_pipeline(self):
+        import torch
+        from diffusers import StableDiffusionPipeline
+
+        dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+        pipe = StableDiffusionPipeline.from_pretrained(self.model_id, torch_dtype=dtype)
+        pipe = pipe.to("cuda" if torch.cuda.is_available() else "cpu")
+        pipe.enable_attention_slicing()
+        pipe.set_progress_bar_config(disable=True)
+        return pipe
+
+    def _ensure_loaded(self):
+        if self._pipe is not None:
+            return self._pipe
+        # Only one thread pays the load cost; the rest wait and reuse it
+        with self._load_lock:
+            if self._pipe is None:
+                self._pipe = self._load_pipeline()
+                self.load_count += 1
+                self._last_used = time.monotonic()
+                self._start_reaper()
+        return self._pipe
+
+    def warm_up(self, background=True):
+        """Load the model ahead of the first request"""
+        if not background:
+            self._ensure_loaded()
+            return None
+        thread = threading.Thread(target=self._ensure_loaded, name="pipeline-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    @contextmanager
+    def acquire(self):
+        """Yield the shared pipeline for exclusive use by one inference call"""
+        with self._state_lock:
+            self._in_use += 1
+        try:
+            pipe = self._ensure_loaded()
+            with self._inference_lock:
+                yield pipe
+        finally:
+            with self._state_lock:
+                self._in_use -= 1
+                self._last_used = time.monotonic()
+
+    @timed("pipeline_generate")
+    def generate(self, requests, on_step=None):
+        """Run a batch of same-shaped generation requests in one pipeline call
+
+        ``on_step(step, previews)`` is called after every denoising step; an
+        exception raised from it aborts the call before the VAE decode.
+        """
+        import torch
+
+        first = requests[0]
+        generators = [torch.Generator().manual_seed(request.seed) for request in requests]
+        callbacks = {}
+        if on_step is not None:
+            def step_end(pipe, step, timestep, callback_kwargs):
+                latents = callback_kwargs["latents"]
+                on_step(step + 1, lambda: latent_previews(latents))
+                return callback_kwargs
+            callbacks["callback_on_step_end"] = step_end
+        with self.acquire() as pipe:
+            result = pipe(
+                prompt=[request.prompt for request in requests],
+                negative_prompt=[request.negative_prompt for request in requests],
+                num_inference_steps=first.steps,
+                width=first.width,
+                height=first.height,
+                guidance_scale=first.guidance_scale,
+                generator=generators,
+                **callbacks,
+            )
+        return result.images
+
+    def unload(self):
+        """Release the model weights if nobody is using them"""
+        with self._load_lock, self._state_lock:
+            if self._pipe is None or self._in_use:
+                return False
+            self._pipe = None
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        return True
+
+    def _start_reaper(self):
+        if self.idle_timeout <= 0 or (self._reaper and self._reaper.is_alive()):
+            return
+        self._reaper = threading.Thread(target=self._reap_when_idle, name="pipeline-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_when_idle(self):
+        interval = max(1.0, min(self.idle_timeout / 4, 30.0))
+        while True:
+            time.sleep(interval)
+            with self._state_lock:
+                idle_for = time.monotonic() - self._last_used
+                busy = self._in_use > 0
+            if self._pipe is not None and not busy and idle_for >= self.idle_timeout:
+                self.unload()
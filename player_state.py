@@ -0,0 +1,273 @@
+"""Typed, compact per-player state with a binary wire format
+
+One ``PlayerState`` replaces the ~40 loose session_state keys. It uses
+``__slots__`` (no per-instance dict), keeps histories in bounded ring buffers
+and holds generated images only by their content key.
+"""
+import json
+import struct
+import time
+from collections import defaultdict, deque
+from datetime import date
+
+from progress_store import decode_progress
+
+QUALITY_HISTORY = 100
+LEARNING_PATH_HISTORY = 50
+IMAGE_REF_HISTORY = 50
+PORTFOLIO_LIMIT = 100
+
+FORMAT_MAGIC = b"PS"
+FORMAT_VERSION = 3  # v2 appends energy_updated_at, v3 perfect_levels
+
+INT_FIELDS = (
+    "current_level", "total_xp", "daily_streak", "coins", "gems", "energy", "max_energy",
+    "combo_streak", "max_combo", "images_generated_today", "perfect_scores",
+    "weekly_quest_progress", "creative_challenges_completed", "total_playtime",
+)
+STR_SET_FIELDS = (
+    "achievements", "keywords_discovered", "secret_keywords_found", "techniques_learned",
+    "styles_tried", "tutorial_completed",
+)
+COUNTER_FIELDS = ("favorite_styles", "technique_mastery")
+
+
+class PlayerState:
+    """Everything the game tracks about one player"""
+
+    __slots__ = INT_FIELDS + STR_SET_FIELDS + COUNTER_FIELDS + (
+        "completed_levels", "perfect_levels", "last_play_date", "session_start", "rank", "daily_challenges",
+        "prompt_quality_scores", "learning_path", "generated_images", "current_generation_key",
+        "user_portfolio", "energy_updated_at",
+    )
+
+    def __init__(self):
+        self.current_level = 1
+        self.total_xp = 0
+        self.daily_streak = 1
+        self.coins = 200
+        self.gems = 5
+        self.energy = 100
+        self.max_energy = 100
+        self.combo_streak = 0
+        self.max_combo = 0
+        self.images_generated_today = 0
+        self.perfect_scores = 0
+        self.weekly_quest_progress = 0
+        self.creative_challenges_completed = 0
+        self.total_playtime = 0
+        for name in STR_SET_FIELDS:
+            setattr(self, name, set())
+        for name in COUNTER_FIELDS:
+            setattr(self, name, defaultdict(int))
+        self.completed_levels = set()
+        self.perfect_levels = set()
+        self.last_play_date = date.today()
+        self.session_start = time.time()
+        self.rank = "Novice"
+        self.daily_challenges = {}
+        self.prompt_quality_scores = deque(maxlen=QUALITY_HISTORY)
+        self.learning_path = deque(maxlen=LEARNING_PATH_HISTORY)
+        self.generated_images = deque(maxlen=IMAGE_REF_HISTORY)  # media store digests
+        self.current_generation_key = None
+        self.user_portfolio = []  # media store digests
+        self.energy_updated_at = time.time()
+
+    def add_image(self, key):
+        """Remember a generated image by reference"""
+        self.generated_images.append(key)
+        self.current_generation_key = key
+
+    def add_to_portfolio(self, key):
+        if key not in self.user_portfolio:
+            self.user_portfolio.append(key)
+            del self.user_portfolio[:-PORTFOLIO_LIMIT]
+
+    def as_dict(self):
+        """Plain mapping view, used to seed trackers and by tooling"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from a mapping such as legacy JSON progress; unknown keys are ignored"""
+        state = cls()
+        for name in INT_FIELDS:
+            if name in data:
+                setattr(state, name, int(data[name]))
+        for name in STR_SET_FIELDS:
+            if name in data:
+                setattr(state, name, set(data[name]))
+        for name in COUNTER_FIELDS:
+            if name in data:
+                setattr(state, name, defaultdict(int, data[name]))
+        if "completed_levels" in data:
+            state.completed_levels = {int(level) for level in data["completed_levels"]}
+        if "perfect_levels" in data:
+            state.perfect_levels = {int(level) for level in data["perfect_levels"]}
+        if isinstance(data.get("last_play_date"), date):
+            state.last_play_date = data["last_play_date"]
+        state.rank = data.get("rank", state.rank)
+        state.daily_challenges = dict(data.get("daily_challenges", {}))
+        state.prompt_quality_scores.extend(data.get("prompt_quality_scores", ()))
+        state.learning_path.extend(data.get("learning_path", ()))
+        for key in data.get("generated_images", ()):
+            state.add_image(key)
+        for key in data.get("user_portfolio", ()):
+            state.add_to_portfolio(key)
+        return state
+
+    # ===== BINARY SERIALIZATION =====
+    def to_bytes(self):
+        """Compact binary encoding: varints, length-prefixed strings, raw image digests"""
+        out = _Writer()
+        out.raw(FORMAT_MAGIC + bytes([FORMAT_VERSION]))
+        for name in INT_FIELDS:
+            out.svarint(getattr(self, name))
+        for name in STR_SET_FIELDS:
+            out.strings(sorted(getattr(self, name)))
+        for name in COUNTER_FIELDS:
+            counter = getattr(self, name)
+            out.uvarint(len(counter))
+            for key in sorted(counter):
+                out.string(key)
+                out.svarint(counter[key])
+        out.uvarint(len(self.completed_levels))
+        for level in sorted(self.completed_levels):
+            out.uvarint(level)
+        out.uvarint(self.last_play_date.toordinal())
+        out.raw(struct.pack("<d", self.session_start))
+        out.string(self.rank)
+        out.string(json.dumps(self.daily_challenges, separators=(",", ":")) if self.daily_challenges else "")
+        out.uvarint(len(self.prompt_quality_scores))
+        for value in self.prompt_quality_scores:
+            out.svarint(int(value))
+        out.strings(self.learning_path)
+        out.digests(self.generated_images)
+        out.digests([self.current_generation_key] if self.current_generation_key else [])
+        out.digests(self.user_portfolio)
+        out.raw(struct.pack("<d", self.energy_updated_at))
+        out.uvarint(len(self.perfect_levels))
+        for level in sorted(self.perfect_levels):
+            out.uvarint(level)
+        return out.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        reader = _Reader(data)
+        if reader.raw(2) != FORMAT_MAGIC:
+            raise ValueError("Not a serialized PlayerState")
+        version = reader.raw(1)[0]
+        if not 1 <= version <= FORMAT_VERSION:
+            raise ValueError(f"Unsupported PlayerState format version {version}")
+        state = cls()
+        for name in INT_FIELDS:
+            setattr(state, name, reader.svarint())
+        for name in STR_SET_FIELDS:
+            setattr(state, name, set(reader.strings()))
+        for name in COUNTER_FIELDS:
+            counter = defaultdict(int)
+            for _ in range(reader.uvarint()):
+                key = reader.string()
+                counter[key] = reader.svarint()
+            setattr(state, name, counter)
+        state.completed_levels = {reader.uvarint() for _ in range(reader.uvarint())}
+        state.last_play_date = date.fromordinal(reader.uvarint())
+        state.session_start = struct.unpack("<d", reader.raw(8))[0]
+        state.rank = reader.string()
+        challenges = reader.string()
+        state.daily_challenges = json.loads(challenges) if challenges else {}
+        state.prompt_quality_scores.extend(reader.svarint() for _ in range(reader.uvarint()))
+        state.learning_path.extend(reader.strings())
+        state.generated_images.extend(reader.digests())
+        current = reader.digests()
+        state.current_generation_key = current[0] if current else None
+        state.user_portfolio = reader.digests()
+        if version >= 2:
+            state.energy_updated_at = struct.unpack("<d", reader.raw(8))[0]
+        if version >= 3:
+            state.perfect_levels = {reader.uvarint() for _ in range(reader.uvarint())}
+        return state
+
+
+def decode_player_state(document):
+    """PlayerState from a stored document (binary, or legacy JSON progress)"""
+    if document is None:
+        return PlayerState()
+    if isinstance(document, str):
+        return PlayerState.from_dict(decode_progress(document))
+    return PlayerState.from_bytes(document)
+
+
+class _Writer:
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def getvalue(self):
+        return bytes(self._buffer)
+
+    def raw(self, data):
+        self._buffer += data
+
+    def uvarint(self, value):
+        while value >= 0x80:
+            self._buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self._buffer.append(value)
+
+    def svarint(self, value):
+        self.uvarint(value * 2 if value >= 0 else -value * 2 - 1)
+
+    def string(self, value):
+        encoded = value.encode("utf-8")
+        self.uvarint(len(encoded))
+        self._buffer += encoded
+
+    def strings(self, values):
+        values = list(values)
+        self.uvarint(len(values))
+        for value in values:
+            self.string(value)
+
+    def digests(self, keys):
+        """Hex content keys are stored as raw bytes (32 instead of 64 for SHA-256)"""
+        keys = list(keys)
+        self.uvarint(len(keys))
+        for key in keys:
+            raw = bytes.fromhex(key)
+            self.uvarint(len(raw))
+            self._buffer += raw
+
+
+class _Reader:
+    def __init__(self, data):
+        self._data = memoryview(data)
+        self._pos = 0
+
+    def raw(self, size):
+        chunk = bytes(self._data[self._pos:self._pos + size])
+        if len(chunk) != size:
+            raise ValueError("Truncated PlayerState data")
+        self._pos += size
+        return chunk
+
+    def uvarint(self):
+        result = shift = 0
+        while True:
+            byte = self.raw(1)[0]
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def svarint(self):
+        value = self.uvarint()
+        return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+    def string(self):
+        return self.raw(self.uvarint()).decode("utf-8")
+
+    def strings(self):
+        return [self.string() for _ in range(self.uvarint())]
+
+    def digests(self):
+        return [self.raw(self.uvarint()).hex() for _ in range(self.uvarint())]
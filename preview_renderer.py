@@ -0,0 +1,103 @@
+"""Deterministic procedural preview images for PREVIEW MODE (no torch required)"""
+import hashlib
+import random
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# Keywords that tint the preview; anything else falls back to the level colour
+KEYWORD_COLORS = {
+    "golden": "#FFC857", "sunset": "#FF7F50", "fire": "#FF4500", "warm": "#FFA07A",
+    "forest": "#2E8B57", "garden": "#3CB371", "nature": "#6B8E23", "green": "#39FF14",
+    "ocean": "#1E90FF", "beach": "#40E0D0", "water": "#00BFFF", "sky": "#87CEEB",
+    "night": "#191970", "dark": "#1B1B2F", "mysterious": "#4B0082", "ancient": "#8B7355",
+    "neon": "#FF00FF", "cyberpunk": "#FF0080", "futuristic": "#00FFFF", "city": "#708090",
+    "magical": "#DA70D6", "sparkle": "#FFFACD", "glow": "#FFFF99", "dramatic": "#8B0000",
+    "soft": "#FFE4E1", "bright": "#FFFF00", "colorful": "#FF69B4", "happy": "#FFD700",
+}
+SPARKLE_WORDS = {"sparkle", "sparkles", "glow", "magical", "glowing", "shiny", "stars"}
+LAYER_SCALE = 4  # soft layers are composed at 1/4 resolution and upscaled
+
+# Built once: a vertical ramp, a radial falloff reaching zero at the edge and
+# the bitmap caption font (FreeType text costs more than the whole frame)
+VERTICAL_RAMP = Image.linear_gradient("L")
+RADIAL_GLOW = Image.radial_gradient("L").point(lambda v: max(0, 255 - 2 * v)).resize((64, 64))
+CAPTION_FONT = getattr(ImageFont, "load_default_imagefont", ImageFont.load_default)()
+
+
+def _seed_for(prompt, theme_color):
+    digest = hashlib.sha256(f"{' '.join(prompt.lower().split())}|{theme_color}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _hex_to_rgb(color):
+    color = color.lstrip("#")
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _palette(words, theme_color, rng):
+    colors = [_hex_to_rgb(KEYWORD_COLORS[w]) for w in words if w in KEYWORD_COLORS]
+    theme = _hex_to_rgb(theme_color)
+    if not colors:
+        colors = [tuple(min(255, max(0, c + rng.randint(-60, 60))) for c in theme)]
+    return theme, colors
+
+
+def render_preview(prompt, theme_color, size=512):
+    """Render a seeded abstract image from the prompt's keywords and the level colour
+
+    The same prompt and colour always produce the same pixels. Gradients and
+    blurs use Pillow's C-level operations on a downscaled canvas, keeping a
+    512x512 frame in the low milliseconds.
+    """
+    rng = random.Random(_seed_for(prompt, theme_color))
+    words = [w.strip(".,:;!?'\"()").lower() for w in prompt.split()]
+    theme, colors = _palette(words, theme_color, rng)
+    small = max(32, size // LAYER_SCALE)
+
+    # Background: vertical gradient from near-black into the level colour
+    mask = VERTICAL_RAMP.resize((small, small))
+    background = Image.composite(
+        Image.new("RGB", (small, small), theme),
+        Image.new("RGB", (small, small), (8, 8, 16)),
+        mask,
+    )
+
+    # One soft radial glow per keyword colour
+    for color in colors[:6]:
+        radius = rng.randint(small // 4, small // 2)
+        glow = RADIAL_GLOW.resize((radius * 2, radius * 2))
+        x = rng.randint(-radius // 2, small - radius - radius // 2)
+        y = rng.randint(-radius // 2, small - radius - radius // 2)
+        layer_mask = Image.new("L", (small, small), 0)
+        layer_mask.paste(glow, (x, y))
+        background = Image.composite(Image.new("RGB", (small, small), color), background, layer_mask)
+
+    # Shapes, one per meaningful word, blurred at low resolution
+    shapes = Image.new("L", (small, small), 0)
+    draw = ImageDraw.Draw(shapes)
+    for _ in range(min(len(words), 12)):
+        cx, cy = rng.randint(0, small), rng.randint(0, small)
+        r = rng.randint(small // 16, small // 5)
+        if rng.random() < 0.5:
+            draw.ellipse((cx - r, cy - r, cx + r, cy + r), fill=rng.randint(60, 160))
+        else:
+            draw.regular_polygon((cx, cy, r), rng.randint(3, 6), rotation=rng.randint(0, 360), fill=rng.randint(60, 160))
+    shapes = shapes.filter(ImageFilter.GaussianBlur(small / 64))
+    accent = colors[rng.randrange(len(colors))]
+    background = Image.composite(Image.new("RGB", (small, small), accent), background, shapes)
+
+    image = background.resize((size, size), Image.BILINEAR)
+
+    # Crisp details are drawn at full resolution
+    draw = ImageDraw.Draw(image)
+    if SPARKLE_WORDS.intersection(words):
+        for _ in range(40):
+            x, y = rng.randint(0, size), rng.randint(0, size)
+            r = rng.randint(1, max(2, size // 128))
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=(255, 255, 240))
+
+    # The bitmap font only covers Latin-1; emoji and CJK become "?"
+    caption = " ".join(prompt.split())[:60].encode("latin-1", "replace").decode("latin-1")
+    draw.rectangle((0, size - 28, size, size), fill=(0, 0, 0))
+    draw.text((10, size - 22), f"PREVIEW - {caption}", fill=(255, 255, 255), font=CAPTION_FONT)
+    return image
@@ -0,0 +1,228 @@
+"""Durable player progress with write-behind batching
+
+Progress is loaded once per session, changes are staged in memory and a
+background thread flushes everything staged since the last flush in a single
+transaction. Backends implement ``ProgressStore`` and store opaque encoded
+documents (``PlayerState.to_bytes()``; older rows hold JSON text); SQLite is
+the default.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+
+DATA_DIR = os.environ.get(
+    "PROMPT_MASTER_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data"),
+)
+PROGRESS_STORE_URL = os.environ.get(
+    "PROMPT_MASTER_PROGRESS_STORE", "sqlite:///" + os.path.join(DATA_DIR, "progress.sqlite3")
+)
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("PROMPT_MASTER_PROGRESS_FLUSH_SECONDS", "10"))
+
+logger = logging.getLogger(__name__)
+
+
+# ===== SERIALIZATION =====
+def _encode_value(value):
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": sorted((_encode_value(v) for v in value), key=repr)}
+    if isinstance(value, defaultdict):
+        return {"__counter__": {str(k): v for k, v in value.items()}}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, dict):
+        return {str(k): _encode_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(v) for v in value]
+    return value
+
+
+def _decode_object(obj):
+    if "__set__" in obj:
+        return set(obj["__set__"])
+    if "__counter__" in obj:
+        return defaultdict(int, obj["__counter__"])
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def encode_progress(progress):
+    """Serialize a dict of session values (sets, dates, counters) to JSON text"""
+    return json.dumps(_encode_value(progress), separators=(",", ":"), sort_keys=True)
+
+
+def decode_progress(data):
+    return json.loads(data, object_hook=_decode_object)
+
+
+# ===== STORAGE BACKENDS =====
+class ProgressStore:
+    """Interface for progress backends"""
+
+    def load(self, player_id):
+        """Return the stored progress document for a player, or None"""
+        raise NotImplementedError
+
+    def save_many(self, records):
+        """Persist ``{player_id: document}`` atomically"""
+        raise NotImplementedError
+
+    def scan(self, batch_size=500):
+        """Yield every stored ``(player_id, document)`` in batches, for offline maintenance"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteProgressStore(ProgressStore):
+    """Progress as one document per player in a WAL-mode SQLite file"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS player_progress ("
+            "player_id TEXT PRIMARY KEY, state BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def load(self, player_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM player_progress WHERE player_id = ?", (player_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_many(self, records):
+        if not records:
+            return
+        now = time.time()
+        rows = [(player_id, document, now) for player_id, document in records.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO player_progress (player_id, state, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(player_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                    rows,
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def scan(self, batch_size=500):
+        # Keyset pagination: the lock is only held for one batch at a time
+        after = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT player_id, state FROM player_progress WHERE player_id > ? ORDER BY player_id LIMIT ?",
+                    (after, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            after = rows[-1][0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+STORE_BACKENDS = {"sqlite": SQLiteProgressStore}
+
+
+def open_progress_store(url=PROGRESS_STORE_URL):
+    """Open a backend from a ``scheme:///location`` URL, e.g. ``sqlite:///progress.db``"""
+    scheme, _, location = url.partition(":///")
+    if scheme not in STORE_BACKENDS:
+        raise ValueError(f"Unknown progress store backend: {scheme!r}")
+    return STORE_BACKENDS[scheme](location)
+
+
+# ===== WRITE-BEHIND BUFFER =====
+class WriteBehindBuffer:
+    """Stage records in memory and flush them to ``store.save_many`` in batched transactions
+
+    Callers stage immutable snapshots (encoded documents, copies), so later
+    mutations of live objects cannot race the flusher. Staging the same key
+    twice before a flush keeps only the newest snapshot.
+    """
+
+    def __init__(self, store, flush_interval=FLUSH_INTERVAL_SECONDS, name="write-behind-flusher"):
+        self.store = store
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def stage(self, key, snapshot):
+        """Queue a snapshot for the next flush"""
+        with self._lock:
+            self._pending[key] = snapshot
+
+    def flush(self):
+        """Write everything staged so far in one batch"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return 0
+            try:
+                self.store.save_many(batch)
+            except Exception:
+                # Put the batch back unless newer snapshots were staged meanwhile
+                with self._lock:
+                    for key, snapshot in batch.items():
+                        self._pending.setdefault(key, snapshot)
+                raise
+            finally:
+                with self._lock:
+                    self._inflight = {}
+            return len(batch)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("%s flush failed; retrying on the next tick", self._thread.name)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+
+class WriteBehindProgress(WriteBehindBuffer):
+    """Write-behind buffer for progress documents that also serves reads of unflushed changes"""
+
+    def __init__(self, store, flush_interval=FLUSH_INTERVAL_SECONDS):
+        super().__init__(store, flush_interval, name="progress-flusher")
+
+    def load(self, player_id):
+        """Latest progress document for a player, including changes not yet flushed"""
+        with self._lock:
+            document = self._pending.get(player_id, self._inflight.get(player_id))
+        return document if document is not None else self.store.load(player_id)
@@ -0,0 +1,177 @@
+"""Data-driven rank progression: one table of XP thresholds and achievement gates
+
+The table is compiled once into sorted arrays, so every rank query is a
+bisect that returns the rank together with the XP floor, ceiling and
+progress of the player's current bracket. Deployments can replace the
+default table with a JSON file (``PROMPT_MASTER_PROGRESSION``) that either
+lists thresholds per rank or derives them from an XP curve.
+
+Usage:
+    python progression.py show                  # print the compiled table
+    python progression.py recompute [--dry-run] # re-rank every stored player
+"""
+import argparse
+import bisect
+import json
+import math
+import os
+import sys
+from collections import Counter
+from dataclasses import dataclass
+
+from player_state import decode_player_state
+from progress_store import open_progress_store
+
+PROGRESSION_FILE = os.environ.get("PROMPT_MASTER_PROGRESSION")
+RECOMPUTE_BATCH_SIZE = 500
+
+# Rank order is ascending; "xp" is the threshold, "achievements" the gate
+DEFAULT_RANKS = (
+    {"name": "NOVICE", "icon": "🧙‍♂️", "xp": 0, "achievements": 0},
+    {"name": "INTERMEDIATE", "icon": "🎨", "xp": 200, "achievements": 0},
+    {"name": "ADVANCED", "icon": "🎯", "xp": 500, "achievements": 2},
+    {"name": "EXPERT", "icon": "🌟", "xp": 1000, "achievements": 4},
+    {"name": "MASTER", "icon": "👑", "xp": 1500, "achievements": 6},
+    {"name": "GRANDMASTER", "icon": "🏆", "xp": 2000, "achievements": 8},
+)
+
+# Threshold of the n-th rank above the first (n >= 1)
+CURVES = {
+    "linear": lambda n, base, factor: base * n,
+    "geometric": lambda n, base, factor: base * factor ** (n - 1),
+    "power": lambda n, base, factor: base * n ** factor,
+}
+
+
+@dataclass(frozen=True)
+class Standing:
+    tier: int
+    name: str
+    icon: str
+    floor: int  # XP bracket the player is in; at the top rank floor == ceiling
+    ceiling: int
+    progress: float
+
+    @property
+    def label(self):
+        return f"{self.icon} {self.name}"
+
+
+class Progression:
+    """Compiled rank table answering standing queries with bisect"""
+
+    def __init__(self, ranks):
+        ranks = list(ranks)
+        if not ranks:
+            raise ValueError("A progression needs at least one rank")
+        self.names = tuple(rank["name"] for rank in ranks)
+        self.icons = tuple(rank.get("icon", "") for rank in ranks)
+        self.thresholds = tuple(int(rank["xp"]) for rank in ranks)
+        self.gates = tuple(int(rank.get("achievements", 0)) for rank in ranks)
+        if self.thresholds[0] != 0:
+            raise ValueError("The first rank must start at 0 XP")
+        if any(low >= high for low, high in zip(self.thresholds, self.thresholds[1:])):
+            raise ValueError(f"XP thresholds must be strictly increasing: {self.thresholds}")
+        if any(low > high for low, high in zip(self.gates, self.gates[1:])):
+            raise ValueError(f"Achievement gates must not decrease: {self.gates}")
+
+    def __len__(self):
+        return len(self.names)
+
+    def standing(self, xp, achievements=0):
+        """Rank reached (both XP and achievements qualify) plus progress through the XP bracket"""
+        bracket = max(0, bisect.bisect_right(self.thresholds, xp) - 1)
+        # Gates never decrease, so the achievement limit is a second bisect
+        tier = min(bracket, max(0, bisect.bisect_right(self.gates, achievements) - 1))
+        floor = self.thresholds[bracket]
+        ceiling = self.thresholds[min(bracket + 1, len(self.thresholds) - 1)]
+        progress = 1.0 if ceiling == floor else min(1.0, max(0.0, (xp - floor) / (ceiling - floor)))
+        return Standing(tier, self.names[tier], self.icons[tier], floor, ceiling, progress)
+
+    def rows(self):
+        return [
+            {"name": name, "icon": icon, "xp": xp, "achievements": gate}
+            for name, icon, xp, gate in zip(self.names, self.icons, self.thresholds, self.gates)
+        ]
+
+
+def curve_thresholds(curve, count):
+    """``count`` thresholds from a curve spec such as ``{"type": "geometric", "base": 200, "factor": 1.6}``"""
+    kind = curve.get("type", "geometric")
+    if kind not in CURVES:
+        raise ValueError(f"Unknown XP curve {kind!r}; expected one of {sorted(CURVES)}")
+    base, factor = float(curve["base"]), float(curve.get("factor", 1))
+    step = int(curve.get("round_to", 50))
+    thresholds = [0]
+    for n in range(1, count):
+        value = int(math.ceil(CURVES[kind](n, base, factor) / step) * step)
+        # Rounding must not collapse neighbouring ranks onto one threshold
+        thresholds.append(max(value, thresholds[-1] + step))
+    return thresholds
+
+
+def load_progression(path=PROGRESSION_FILE):
+    """Compile the deployment's table: ``{"ranks": [...], "curve": {...}}`` or the default"""
+    if not path:
+        return Progression(DEFAULT_RANKS)
+    with open(path, encoding="utf-8") as handle:
+        config = json.load(handle)
+    ranks = [dict(rank) for rank in config.get("ranks", DEFAULT_RANKS)]
+    if "curve" in config:
+        for rank, xp in zip(ranks, curve_thresholds(config["curve"], len(ranks))):
+            rank["xp"] = xp
+    missing = [rank.get("name", "?") for rank in ranks if "xp" not in rank]
+    if missing:
+        raise ValueError(f"{path}: ranks without an xp threshold and no curve: {missing}")
+    return Progression(ranks)
+
+
+PROGRESSION = load_progression()
+
+
+# ===== BULK RECOMPUTE =====
+def recompute_ranks(store, progression=PROGRESSION, batch_size=RECOMPUTE_BATCH_SIZE, dry_run=False):
+    """Re-rank every stored player; returns (players per rank, number changed)"""
+    counts = Counter()
+    changed = 0
+    for batch in store.scan(batch_size):
+        updates = {}
+        for player_id, document in batch:
+            state = decode_player_state(document)
+            name = progression.standing(state.total_xp, len(state.achievements)).name
+            counts[name] += 1
+            if state.rank != name:
+                state.rank = name
+                updates[player_id] = state.to_bytes()
+        changed += len(updates)
+        if updates and not dry_run:
+            store.save_many(updates)
+    return counts, changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("show", "recompute"))
+    parser.add_argument("--config", default=PROGRESSION_FILE, help="progression JSON (default: built-in table)")
+    parser.add_argument("--dry-run", action="store_true", help="count rank changes without writing them")
+    parser.add_argument("--batch-size", type=int, default=RECOMPUTE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    progression = load_progression(args.config)
+    if args.command == "show":
+        for row in progression.rows():
+            print(f"{row['icon']} {row['name']:<16} {row['xp']:>8,} XP  {row['achievements']:>3} achievements")
+        return 0
+    store = open_progress_store()
+    try:
+        counts, changed = recompute_ranks(store, progression, args.batch_size, args.dry_run)
+    finally:
+        store.close()
+    for name in progression.names:
+        print(f"{name:<16} {counts[name]:>10,}")
+    print(f"{changed:,} player(s) {'would change' if args.dry_run else 'changed'} rank")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Single-pass keyword scoring of prompts against every level's keyword tiers
+
+All levels' required, bonus, secret and negative keywords are compiled once
+into a token-level Aho-Corasick automaton. Scoring walks the prompt's tokens
+exactly once, so cost grows with prompt length rather than keyword count.
+"""
+import re
+from dataclasses import dataclass, field
+
+from levels import LEVELS
+
+TIERS = ("required", "bonus", "secret", "negative")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+OVER_LIMIT_XP_FACTOR = 0.5
+
+
+def normalize_token(token):
+    """Fold simple plurals so 'sparkles' matches 'sparkle'"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lowercase word tokens; hyphens and punctuation separate tokens"""
+    return [normalize_token(t) for t in TOKEN_PATTERN.findall(text.lower())]
+
+
+def count_words(text):
+    """Word count as the player sees it, used for max_words limits"""
+    return len(text.split())
+
+
+@dataclass
+class PromptScore:
+    """Keyword matches, word-limit check and XP breakdown for one level"""
+    level: int
+    word_count: int
+    max_words: int
+    required: list = field(default_factory=list)
+    bonus: list = field(default_factory=list)
+    secret: list = field(default_factory=list)
+    negative: list = field(default_factory=list)
+    missing_required: list = field(default_factory=list)
+    base_xp: int = 0
+    bonus_xp: int = 0
+    secret_xp: int = 0
+    penalty_xp: int = 0
+    total_xp: int = 0
+    min_xp_to_pass: int = 0
+
+    @property
+    def over_word_limit(self):
+        return self.word_count > self.max_words
+
+    @property
+    def passed(self):
+        return bool(self.required) and not self.over_word_limit and self.total_xp >= self.min_xp_to_pass
+
+    @property
+    def perfect(self):
+        """Passed with every required keyword and no negative terms"""
+        return self.passed and not self.missing_required and not self.negative
+
+    @property
+    def keywords(self):
+        """Every positive keyword matched, in tier order"""
+        return self.required + self.bonus + self.secret
+
+
+class KeywordIndex:
+    """Aho-Corasick automaton over keyword token sequences for many levels"""
+
+    def __init__(self, levels):
+        self.levels = levels
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self.keyword_lengths = {}
+        for level_id, level in levels.items():
+            for tier in TIERS:
+                for keyword in level[f"{tier}_keywords" if tier != "negative" else "negative_prompts"]:
+                    tokens = tokenize(keyword)
+                    self.keyword_lengths[keyword] = len(tokens)
+                    self._add(tokens, (level_id, tier, keyword))
+        self.max_keyword_length = max(self.keyword_lengths.values(), default=1)
+        self._build_failure_links()
+
+    def _add(self, tokens, entry):
+        node = 0
+        for token in tokens:
+            nxt = self._goto[node].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(entry)
+
+    def _build_failure_links(self):
+        frontier = list(self._goto[0].values())
+        while frontier:
+            next_frontier = []
+            for node in frontier:
+                for token, child in self._goto[node].items():
+                    fail = self._fail[node]
+                    while fail and token not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    target = self._goto[fail].get(token, 0)
+                    self._fail[child] = target if target != child else 0
+                    # Inherit shorter keywords that end at the same position
+                    self._out[child] = self._out[child] + self._out[self._fail[child]]
+                    next_frontier.append(child)
+            frontier = next_frontier
+
+    def scan(self, tokens, start=0, stop=None):
+        """Yield (end position, (level, tier, keyword)) for every match in tokens[start:stop]"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for position in range(start, len(tokens) if stop is None else stop):
+            token = tokens[position]
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for entry in out[node]:
+                yield position, entry
+
+    def match(self, tokens):
+        """Matched keywords per level and tier, deduplicated in prompt order"""
+        found = {}
+        for _, (level_id, tier, keyword) in self.scan(tokens):
+            found.setdefault(level_id, {}).setdefault(tier, {})[keyword] = None
+        return found
+
+    def build_score(self, level_id, tiers, word_count):
+        """Turn one level's matched tiers into a PromptScore"""
+        level = self.levels[level_id]
+        score = PromptScore(
+            level=level_id, word_count=word_count, max_words=level["max_words"],
+            min_xp_to_pass=level["min_xp_to_pass"],
+            **{tier: list(tiers.get(tier, ())) for tier in TIERS}
+        )
+        score.missing_required = [k for k in level["required_keywords"] if k not in tiers.get("required", ())]
+        score.base_xp = level["base_xp"] if score.required else 0
+        score.bonus_xp = level["bonus_xp"] * len(score.bonus)
+        score.secret_xp = level["secret_xp"] * len(score.secret)
+        score.penalty_xp = level["bonus_xp"] * len(score.negative)
+        total = max(0, score.base_xp + score.bonus_xp + score.secret_xp - score.penalty_xp)
+        if score.over_word_limit:
+            total = int(total * OVER_LIMIT_XP_FACTOR)
+        score.total_xp = total
+        return score
+
+    def score(self, prompt, level_id):
+        """Score a prompt against one level"""
+        found = self.match(tokenize(prompt))
+        return self.build_score(level_id, found.get(level_id, {}), count_words(prompt))
+
+    def score_all(self, prompt):
+        """Score a prompt against every level from a single scan"""
+        found = self.match(tokenize(prompt))
+        word_count = count_words(prompt)
+        return {level_id: self.build_score(level_id, found.get(level_id, {}), word_count) for level_id in self.levels}
+
+
+class IncrementalScorer:
+    """Live scoring of a draft prompt that only rescans the edited tokens
+
+    Matches lying entirely inside the unchanged prefix or suffix of the token
+    list are reused; only the edited span, widened by the longest keyword, is
+    scanned again.
+    """
+
+    def __init__(self, index, level_id):
+        self.index = index
+        self.level_id = level_id
+        self.prompt = None
+        self.score = None
+        self.tokens_rescanned = 0
+        self._tokens = []
+        self._matches = []  # (start, end, tier, keyword) for this level, by end
+
+    def update(self, prompt):
+        """Return the PromptScore for ``prompt``, reusing work from the last draft"""
+        if prompt == self.prompt:
+            return self.score
+        old, new = self._tokens, tokenize(prompt)
+        limit = min(len(old), len(new))
+        prefix = 0
+        while prefix < limit and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+            suffix += 1
+
+        shift = len(new) - len(old)
+        old_tail, new_tail = len(old) - suffix, len(new) - suffix
+        kept_left = [m for m in self._matches if m[1] < prefix]
+        kept_right = [(s + shift, e + shift, tier, kw) for s, e, tier, kw in self._matches if s >= old_tail]
+
+        reach = self.index.max_keyword_length - 1
+        window_start, window_stop = max(0, prefix - reach), min(len(new), new_tail + reach)
+        middle = []
+        for end, (level_id, tier, keyword) in self.index.scan(new, window_start, window_stop):
+            start = end - self.index.keyword_lengths[keyword] + 1
+            if level_id == self.level_id and end >= prefix and start < new_tail:
+                middle.append((start, end, tier, keyword))
+        self.tokens_rescanned = window_stop - window_start
+
+        self._tokens = new
+        self._matches = kept_left + middle + kept_right
+        tiers = {}
+        for _, _, tier, keyword in self._matches:
+            tiers.setdefault(tier, {})[keyword] = None
+        self.prompt = prompt
+        self.score = self.index.build_score(self.level_id, tiers, count_words(prompt))
+        return self.score
+
+
+KEYWORD_INDEX = KeywordIndex(LEVELS)
+
+
+def score_prompt(prompt, level_id):
+    """Score a prompt against a level using the precompiled index"""
+    return KEYWORD_INDEX.score(prompt, level_id)
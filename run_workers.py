@@ -0,0 +1,111 @@
+"""Launch the multi-worker deployment: one inference server plus N Streamlit UI workers
+
+Usage:
+    python run_workers.py [--workers 4] [--base-port 8501]
+
+Each UI worker listens on its own port (skipping the media and inference
+ports); put a load balancer in front of them. Workers keep no state that
+matters beyond a websocket: player progress lives in the shared SQLite store
+(flushed every second in this mode) and images in the shared media store,
+so a reconnect may land on any worker.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+
+from admission import GLOBAL_BURST, GLOBAL_RATE_PER_MINUTE
+from inference_server import INFERENCE_HOST, INFERENCE_PORT
+from instrumentation import METRICS_PORT
+from media_store import MEDIA_PORT, check_media_url
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SERVER_START_TIMEOUT_SECONDS = 60
+WORKER_FLUSH_SECONDS = "1"
+
+
+def ui_ports(base_port, count, reserved):
+    """``count`` consecutive ports from ``base_port``, skipping reserved ones"""
+    port = base_port
+    while count:
+        if port not in reserved:
+            yield port
+            count -= 1
+        port += 1
+
+
+def wait_for_server(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/stats", timeout=1).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--base-port", type=int, default=8501)
+    parser.add_argument("--inference-port", type=int, default=INFERENCE_PORT)
+    args = parser.parse_args(argv)
+    # Workers build image URLs that the server's media endpoint must answer
+    check_media_url()
+
+    inference_url = f"http://{INFERENCE_HOST}:{args.inference_port}"
+    env = dict(
+        os.environ,
+        PROMPT_MASTER_INFERENCE_URL=inference_url,
+        PROMPT_MASTER_PROGRESS_FLUSH_SECONDS=WORKER_FLUSH_SECONDS,
+        # Token buckets are per process, so split the class-wide budget
+        PROMPT_MASTER_GLOBAL_RATE_PER_MINUTE=str(GLOBAL_RATE_PER_MINUTE / args.workers),
+        PROMPT_MASTER_GLOBAL_BURST=str(max(1, GLOBAL_BURST // args.workers)),
+    )
+
+    processes = [subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "inference_server.py"), "--port", str(args.inference_port)],
+        env=env,
+    )]
+    try:
+        if not wait_for_server(inference_url, SERVER_START_TIMEOUT_SECONDS):
+            print(f"Inference server did not come up on {inference_url}", file=sys.stderr)
+            return 1
+        ports = ui_ports(args.base_port, args.workers, {MEDIA_PORT, args.inference_port})
+        # Self-hosted fonts exist only after build_fonts.py has run
+        static = ["--server.enableStaticServing", "true"] if os.path.isdir(os.path.join(ROOT, "static")) else []
+        for index, port in enumerate(ports, 1):
+            # The inference server exposes metrics on METRICS_PORT, workers on the ports after it
+            metrics_port = METRICS_PORT + index
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "app.py"),
+                 "--server.port", str(port), "--server.headless", "true", *static],
+                env=dict(env, PROMPT_MASTER_METRICS_PORT=str(metrics_port)),
+            ))
+            print(f"UI worker on http://localhost:{port} (metrics on :{metrics_port})")
+
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        # Any child exiting takes the deployment down so a supervisor can restart it
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""Score large prompt datasets offline against a level pack, streaming in constant memory
+
+Usage:
+    python score_prompts.py prompts.jsonl scores.jsonl
+    python score_prompts.py prompts.csv scores.csv --workers 8 --level-field level
+    cat prompts.jsonl | python score_prompts.py - - --format jsonl
+    python score_prompts.py prompts.jsonl scores.jsonl --pack spring-2025
+
+Each input record needs a prompt field. Records carrying a level are scored
+against that level; the rest are scored against every level (one output row
+per level). Input is read in chunks, scored on a process pool and written in
+input order with a bounded number of chunks in flight, so memory use does
+not depend on file size. JSONL lines are decoded in the workers; lines that
+are not a JSON object are skipped and their line numbers reported at the
+end. Throughput is reported on stderr.
+"""
+import argparse
+import csv
+import functools
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from level_packs import DEFAULT_PACK, load_pack
+
+OUTPUT_FIELDS = (
+    "id", "level", "word_count", "over_word_limit", "required", "bonus", "secret", "negative",
+    "missing_required", "base_xp", "bonus_xp", "secret_xp", "penalty_xp", "total_xp", "passed", "perfect",
+)
+LIST_FIELDS = ("required", "bonus", "secret", "negative", "missing_required")
+CHUNK_SIZE = 2000
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+REPORT_INTERVAL_SECONDS = 5.0
+MALFORMED_LINES_SHOWN = 10
+
+
+# ===== INPUT / OUTPUT =====
+def detect_format(path, explicit):
+    if explicit:
+        return explicit
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".csv":
+        return "csv"
+    raise SystemExit(f"Cannot infer the format of {path!r}; pass --format")
+
+
+def read_records(handle, fmt):
+    """Yield (line number, record) pairs; JSONL records stay undecoded text for the workers"""
+    if fmt == "csv":
+        reader = csv.DictReader(handle)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(handle, 1):
+        if line.strip():
+            yield line_number, line
+
+
+def decode_record(record):
+    """The record as a mapping, or None if it is not a JSON object"""
+    if not isinstance(record, str):
+        return record
+    try:
+        record = json.loads(record)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def chunked(records, size):
+    """Yield (offset of the first record, list of records) pairs"""
+    chunk = []
+    offset = 0
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield offset, chunk
+            offset += size
+            chunk = []
+    if chunk:
+        yield offset, chunk
+
+
+def score_row(record_id, score):
+    row = {
+        "id": record_id, "level": score.level, "word_count": score.word_count,
+        "over_word_limit": score.over_word_limit, "passed": score.passed, "perfect": score.perfect,
+    }
+    for name in ("base_xp", "bonus_xp", "secret_xp", "penalty_xp", "total_xp"):
+        row[name] = getattr(score, name)
+    for name in LIST_FIELDS:
+        row[name] = getattr(score, name)
+    return row
+
+
+def format_rows(rows, fmt):
+    """Serialize rows in the worker so the parent process only writes text"""
+    if fmt == "jsonl":
+        return "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for row in rows:
+        writer.writerow(
+            "|".join(row[name]) if name in LIST_FIELDS else row[name] for name in OUTPUT_FIELDS
+        )
+    return buffer.getvalue()
+
+
+# ===== SCORING =====
+@functools.lru_cache(maxsize=None)
+def _pack(name):
+    return load_pack(name)
+
+
+def score_chunk(offset, records, prompt_field, level_field, id_field, output_format, pack_name=DEFAULT_PACK):
+    """Score one chunk; returns (formatted output, records scored, records skipped, passes, malformed lines)"""
+    # Workers load the compiled pack from the shared cache once each
+    pack = _pack(pack_name)
+    rows = []
+    malformed = []
+    skipped = passes = 0
+    for position, (line_number, record) in enumerate(records, offset):
+        record = decode_record(record)
+        if record is None:
+            malformed.append(line_number)
+            continue
+        prompt = record.get(prompt_field)
+        if not isinstance(prompt, str):
+            skipped += 1
+            continue
+        record_id = record.get(id_field, position) if id_field else position
+        level = record.get(level_field) if level_field else None
+        if level in (None, ""):
+            scores = pack.keyword_index.score_all(prompt).values()
+        else:
+            try:
+                level_id = int(level)
+            except (TypeError, ValueError):
+                level_id = None
+            if level_id not in pack.levels:
+                skipped += 1
+                continue
+            scores = [pack.keyword_index.score(prompt, level_id)]
+        for score in scores:
+            passes += score.passed
+            rows.append(score_row(record_id, score))
+    scored = len(records) - skipped - len(malformed)
+    return format_rows(rows, output_format), scored, skipped, passes, malformed
+
+
+class ThroughputReport:
+    """Periodic and final progress lines on stderr"""
+
+    def __init__(self, stream=sys.stderr, interval=REPORT_INTERVAL_SECONDS):
+        self.stream = stream
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.scored = self.skipped = self.passes = self.malformed = 0
+        self.malformed_lines = []  # the first MALFORMED_LINES_SHOWN, for the final report
+
+    def add(self, scored, skipped, passes, malformed):
+        self.scored += scored
+        self.skipped += skipped
+        self.passes += passes
+        self.malformed += len(malformed)
+        self.malformed_lines.extend(malformed[:MALFORMED_LINES_SHOWN - len(self.malformed_lines)])
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self._write("progress", now)
+
+    def finish(self):
+        self._write("done", time.perf_counter())
+        if self.malformed:
+            more = ", ..." if self.malformed > len(self.malformed_lines) else ""
+            print(
+                f"[done] skipped {self.malformed:,} malformed lines (not a JSON object): "
+                f"{', '.join(map(str, self.malformed_lines))}{more}",
+                file=self.stream, flush=True,
+            )
+
+    def _write(self, label, now):
+        elapsed = max(now - self.started, 1e-9)
+        print(
+            f"[{label}] {self.scored:,} prompts in {elapsed:.1f}s "
+            f"({self.scored / elapsed:,.0f} prompts/s), {self.skipped:,} skipped, {self.passes:,} passing scores",
+            file=self.stream, flush=True,
+        )
+
+
+def run(records, output, workers, chunk_size, score_args, report):
+    """Score ``records`` into ``output`` keeping at most a few chunks in memory"""
+    chunks = chunked(records, chunk_size)
+    if workers <= 1:
+        for offset, chunk in chunks:
+            text, *counts = score_chunk(offset, chunk, *score_args)
+            output.write(text)
+            report.add(*counts)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for offset, chunk in chunks:
+            in_flight.append(pool.submit(score_chunk, offset, chunk, *score_args))
+            # Write finished chunks in order before reading further ahead
+            while len(in_flight) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                text, *counts = in_flight.popleft().result()
+                output.write(text)
+                report.add(*counts)
+        while in_flight:
+            text, *counts = in_flight.popleft().result()
+            output.write(text)
+            report.add(*counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL or CSV file, or - for stdin")
+    parser.add_argument("output", help="JSONL or CSV file, or - for stdout")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="input format (default: from extension)")
+    parser.add_argument("--output-format", choices=("jsonl", "csv"), help="default: from extension, else input format")
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--level-field", default="level", help="empty string scores every record against all levels")
+    parser.add_argument("--id-field", default="id", help="copied to the output; defaults to the record position")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--pack", default=DEFAULT_PACK, help="level pack to score against")
+    args = parser.parse_args(argv)
+
+    input_format = detect_format(args.input, args.format) if args.input != "-" else (args.format or "jsonl")
+    if args.output_format:
+        output_format = args.output_format
+    elif args.output != "-" and os.path.splitext(args.output)[1].lower() in (".jsonl", ".ndjson", ".csv"):
+        output_format = detect_format(args.output, None)
+    else:
+        output_format = input_format
+
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    report = ThroughputReport()
+    try:
+        if output_format == "csv":
+            target.write(",".join(OUTPUT_FIELDS) + "\n")
+        # Fail on a bad pack before any worker starts
+        _pack(args.pack)
+        score_args = (args.prompt_field, args.level_field, args.id_field, output_format, args.pack)
+        run(read_records(source, input_format), target, args.workers, args.chunk_size, score_args, report)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    report.finish()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())